@@ -42,9 +42,11 @@ INSTALLED_APPS = [
     "rest_framework",
     "companies",
     "search.apps.SearchConfig",
+    "crm.apps.CrmConfig",
 ]
 
 MIDDLEWARE = [
+    "instrumentation.middleware.InstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -86,6 +88,18 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared by the web processes and the index worker, so index writes
+    # invalidate cached searches everywhere; the table is created by migrate
+    "search": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "search_cache",
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -159,6 +173,63 @@ LOGGING = {
     },
 }
 
+OPENSEARCH = {
+    "HOST": os.environ.get("OPENSEARCH_HOST", "http://localhost:9200"),
+    "USER": os.environ.get("OPENSEARCH_USER", "admin"),
+    "PASSWORD": os.environ.get("OPENSEARCH_PASS", "admin"),
+    # Connections kept open per host, shared by every thread in the process
+    "POOL_MAXSIZE": int(os.environ.get("OPENSEARCH_POOL_MAXSIZE", 25)),
+    "MAX_RETRIES": int(os.environ.get("OPENSEARCH_MAX_RETRIES", 3)),
+    "RETRY_BACKOFF": float(os.environ.get("OPENSEARCH_RETRY_BACKOFF", 0.5)),
+    # Request timeouts in seconds per kind of operation
+    "TIMEOUTS": {
+        "default": float(os.environ.get("OPENSEARCH_TIMEOUT", 30)),
+        "search": float(os.environ.get("OPENSEARCH_SEARCH_TIMEOUT", 5)),
+        "bulk": float(os.environ.get("OPENSEARCH_BULK_TIMEOUT", 120)),
+        "admin": float(os.environ.get("OPENSEARCH_ADMIN_TIMEOUT", 60)),
+    },
+}
+
+SEARCH_CACHE = {
+    "ENABLED": os.environ.get("SEARCH_CACHE_ENABLED", "1") == "1",
+    # "local" for an in-process LRU, "django" to share results via CACHES
+    "BACKEND": os.environ.get("SEARCH_CACHE_BACKEND", "local"),
+    # Holds the generation counter, and the results with the "django" backend;
+    # must be shared between processes
+    "CACHE_ALIAS": "search",
+    # Seconds each process reuses the generation it read before reading it again
+    "GENERATION_MAX_AGE": float(os.environ.get("SEARCH_CACHE_GENERATION_MAX_AGE", 1.0)),
+    "TTL": int(os.environ.get("SEARCH_CACHE_TTL", 30)),
+    "MAX_ENTRIES": int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000)),
+}
+
+COMPANY_STATS = {
+    # Recompute the stats snapshot on a read after writes, at most every
+    # MIN_REFRESH_INTERVAL seconds; turn off to rely on MAX_AGE and a
+    # scheduled refresh_company_stats, and skip tracking writes at all
+    "REFRESH_ON_WRITE": os.environ.get("COMPANY_STATS_REFRESH_ON_WRITE", "1") == "1",
+    "MAX_AGE": int(os.environ.get("COMPANY_STATS_MAX_AGE", 300)),
+    "MIN_REFRESH_INTERVAL": int(os.environ.get("COMPANY_STATS_MIN_REFRESH_INTERVAL", 10)),
+    "CACHE_MAX_AGE": int(os.environ.get("COMPANY_STATS_CACHE_MAX_AGE", 60)),
+}
+
+INSTRUMENTATION = {
+    "ENABLED": os.environ.get("INSTRUMENTATION_ENABLED", "1") == "1",
+    "SERVER_TIMING": os.environ.get("INSTRUMENTATION_SERVER_TIMING", "1") == "1",
+    "SLOW_REQUEST_SECONDS": float(os.environ.get("SLOW_REQUEST_SECONDS", 1.0)),
+    "SLOW_REQUEST_SAMPLE_RATE": float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", 1.0)),
+}
+
+CRM = {
+    "BASE_URL": os.environ.get("HUBSPOT_BASE_URL", "https://api.hubapi.com"),
+    "MAX_RETRIES": int(os.environ.get("CRM_MAX_RETRIES", 5)),
+    "RETRY_BACKOFF": float(os.environ.get("CRM_RETRY_BACKOFF", 0.5)),
+    "TIMEOUT": int(os.environ.get("CRM_TIMEOUT", 30)),
+    "SCHEDULE_WINDOW_START_HOUR": int(os.environ.get("CRM_SCHEDULE_WINDOW_START_HOUR", 0)),
+    "SCHEDULE_WINDOW_HOURS": int(os.environ.get("CRM_SCHEDULE_WINDOW_HOURS", 6)),
+    "SCHEDULE_MAX_CONCURRENT": int(os.environ.get("CRM_SCHEDULE_MAX_CONCURRENT", 4)),
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8080",
 ]
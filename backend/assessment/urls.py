@@ -18,9 +18,12 @@ from django.contrib import admin
 from django.http import HttpResponse
 from django.urls import include, path
 
+from instrumentation.views import metrics
+
 urlpatterns = [
     path("", lambda request: HttpResponse("Hello, World!")),
     path("admin/", admin.site.urls),
+    path("metrics", metrics, name="metrics"),
     path(
         "api/v1/",
         include(("companies.urls", "companies"), namespace="companies"),
@@ -29,4 +32,8 @@ urlpatterns = [
         "api/v1/search/",
         include(("search.urls", "search"), namespace="search"),
     ),
+    path(
+        "api/v1/crm/",
+        include(("crm.urls", "crm"), namespace="crm"),
+    ),
 ]
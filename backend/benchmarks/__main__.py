@@ -0,0 +1,97 @@
+"""
+Run the benchmark suite against a throwaway test database
+
+    python -m benchmarks --companies 10000 --output results.json
+    python -m benchmarks --output new.json --compare results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+import django
+
+
+def parse_args(argv=None):
+    from .cases import DEFAULT_COMPANIES, DEFAULT_DEALS_PER_COMPANY, DEFAULT_EMPLOYEES_PER_COMPANY
+    from .harness import DEFAULT_REGRESSION_THRESHOLD, DEFAULT_ROUNDS
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=DEFAULT_COMPANIES)
+    parser.add_argument("--employees-per-company", type=float, default=DEFAULT_EMPLOYEES_PER_COMPANY)
+    parser.add_argument("--deals-per-company", type=float, default=DEFAULT_DEALS_PER_COMPANY)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--only", help="Only run cases whose name contains this")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help=f"Slowdown ratio reported as a regression (default: {DEFAULT_REGRESSION_THRESHOLD})",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "assessment.settings")
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from .cases import CASES, benchmark_environment
+    from .harness import Benchmark, compare_results, write_results
+
+    args = parse_args(argv)
+    # Per-request and per-batch logging would swamp the results
+    for name in ("opensearch", "search_service"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    cases = {name: case for name, case in CASES.items() if not args.only or args.only in name}
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    results = []
+    try:
+        with benchmark_environment(
+            companies=args.companies,
+            employees_per_company=args.employees_per_company,
+            deals_per_company=args.deals_per_company,
+            seed=args.seed,
+        ) as env:
+            print(f"Dataset: {env.dataset}")
+            for name, case in cases.items():
+                benchmark = Benchmark(name, rounds=args.rounds)
+                case(benchmark, env)
+                results.append(benchmark.result)
+                stats = benchmark.result.stats
+                print(
+                    f"{name:<30} mean {stats.mean * 1000:9.3f}ms  "
+                    f"median {stats.median * 1000:9.3f}ms  stddev {stats.stddev * 1000:8.3f}ms"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    if args.output:
+        write_results(args.output, results, env.dataset)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        current = {"benchmarks": [result.as_dict() for result in results]}
+        regressions = 0
+        for row in compare_results(baseline, current, args.threshold):
+            flag = "REGRESSION" if row["regression"] else ""
+            regressions += row["regression"]
+            print(f"{row['name']:<30} {row['ratio']:6.2f}x {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
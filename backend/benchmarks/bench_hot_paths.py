@@ -0,0 +1,19 @@
+"""
+Benchmarks of the search, indexing and REST hot paths
+
+Not collected by the default test run; run them explicitly with
+
+    BENCHMARK_COMPANIES=10000 pytest benchmarks/bench_hot_paths.py
+
+or with `python -m benchmarks` for JSON output and run-to-run comparison.
+"""
+
+import pytest
+
+from .cases import CASES
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("case", list(CASES))
+def test_benchmark(case, benchmark, bench_env):
+    CASES[case](benchmark, bench_env)
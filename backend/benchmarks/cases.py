@@ -0,0 +1,151 @@
+import datetime
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client, override_settings
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from companies.synthetic import generate
+from search.views import render_search_results
+from search_service.bulk import bulk_index
+from search_service.cache import reset_search_cache
+from search_service.client import reset_opensearch_client
+from search_service.documents import company_documents, employee_documents
+from search_service.indexing import COMPANY_WRITE_ALIAS, EMPLOYEE_WRITE_ALIAS
+from search_service.queries import build_search_body, search_companies_and_employees
+
+from .fake_opensearch import FakeOpenSearch, running_fake_opensearch
+
+DEFAULT_COMPANIES = 2000
+DEFAULT_EMPLOYEES_PER_COMPANY = 10
+DEFAULT_DEALS_PER_COMPANY = 2
+
+
+@dataclass
+class BenchmarkEnvironment:
+    dataset: dict
+    fake: FakeOpenSearch
+    company_id: int
+    api: APIClient
+    admin: Client
+
+
+@contextmanager
+def benchmark_environment(
+    companies: int = DEFAULT_COMPANIES,
+    employees_per_company: float = DEFAULT_EMPLOYEES_PER_COMPANY,
+    deals_per_company: float = DEFAULT_DEALS_PER_COMPANY,
+    seed: int = 0,
+):
+    """
+    Generate a dataset, index it into a local OpenSearch stand-in and yield
+    a BenchmarkEnvironment; needs an empty, disposable database
+
+    The search cache is disabled so every search goes to the stand-in.
+    """
+    generated = generate(
+        companies,
+        employees_per_company=employees_per_company,
+        deals_per_company=deals_per_company,
+        seed=seed,
+    )
+    dataset = {
+        "companies": generated.companies,
+        "employees": generated.employees,
+        "deals": generated.deals,
+        "seed": seed,
+    }
+
+    with running_fake_opensearch() as (url, fake):
+        opensearch = {**settings.OPENSEARCH, "HOST": url, "MAX_RETRIES": 0}
+        search_cache = {**settings.SEARCH_CACHE, "ENABLED": False}
+        with override_settings(OPENSEARCH=opensearch, SEARCH_CACHE=search_cache):
+            reset_opensearch_client()
+            reset_search_cache()
+            try:
+                bulk_index(COMPANY_WRITE_ALIAS, company_documents())
+                bulk_index(EMPLOYEE_WRITE_ALIAS, employee_documents())
+
+                admin = Client()
+                admin.force_login(User.objects.create(username="benchmark", is_staff=True, is_superuser=True))
+                yield BenchmarkEnvironment(
+                    dataset=dataset,
+                    fake=fake,
+                    # The company with the most employees is the slowest detail page
+                    company_id=Company.objects.order_by("-employee_count").values_list("pk", flat=True).first(),
+                    api=APIClient(),
+                    admin=admin,
+                )
+            finally:
+                reset_opensearch_client()
+                reset_search_cache()
+
+
+def bench_build_search_body(benchmark, env):
+    benchmark(
+        build_search_body,
+        "employees",
+        "ann",
+        10,
+        date_from="2000-01-01",
+        date_to=datetime.date.today().isoformat(),
+        deal_amount_min=100_000,
+        deal_amount_max=10_000_000,
+        country_codes=["GB", "US", "DE"],
+        employee_count_min=1,
+        employee_count_max=500,
+        sort_by="employee_count",
+        sort_order="desc",
+    )
+
+
+def bench_render_search_results(benchmark, env):
+    results = {
+        "companies": list(env.fake.indices["companies"].values())[:100],
+        "employees": list(env.fake.indices["employees"].values())[:100],
+        "next": None,
+    }
+    benchmark(render_search_results, results)
+
+
+def bench_search(benchmark, env):
+    results = benchmark(search_companies_and_employees, "a", size=50)
+    benchmark.extra_info["hits"] = len(results["companies"]) + len(results["employees"])
+
+
+def bench_index_all(benchmark, env):
+    def index_companies():
+        return bulk_index(COMPANY_WRITE_ALIAS, company_documents())
+
+    result = benchmark.pedantic(index_companies, rounds=3, warmup_rounds=0)
+    benchmark.extra_info["docs"] = result.docs
+    benchmark.extra_info["docs_per_second"] = result.docs / result.seconds if result.seconds else 0.0
+
+
+def bench_company_list(benchmark, env):
+    response = benchmark(env.api.get, "/api/v1/companies/", {"pagination": "cursor", "page_size": 100})
+    assert response.status_code == 200
+
+
+def bench_company_detail(benchmark, env):
+    response = benchmark(env.api.get, f"/api/v1/companies/{env.company_id}/")
+    assert response.status_code == 200
+
+
+def bench_admin_employee_count_filter(benchmark, env):
+    response = benchmark(env.admin.get, "/admin/companies/company/", {"n_employees": 10})
+    assert response.status_code == 200
+
+
+CASES = {
+    "build_search_body": bench_build_search_body,
+    "render_search_results": bench_render_search_results,
+    "search": bench_search,
+    "index_all": bench_index_all,
+    "company_list": bench_company_list,
+    "company_detail": bench_company_detail,
+    "admin_employee_count_filter": bench_admin_employee_count_filter,
+}
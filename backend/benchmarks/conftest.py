@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from .cases import DEFAULT_COMPANIES, benchmark_environment
+from .harness import Benchmark, write_results
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    pytest_benchmark = None
+
+
+@pytest.fixture(scope="session")
+def bench_env(django_db_setup, django_db_blocker):
+    """Dataset of BENCHMARK_COMPANIES companies, shared by every case in the session."""
+    pytest.importorskip("numpy")
+    with django_db_blocker.unblock():
+        with benchmark_environment(
+            companies=int(os.environ.get("BENCHMARK_COMPANIES", DEFAULT_COMPANIES)),
+            seed=int(os.environ.get("BENCHMARK_SEED", 0)),
+        ) as env:
+            yield env
+
+
+if pytest_benchmark is None:
+    # Without pytest-benchmark, time cases with the standalone harness and
+    # write them to BENCHMARK_JSON at the end of the session
+
+    @pytest.fixture(scope="session")
+    def _benchmark_results(bench_env):
+        results = []
+        yield results
+        if os.environ.get("BENCHMARK_JSON"):
+            write_results(os.environ["BENCHMARK_JSON"], results, bench_env.dataset)
+
+    @pytest.fixture
+    def benchmark(request, _benchmark_results):
+        bench = Benchmark(request.node.callspec.id if hasattr(request.node, "callspec") else request.node.name)
+        yield bench
+        if bench.result is not None:
+            _benchmark_results.append(bench.result)
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def _find_prefix(clause) -> str:
+    """Value of the first `prefix` query on `name` anywhere in a query."""
+    if isinstance(clause, dict):
+        if "prefix" in clause and "name" in clause["prefix"]:
+            return clause["prefix"]["name"]["value"]
+        clauses = clause.values()
+    elif isinstance(clause, list):
+        clauses = clause
+    else:
+        return ""
+    for child in clauses:
+        found = _find_prefix(child)
+        if found:
+            return found
+    return ""
+
+
+class FakeOpenSearch:
+    """
+    In-memory stand-in for the parts of the OpenSearch API the app uses
+
+    Handles `_bulk`, `_msearch`, index settings and refresh well enough to
+    exercise the client, serialisation and response handling end to end.
+    Searches match words of `name` on the query's `prefix` clause and rank
+    by id; no relevance scoring, filters or aggregations are applied.
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.settings = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def resolve(self, index: str) -> str:
+        # Write aliases like companies_write point at the read alias
+        return index.removesuffix("_write")
+
+    def bulk(self, lines: list[dict]) -> dict:
+        started = time.perf_counter()
+        items = []
+        with self._lock:
+            pairs = iter(lines)
+            for action in pairs:
+                op, meta = next(iter(action.items()))
+                documents = self.indices.setdefault(self.resolve(meta["_index"]), {})
+                if op == "delete":
+                    found = documents.pop(str(meta["_id"]), None) is not None
+                    items.append({op: {"_id": meta["_id"], "status": 200 if found else 404}})
+                else:
+                    documents[str(meta["_id"])] = next(pairs)
+                    items.append({op: {"_id": meta["_id"], "status": 201}})
+        took = int((time.perf_counter() - started) * 1000)
+        return {"took": took, "errors": False, "items": items}
+
+    def search(self, index: str, body: dict) -> dict:
+        started = time.perf_counter()
+        documents = self.indices.get(self.resolve(index), {})
+        prefix = _find_prefix(body.get("query", {})).lower()
+        matches = sorted(
+            (
+                doc
+                for doc in documents.values()
+                if not prefix or any(word.startswith(prefix) for word in str(doc.get("name", "")).lower().split())
+            ),
+            key=lambda doc: doc["id"],
+        )
+        after = body.get("search_after")
+        if after:
+            matches = [doc for doc in matches if doc["id"] > after[-1]]
+        hits = [
+            {"_index": index, "_id": str(doc["id"]), "_score": 1.0, "_source": doc, "sort": [1.0, doc["id"]]}
+            for doc in matches[: body.get("size", 10)]
+        ]
+        took = int((time.perf_counter() - started) * 1000)
+        return {"took": took, "hits": {"total": {"value": len(matches), "relation": "eq"}, "hits": hits}}
+
+    def msearch(self, lines: list[dict]) -> dict:
+        pairs = iter(lines)
+        return {"responses": [self.search(header.get("index", ""), next(pairs)) for header in pairs]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # requests would stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _lines(self):
+        return [json.loads(line) for line in self._body().splitlines() if line.strip()]
+
+    def _send(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def _dispatch(self):
+        fake = self.server.fake
+        fake.requests += 1
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if parts and parts[-1] == "_bulk":
+            return self._send(fake.bulk(self._lines()))
+        if parts and parts[-1] == "_msearch":
+            return self._send(fake.msearch(self._lines()))
+        if len(parts) == 2 and parts[1] == "_settings":
+            index = parts[0]
+            if self.command == "PUT":
+                fake.settings.setdefault(index, {}).update(json.loads(self._body())["index"])
+                return self._send({"acknowledged": True})
+            current = {"refresh_interval": "1s", "number_of_replicas": "1", **fake.settings.get(index, {})}
+            return self._send({index: {"settings": {"index": current}}})
+        if parts and parts[-1] == "_refresh":
+            return self._send({"_shards": {"total": 1, "successful": 1, "failed": 0}})
+        if not parts:
+            return self._send({"version": {"number": "2.11.0", "distribution": "opensearch"}})
+        return self._send({"error": f"Unsupported by the fake: {self.command} {self.path}"}, 400)
+
+    do_GET = do_POST = do_PUT = do_HEAD = do_DELETE = _dispatch
+
+
+@contextmanager
+def running_fake_opensearch():
+    """
+    Serve a FakeOpenSearch on a free local port for the duration
+
+    yields:
+        (url, FakeOpenSearch) tuple
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.fake = FakeOpenSearch()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", server.fake
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,148 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+
+import django
+
+DEFAULT_ROUNDS = 10
+DEFAULT_WARMUP = 1
+# A case is a regression when its mean is this many times the baseline's
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+
+
+@dataclass
+class BenchmarkStats:
+    rounds: int
+    min: float
+    max: float
+    mean: float
+    median: float
+    stddev: float
+
+    @property
+    def ops(self) -> float:
+        return 1 / self.mean if self.mean else 0.0
+
+    @classmethod
+    def from_timings(cls, timings: list[float]) -> "BenchmarkStats":
+        return cls(
+            rounds=len(timings),
+            min=min(timings),
+            max=max(timings),
+            mean=statistics.fmean(timings),
+            median=statistics.median(timings),
+            stddev=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        )
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    stats: BenchmarkStats
+    extra_info: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "stats": {**asdict(self.stats), "ops": self.stats.ops},
+            "extra_info": self.extra_info,
+        }
+
+
+class Benchmark:
+    """
+    Times a callable the way pytest-benchmark's `benchmark` fixture does
+
+    `benchmark(func, *args)` and `benchmark.pedantic(func, ...)` both run
+    the function for a number of rounds and return its last result, so
+    benchmark cases run unchanged with either.
+    """
+
+    def __init__(self, name: str, rounds: int = DEFAULT_ROUNDS, warmup: int = DEFAULT_WARMUP):
+        self.name = name
+        self.rounds = rounds
+        self.warmup = warmup
+        self.extra_info = {}
+        self.result = None
+
+    def __call__(self, func, *args, **kwargs):
+        return self.pedantic(func, args=args, kwargs=kwargs, rounds=self.rounds, warmup_rounds=self.warmup)
+
+    def pedantic(self, func, args=(), kwargs=None, setup=None, rounds=None, warmup_rounds=0, iterations=1):
+        kwargs = kwargs or {}
+        rounds = rounds or self.rounds
+        for _ in range(warmup_rounds):
+            if setup:
+                setup()
+            func(*args, **kwargs)
+
+        timings = []
+        value = None
+        for _ in range(rounds):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                value = func(*args, **kwargs)
+            timings.append((time.perf_counter() - started) / iterations)
+
+        self.result = BenchmarkResult(self.name, BenchmarkStats.from_timings(timings), self.extra_info)
+        return value
+
+
+def machine_info() -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "commit": revision,
+    }
+
+
+def write_results(path: str, results: list[BenchmarkResult], dataset: dict):
+    """Write results as JSON, in the shape of pytest-benchmark's `--benchmark-json`."""
+    report = {
+        "machine_info": machine_info(),
+        "datetime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "dataset": dataset,
+        "benchmarks": [result.as_dict() for result in results],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> list[dict]:
+    """
+    Compare two JSON reports case by case on their mean time
+
+    returns:
+        one dict per case present in both, with `name`, `baseline`,
+        `current`, `ratio` and `regression`
+    """
+    previous = {case["name"]: case["stats"]["mean"] for case in baseline["benchmarks"]}
+    comparison = []
+    for case in current["benchmarks"]:
+        if case["name"] not in previous:
+            continue
+        ratio = case["stats"]["mean"] / previous[case["name"]] if previous[case["name"]] else 0.0
+        comparison.append(
+            {
+                "name": case["name"],
+                "baseline": previous[case["name"]],
+                "current": case["stats"]["mean"],
+                "ratio": ratio,
+                "regression": ratio > threshold,
+            }
+        )
+    return comparison
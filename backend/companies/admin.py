@@ -18,27 +18,49 @@ class EmployeeCountListFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        # NOTE: this runs really slow in production once we've got a full DB
         if not self.value():
-            pks = queryset.values_list("pk", flat=True)
-        else:
-            pks = []
-            for company in queryset:
-                if company.employee_set.count() >= int(self.value()):
-                    pks.append(company.pk)
-
-        return queryset.filter(pk__in=pks)
+            return queryset
+        # The count is denormalised onto Company and indexed
+        return queryset.filter(employee_count__gte=int(self.value()))
 
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "companies_house_id",
+        "country",
+        "date_founded",
+        "active",
+        "employee_count",
+        "last_deal_date",
+    )
     list_filter = (
         "date_founded",
         "active",
         EmployeeCountListFilter,
     )
+    list_select_related = ("country",)
+    # Skip the unfiltered COUNT(*) the changelist runs next to the filtered
+    # one; with millions of rows it costs more than the page itself
+    show_full_result_count = False
+
+
+@admin.register(Deal)
+class DealAdmin(admin.ModelAdmin):
+    list_display = ("company", "date_of_deal", "amount_raised")
+    list_select_related = ("company",)
+    show_full_result_count = False
+    # A <select> of every company would render millions of options
+    raw_id_fields = ("company",)
+
+
+@admin.register(Employee)
+class EmployeeAdmin(admin.ModelAdmin):
+    list_display = ("name", "company", "job_title", "email")
+    list_select_related = ("company",)
+    show_full_result_count = False
+    raw_id_fields = ("company",)
 
 
 admin.site.register(Country)
-admin.site.register(Deal)
-admin.site.register(Employee)
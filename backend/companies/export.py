@@ -0,0 +1,262 @@
+import csv
+import datetime
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Company, Deal, Employee
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+# Rows are joined into chunks of about this many bytes before being sent
+WRITE_BUFFER_SIZE = 64 * 1024
+
+EXPORTS = {
+    "companies": (
+        Company,
+        {
+            "id": "id",
+            "companies_house_id": "companies_house_id",
+            "name": "name",
+            "description": "description",
+            "date_founded": "date_founded",
+            "country_iso_code": "country__iso_code",
+            "active": "active",
+            "employee_count": "employee_count",
+            "total_deals_amount": "total_deals_amount",
+            "last_deal_amount": "last_deal_amount",
+            "last_deal_date": "last_deal_date",
+            "created": "created",
+            "modified": "modified",
+        },
+    ),
+    "deals": (
+        Deal,
+        {
+            "id": "id",
+            "company_id": "company_id",
+            "date_of_deal": "date_of_deal",
+            "amount_raised": "amount_raised",
+            "created": "created",
+            "modified": "modified",
+        },
+    ),
+    "employees": (
+        Employee,
+        {
+            "id": "id",
+            "company_id": "company_id",
+            "name": "name",
+            "job_title": "job_title",
+            "gender": "gender",
+            "email": "email",
+            "phone_number": "phone_number",
+            "created": "created",
+            "modified": "modified",
+        },
+    ),
+}
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def parse_modified_since(value: str):
+    """
+    Parse a `modified__gte` value given as an ISO date or datetime
+
+    raises:
+        ValueError: if the value is neither
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date or datetime: {value!r}")
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_columns(name: str) -> list[str]:
+    _, columns = EXPORTS[name]
+    return list(columns)
+
+
+def export_rows(name: str, modified_since=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream the rows of one export as dicts, in primary-key order
+
+    Rows come from `values()` through `.iterator()`, so no model instances
+    are built and only `chunk_size` rows are held at a time.
+
+    Companies count as modified when their deals or employees are, since
+    their rollup columns change with them without touching `modified`.
+
+    args:
+        name: 'companies', 'deals' or 'employees'
+        modified_since: only export rows modified at or after this datetime
+        chunk_size: number of rows fetched from the database at a time
+
+    yields:
+        one dict per row, keyed by `export_columns(name)`
+    """
+    model_class, columns = EXPORTS[name]
+    queryset = model_class.objects.all()
+    if name == "companies":
+        queryset = queryset.changed_since(modified_since)
+    elif modified_since is not None:
+        queryset = queryset.filter(modified__gte=modified_since)
+    fields = {column: F(field) for column, field in columns.items() if column != field}
+    queryset = queryset.order_by("pk").values(*(column for column in columns if column not in fields), **fields)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        # values() puts expressions after plain fields; restore column order
+        yield {column: row[column] for column in columns}
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer wrote."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+# Formats that can be streamed, with their content types
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def encode_rows(rows, file_format: str, columns: list[str]):
+    """Turn rows into lines of the given text format."""
+    if file_format == "csv":
+        return csv_lines(rows, columns)
+    return ndjson_lines(rows)
+
+
+def buffered(lines, size: int = WRITE_BUFFER_SIZE):
+    """Join small lines into chunks of about `size` bytes."""
+    chunk, length = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def counted(rows, stats: ExportStats):
+    """Count rows and time the export as they're consumed, logging the rate."""
+    started = time.perf_counter()
+    for row in rows:
+        stats.rows += 1
+        yield row
+    stats.seconds = time.perf_counter() - started
+    logger.info("Exported %d rows in %.2fs (%.0f rows/s)", stats.rows, stats.seconds, stats.rows_per_second)
+
+
+def stream_export(name: str, file_format: str, modified_since=None, stats: ExportStats = None):
+    """
+    Stream an export as encoded byte chunks, for a response or a file
+
+    args:
+        name: 'companies', 'deals' or 'employees'
+        file_format: 'ndjson' or 'csv'
+        modified_since: only export rows modified at or after this datetime
+        stats: optional ExportStats filled in as the stream is consumed
+
+    returns:
+        iterator of byte chunks of about WRITE_BUFFER_SIZE
+    """
+    rows = counted(export_rows(name, modified_since), stats or ExportStats())
+    return buffered(encode_rows(rows, file_format, export_columns(name)))
+
+
+def export_field(name: str, column: str):
+    """Resolve an export column to its model field, following relations."""
+    model_class, columns = EXPORTS[name]
+    *relations, field_name = columns[column].split("__")
+    for relation in relations:
+        model_class = model_class._meta.get_field(relation).related_model
+    return model_class._meta.get_field(field_name)
+
+
+def parquet_schema(name: str):
+    """Arrow schema for an export, so all-null batches keep their types."""
+    import pyarrow as pa
+
+    types = {
+        "AutoField": pa.int64(),
+        "BigAutoField": pa.int64(),
+        "ForeignKey": pa.int64(),
+        "IntegerField": pa.int64(),
+        "PositiveIntegerField": pa.int64(),
+        "FloatField": pa.float64(),
+        "BooleanField": pa.bool_(),
+        "DateField": pa.date32(),
+        "DateTimeField": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema(
+        [
+            (column, types.get(export_field(name, column).get_internal_type(), pa.string()))
+            for column in export_columns(name)
+        ]
+    )
+
+
+def write_parquet(name: str, path: str, modified_since=None, batch_size: int = 50000) -> ExportStats:
+    """
+    Write an export to a Parquet file, one row group per `batch_size` rows
+
+    Needs pyarrow, from the optional `export` extra.
+
+    raises:
+        ImportError: if pyarrow isn't installed
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(name)
+    stats = ExportStats()
+    batch = []
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in counted(export_rows(name, modified_since), stats):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch.clear()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return stats
@@ -0,0 +1,150 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from ...models import Company, Country, Deal, Employee
+
+
+class Rollback(Exception):
+    pass
+
+
+def query_shapes(company_id, phase):
+    """
+    The hot query shapes the composite indexes were designed for
+
+    `phase` is inlined as a literal so each phase sends different SQL text;
+    SQLite's statement cache otherwise replays the old EXPLAIN output after
+    the indexes are dropped (a bound parameter would leave the text as is).
+    """
+    last_week = timezone.now() - datetime.timedelta(days=7)
+    founded_2020 = (datetime.date(2020, 1, 1), datetime.date(2020, 12, 31))
+    label = {"benchmark_phase": RawSQL(f"'{phase}'", ())}
+    return {
+        "deals of a company, newest first": (
+            Deal.objects.filter(company_id=company_id).annotate(**label).order_by("-date_of_deal")[:10]
+        ),
+        "employees of a company, by name": (
+            Employee.objects.filter(company_id=company_id).annotate(**label).order_by("name", "-created")[:10]
+        ),
+        "companies modified this week": Company.objects.filter(modified__gte=last_week).annotate(**label),
+        "owners of deals modified this week": (
+            Deal.objects.filter(modified__gte=last_week).order_by().values("company_id").annotate(**label)
+        ),
+        "companies founded in 2020": Company.objects.filter(date_founded__range=founded_2020).annotate(**label),
+    }
+
+
+def generate_dataset(companies, employees_per_company, deals_per_company):
+    """Bulk insert a throwaway dataset; the caller rolls it back."""
+    country, _ = Country.objects.get_or_create(iso_code="GB", defaults={"name": "United Kingdom"})
+    today = datetime.date.today()
+    old = timezone.now() - datetime.timedelta(days=365)
+
+    created = Company.objects.bulk_create(
+        (
+            Company(
+                name=f"Company {i}",
+                description="",
+                country=country,
+                date_founded=today - datetime.timedelta(days=random.randint(0, 365 * 30)),
+            )
+            for i in range(companies)
+        ),
+        batch_size=5000,
+    )
+    Employee.objects.bulk_create(
+        (
+            Employee(company=company, name=f"Employee {i}", email=f"{i}@example.com", gender="O")
+            for company in created
+            for i in range(employees_per_company)
+        ),
+        batch_size=5000,
+    )
+    Deal.objects.bulk_create(
+        (
+            Deal(
+                company=company,
+                date_of_deal=today - datetime.timedelta(days=random.randint(0, 365 * 10)),
+                amount_raised=random.randint(10_000, 10_000_000),
+            )
+            for company in created
+            for _ in range(deals_per_company)
+        ),
+        batch_size=5000,
+    )
+    # Most rows are old so the modified indexes have something to skip
+    for model in (Company, Deal, Employee):
+        model.objects.exclude(pk__in=model.objects.order_by("-pk").values("pk")[:100]).update(modified=old)
+
+
+def measure(queryset, repeat):
+    plan = queryset.explain()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        list(queryset.all())
+    return plan, (time.perf_counter() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query plans and timings of the hot query shapes with and "
+        "without the composite indexes. Everything, including generated "
+        "data, is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate",
+            type=int,
+            default=0,
+            help="Number of throwaway companies to generate first (default: 0)",
+        )
+        parser.add_argument("--employees-per-company", type=int, default=10)
+        parser.add_argument("--deals-per-company", type=int, default=5)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Times each query is run when timing it (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["generate"]:
+                    self.stdout.write(f"Generating {options['generate']} companies...")
+                    generate_dataset(
+                        options["generate"],
+                        options["employees_per_company"],
+                        options["deals_per_company"],
+                    )
+                self.compare(options["repeat"])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def compare(self, repeat):
+        company_id = Company.objects.order_by("?").values_list("pk", flat=True).first() or 0
+        shapes = query_shapes(company_id, "with indexes")
+        after = {name: measure(queryset, repeat) for name, queryset in shapes.items()}
+
+        # DDL is transactional on SQLite and PostgreSQL, so the indexes come
+        # back with the rollback
+        with connection.cursor() as cursor:
+            for model in (Company, Deal, Employee):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+        shapes = query_shapes(company_id, "without indexes")
+        before = {name: measure(queryset, repeat) for name, queryset in shapes.items()}
+
+        for name in shapes:
+            (before_plan, before_ms), (after_plan, after_ms) = before[name], after[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  without indexes: {before_ms:.2f}ms\n    {before_plan}")
+            self.stdout.write(f"  with indexes:    {after_ms:.2f}ms\n    {after_plan}")
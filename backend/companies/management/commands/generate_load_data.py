@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...synthetic import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate large, reproducible synthetic datasets of companies, "
+        "employees and deals for load and capacity testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--companies", type=int, default=100000)
+        parser.add_argument(
+            "--employees-per-company",
+            type=float,
+            default=10,
+            help="Mean employees per company; counts are right-skewed (default: 10)",
+        )
+        parser.add_argument(
+            "--deals-per-company",
+            type=float,
+            default=2,
+            help="Mean deals per company; amounts follow a power law (default: 2)",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed for reproducible runs (default: 0)")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Worker processes; SQLite serialises writes, so only use more on PostgreSQL (default: 1)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Companies per chunk and transaction (default: {DEFAULT_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Rows per INSERT (default: {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        def report(chunk):
+            self.stdout.write(
+                f"  {chunk.companies} companies, {chunk.employees} employees, {chunk.deals} deals "
+                f"in {chunk.seconds:.2f}s ({chunk.rows_per_second:.0f} rows/s)"
+            )
+
+        try:
+            result = generate(
+                options["companies"],
+                employees_per_company=options["employees_per_company"],
+                deals_per_company=options["deals_per_company"],
+                seed=options["seed"],
+                workers=options["workers"],
+                chunk_size=options["chunk_size"],
+                batch_size=options["batch_size"],
+                on_chunk=report,
+            )
+        except ImportError:
+            raise CommandError("Generating load data needs numpy: pip install -e '.[loadtest]'")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {result.companies} companies, {result.employees} employees and "
+                f"{result.deals} deals in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)"
+            )
+        )
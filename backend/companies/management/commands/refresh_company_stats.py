@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...stats import refresh_company_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the materialised company stats snapshot; run it on a "
+        "schedule when COMPANY_STATS['REFRESH_ON_WRITE'] is off"
+    )
+
+    def handle(self, *args, **options):
+        snapshot = refresh_company_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed company stats (version {snapshot.computed_version}, ETag {snapshot.etag})")
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from ...models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalised employee and deal rollups of every "
+        "company with set-based UPDATEs, one primary-key range at a time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of company primary keys updated per statement (default: 10000)",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        bounds = Company.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            self.stdout.write("No companies to repair")
+            return
+
+        started = time.perf_counter()
+        updated = 0
+        # Short transactions per range keep row locks brief on a live database
+        for start in range(bounds["low"], bounds["high"] + 1, chunk_size):
+            with transaction.atomic():
+                updated += Company.objects.filter(pk__gte=start, pk__lt=start + chunk_size).refresh_rollups()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Repaired the rollups of {updated} companies in {elapsed:.2f}s"))
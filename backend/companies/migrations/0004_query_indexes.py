@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("companies", "0003_company_companies_house_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="company",
+            index=models.Index(fields=["modified"], name="company_modified_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="company",
+            index=models.Index(fields=["date_founded"], name="company_founded_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["company", "-date_of_deal"], name="deal_company_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="deal",
+            index=models.Index(fields=["modified"], name="deal_modified_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["company", "name", "-created"], name="employee_company_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["modified"], name="employee_modified_idx"),
+        ),
+        # The composite indexes above lead with the company, which makes the
+        # foreign keys' own indexes redundant
+        migrations.AlterField(
+            model_name="deal",
+            name="company",
+            field=models.ForeignKey(
+                db_index=False, on_delete=django.db.models.deletion.CASCADE, to="companies.company"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="employee",
+            name="company",
+            field=models.ForeignKey(
+                db_index=False, on_delete=django.db.models.deletion.CASCADE, to="companies.company"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rollups(apps, schema_editor):
+    Company = apps.get_model("companies", "Company")
+    Deal = apps.get_model("companies", "Deal")
+    Employee = apps.get_model("companies", "Employee")
+
+    employees = Employee.objects.filter(company=OuterRef("pk")).order_by().values("company")
+    deals = Deal.objects.filter(company=OuterRef("pk")).order_by().values("company")
+    last_deal = Deal.objects.filter(company=OuterRef("pk")).order_by("-date_of_deal", "-pk")
+    Company.objects.update(
+        employee_count=Coalesce(Subquery(employees.annotate(count=Count("pk")).values("count")), 0),
+        total_deals_amount=Coalesce(Subquery(deals.annotate(total=Sum("amount_raised")).values("total")), 0.0),
+        last_deal_amount=Subquery(last_deal.values("amount_raised")[:1]),
+        last_deal_date=Subquery(last_deal.values("date_of_deal")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("companies", "0004_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="company",
+            name="employee_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="company",
+            name="last_deal_amount",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="company",
+            name="last_deal_date",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="company",
+            name="total_deals_amount",
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="company",
+            index=models.Index(fields=["employee_count"], name="company_employee_count_idx"),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
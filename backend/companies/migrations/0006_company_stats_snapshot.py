@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:41
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("companies", "0005_company_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompanyStatsSnapshot",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("data", models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ("etag", models.CharField(blank=True, max_length=40)),
+                ("computed_at", models.DateTimeField(blank=True, null=True)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+                ("computed_version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
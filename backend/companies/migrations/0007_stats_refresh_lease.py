@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("companies", "0006_company_stats_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companystatssnapshot",
+            name="refreshing_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,16 @@
 from __future__ import unicode_literals
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 from model_utils.models import TimeStampedModel
 
+# Sent with sender=Company whenever `refresh_rollups` recomputes rollups,
+# including for bulk writes that send no model signals
+rollups_refreshed = Signal()
+
 
 class Country(models.Model):
     iso_code = models.CharField(max_length=3, unique=True)
@@ -12,6 +20,110 @@ class Country(models.Model):
         return "{0}".format(self.name)
 
 
+class CompanyQuerySet(models.QuerySet):
+    def changed_since(self, since):
+        """
+        Companies changed since `since`, directly or through their deals or employees
+
+        The rollups are computed from deals and employees, so anything
+        derived from a company changes with them. A deleted deal or
+        employee leaves no `modified` row behind; callers that need those
+        track deletions separately. A `since` of None matches everything.
+        """
+        if since is None:
+            return self.all()
+
+        deal_owners = Deal.objects.filter(modified__gte=since).values("company_id")
+        employers = Employee.objects.filter(modified__gte=since).values("company_id")
+        return self.filter(Q(modified__gte=since) | Q(pk__in=deal_owners) | Q(pk__in=employers))
+
+    def refresh_rollups(self):
+        """
+        Recompute the denormalised deal and employee rollups in one UPDATE
+
+        Each rollup is a correlated subquery served by the company indexes
+        on `Deal` and `Employee`, so refreshing a handful of companies is
+        cheap and refreshing all of them is still a single statement.
+
+        returns:
+            number of companies updated
+        """
+        employees = Employee.objects.filter(company=OuterRef("pk")).order_by().values("company")
+        deals = Deal.objects.filter(company=OuterRef("pk")).order_by().values("company")
+        last_deal = Deal.objects.filter(company=OuterRef("pk")).order_by("-date_of_deal", "-pk")
+        updated = self.update(
+            employee_count=Coalesce(
+                Subquery(employees.annotate(count=Count("pk")).values("count")),
+                0,
+            ),
+            total_deals_amount=Coalesce(
+                Subquery(deals.annotate(total=Sum("amount_raised")).values("total")),
+                0.0,
+            ),
+            last_deal_amount=Subquery(last_deal.values("amount_raised")[:1]),
+            last_deal_date=Subquery(last_deal.values("date_of_deal")[:1]),
+        )
+        rollups_refreshed.send(sender=Company)
+        return updated
+
+
+class RollupSourceQuerySet(models.QuerySet):
+    """
+    Queryset for the models `Company` rolls up, refreshing the owning companies
+
+    `bulk_create` and `update` don't send model signals, so they refresh
+    the rollups of every company they touched themselves.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        Company.objects.filter(pk__in={obj.company_id for obj in objs}).refresh_rollups()
+        return objs
+
+    def update(self, **kwargs):
+        if not set(kwargs) & set(self.model.ROLLUP_FIELDS):
+            return super().update(**kwargs)
+        # Rows moved to another company change the rollups of both
+        company_ids = set(self.order_by().values_list("company_id", flat=True).distinct())
+        rows = super().update(**kwargs)
+        if "company" in kwargs or "company_id" in kwargs:
+            company_ids.add(getattr(kwargs.get("company"), "pk", kwargs.get("company_id")))
+        Company.objects.filter(pk__in=company_ids).refresh_rollups()
+        return rows
+
+
+class EmployeeQuerySet(RollupSourceQuerySet):
+    def changed_since(self, since):
+        """Employees changed since `since`, or whose company may have; None matches everything."""
+        if since is None:
+            return self.all()
+
+        return self.filter(Q(modified__gte=since) | Q(company__modified__gte=since))
+
+
+class RollupSourceModel(TimeStampedModel):
+    """
+    Base for rows rolled up onto their company
+
+    Remembers the company a row was loaded with, so a save that moves it
+    can refresh the company it left as well. `ROLLUP_FIELDS` lists the
+    fields the rollups are computed from.
+    """
+
+    ROLLUP_FIELDS = ("company", "company_id")
+
+    objects = RollupSourceQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_company_id = instance.__dict__.get("company_id")
+        return instance
+
+
 class Company(TimeStampedModel):
     companies_house_id = models.CharField(max_length=8, blank=True)
     name = models.CharField(max_length=100)
@@ -20,17 +132,63 @@ class Company(TimeStampedModel):
     date_founded = models.DateField(null=True, blank=True)
     active = models.BooleanField(default=True)
 
+    # Rollups of the company's deals and employees, kept up to date by
+    # companies.signals and RollupSourceQuerySet
+    employee_count = models.PositiveIntegerField(default=0, editable=False)
+    total_deals_amount = models.FloatField(default=0.0, editable=False)
+    last_deal_amount = models.FloatField(null=True, blank=True, editable=False)
+    last_deal_date = models.DateField(null=True, blank=True, editable=False)
+
+    # Only ever written by `refresh_rollups`
+    ROLLUP_FIELDS = ("employee_count", "total_deals_amount", "last_deal_amount", "last_deal_date")
+
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Incremental search and CRM syncs scan by modification time
+            models.Index(fields=["modified"], name="company_modified_idx"),
+            # Admin date_founded filter and most recently founded lists
+            models.Index(fields=["date_founded"], name="company_founded_idx"),
+            # Admin employee count filter
+            models.Index(fields=["employee_count"], name="company_employee_count_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Save the company, leaving the rollups out of updates
+
+        The in-memory rollups were read when the company was loaded, and
+        a deal or employee may have changed them since.
+        """
+        if not self._state.adding and not kwargs.get("force_insert") and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.ROLLUP_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
-class Deal(TimeStampedModel):
-    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+
+class Deal(RollupSourceModel):
+    # Looked up through deal_company_date_idx, which leads with the company
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, db_index=False)
     date_of_deal = models.DateField()
     amount_raised = models.FloatField()
 
+    ROLLUP_FIELDS = ("company", "company_id", "date_of_deal", "amount_raised")
+
     class Meta:
         ordering = ["-date_of_deal"]
+        indexes = [
+            # A company's deals, newest first, read straight off the index
+            models.Index(fields=["company", "-date_of_deal"], name="deal_company_date_idx"),
+            models.Index(fields=["modified"], name="deal_modified_idx"),
+        ]
 
     def __unicode__(self):
         return "{0} raised by {1} ({2})".format(
@@ -38,8 +196,9 @@ class Deal(TimeStampedModel):
         )
 
 
-class Employee(TimeStampedModel):
-    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+class Employee(RollupSourceModel):
+    # Looked up through employee_company_name_idx, which leads with the company
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=200)
     job_title = models.CharField(max_length=200)
 
@@ -53,9 +212,58 @@ class Employee(TimeStampedModel):
     email = models.EmailField()
     phone_number = models.CharField(max_length=20, blank=True)
 
+    objects = EmployeeQuerySet.as_manager()
+
     class Meta:
         ordering = ["name", "-created"]
         unique_together = ("company", "email")
+        indexes = [
+            # A company's employees in the default ordering
+            models.Index(fields=["company", "name", "-created"], name="employee_company_name_idx"),
+            models.Index(fields=["modified"], name="employee_modified_idx"),
+        ]
 
     def __unicode__(self):
         return "{0} ({1})".format(self.name, self.company)
+
+
+class CompanyStatsSnapshot(models.Model):
+    """
+    Materialised company stats, kept in a single row
+
+    Writes bump `version` once they commit; the snapshot is stale while
+    `computed_version` lags behind it. See companies.stats.
+    """
+
+    SINGLETON_ID = 1
+
+    data = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    etag = models.CharField(max_length=40, blank=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveBigIntegerField(default=0)
+    computed_version = models.PositiveBigIntegerField(default=0)
+    # Set while a refresh runs, so concurrent readers don't start another
+    refreshing_since = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def stale(self):
+        return self.version > self.computed_version
+
+    @classmethod
+    def mark_stale(cls):
+        """
+        Bump `version` once the current transaction commits
+
+        Only the first write after a refresh updates the row; later ones
+        find it stale already and match nothing. Nothing is written when
+        reads don't refresh on write, since nothing looks at `version`.
+        """
+        from .stats import get_stats_settings
+
+        if not get_stats_settings()["REFRESH_ON_WRITE"]:
+            return
+        transaction.on_commit(
+            lambda: cls.objects.filter(pk=cls.SINGLETON_ID, version=F("computed_version")).update(
+                version=F("version") + 1
+            )
+        )
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from instrumentation.serializers import TimedListSerializer, TimedSerializerMixin
+
 from .models import Company, Employee, Deal, Country
 
 
@@ -21,19 +23,20 @@ class DealSerializer(serializers.ModelSerializer):
         fields = ["id", "date_of_deal", "amount_raised"]
 
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     country = CountrySerializer(read_only=True)
     country_id = serializers.PrimaryKeyRelatedField(
         queryset=Country.objects.all(), source="country", write_only=True
     )
-    employees = EmployeeSerializer(many=True, read_only=True)
-    deals = DealSerializer(many=True, read_only=True)
+    employees = EmployeeSerializer(source="employee_set", many=True, read_only=True)
+    deals = DealSerializer(source="deal_set", many=True, read_only=True)
     creator_username = serializers.CharField(
         source="creator.username", read_only=True
     )
 
     class Meta:
         model = Company
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "companies_house_id",
@@ -46,7 +49,47 @@ class CompanySerializer(serializers.ModelSerializer):
             "created",
             "modified",
             "creator_username",
+            "employee_count",
+            "total_deals_amount",
+            "last_deal_amount",
+            "last_deal_date",
             "employees",
             "deals",
         ]
-        read_only_fields = ["id", "created", "modified"]
+        read_only_fields = [
+            "id",
+            "created",
+            "modified",
+            "employee_count",
+            "total_deals_amount",
+            "last_deal_amount",
+            "last_deal_date",
+        ]
+
+
+class CompanyListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Read-only summary of a company for list pages
+
+    Expects the queryset from `CompanyViewSet.get_queryset` for the list
+    action, which prefetches `recent_deals`.
+    """
+
+    country = CountrySerializer(read_only=True)
+    recent_deals = DealSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Company
+        list_serializer_class = TimedListSerializer
+        fields = [
+            "id",
+            "companies_house_id",
+            "name",
+            "date_founded",
+            "country",
+            "active",
+            "modified",
+            "employee_count",
+            "recent_deals",
+        ]
+        read_only_fields = fields
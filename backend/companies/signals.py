@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Company, CompanyStatsSnapshot, Deal, Employee, rollups_refreshed
+
+
+def refresh_companies(*company_ids):
+    Company.objects.filter(pk__in={pk for pk in company_ids if pk is not None}).refresh_rollups()
+
+
+@receiver(post_save, sender=Deal)
+@receiver(post_save, sender=Employee)
+def handle_rollup_source_save(sender, instance, created, **kwargs):
+    """Refresh the company rollups, and those of the company a row moved from."""
+    refresh_companies(instance.company_id, getattr(instance, "_loaded_company_id", None))
+    instance._loaded_company_id = instance.company_id
+
+
+@receiver(post_delete, sender=Deal)
+@receiver(post_delete, sender=Employee)
+def handle_rollup_source_delete(sender, instance, origin=None, **kwargs):
+    """Refresh the company rollups, unless the company itself is being deleted."""
+    if getattr(origin, "model", type(origin)) is Company:
+        return
+    refresh_companies(instance.company_id)
+    # A deleted row leaves no `modified` behind, so incremental syncs would
+    # miss the rollup change; the company carries it instead
+    Company.objects.filter(pk=instance.company_id).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(rollups_refreshed, sender=Company)
+def handle_company_change(sender, **kwargs):
+    """Company writes, and deal and employee changes through the rollups, make the stats stale."""
+    CompanyStatsSnapshot.mark_stale()
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from .models import Company, CompanyStatsSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Recompute a stale snapshot on read; otherwise only MAX_AGE and the
+    # refresh_company_stats command refresh it
+    "REFRESH_ON_WRITE": True,
+    # Seconds before a snapshot is recomputed on read regardless of writes
+    "MAX_AGE": 300,
+    # Least seconds between refreshes caused by writes; under steady writes
+    # reads are served a snapshot at most this old
+    "MIN_REFRESH_INTERVAL": 10,
+    # max-age of the Cache-Control header on the stats endpoint
+    "CACHE_MAX_AGE": 60,
+}
+
+MOST_RECENTLY_FOUNDED_LIMIT = 10
+# Seconds after which a refresh that never finished is taken to have died
+REFRESH_LEASE_SECONDS = 60
+
+
+def get_stats_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "COMPANY_STATS", {})}
+
+
+def most_recently_founded(limit: int = MOST_RECENTLY_FOUNDED_LIMIT) -> list[dict]:
+    """Newest companies first, as one `ORDER BY date_founded DESC LIMIT` query."""
+    queryset = (
+        Company.objects.filter(date_founded__isnull=False)
+        .order_by("-date_founded", "-pk")
+        .values(
+            "id",
+            "companies_house_id",
+            "name",
+            "description",
+            "date_founded",
+            "country__iso_code",
+        )
+    )
+    if limit:
+        queryset = queryset[:limit]
+    return list(queryset)
+
+
+def compute_company_stats() -> dict:
+    """
+    Compute the company stats from the denormalised rollup columns
+
+    returns:
+        dict with `most_recently_founded`, `average_employee_count`,
+        `company_count`, and `by_country` and `by_year` breakdowns
+    """
+    rollups = {
+        "company_count": Count("pk"),
+        "average_employee_count": Avg("employee_count"),
+        "total_deals_amount": Sum("total_deals_amount"),
+    }
+    totals = Company.objects.aggregate(**rollups)
+    by_country = (
+        Company.objects.order_by("country__iso_code").values("country__iso_code", "country__name").annotate(**rollups)
+    )
+    by_year = (
+        Company.objects.filter(date_founded__isnull=False)
+        .annotate(year=ExtractYear("date_founded"))
+        .order_by("year")
+        .values("year")
+        .annotate(**rollups)
+    )
+    return {
+        "most_recently_founded": most_recently_founded(),
+        "average_employee_count": totals["average_employee_count"] or 0.0,
+        "company_count": totals["company_count"],
+        "total_deals_amount": totals["total_deals_amount"] or 0.0,
+        "by_country": [
+            {
+                "iso_code": row["country__iso_code"],
+                "name": row["country__name"],
+                "company_count": row["company_count"],
+                "average_employee_count": row["average_employee_count"],
+                "total_deals_amount": row["total_deals_amount"],
+            }
+            for row in by_country
+        ],
+        "by_year": list(by_year),
+    }
+
+
+def claim_refresh(force: bool = False) -> bool:
+    """
+    Take the refresh lease, unless another refresh holds it
+
+    The snapshot is marked up to date with the current `version` as the
+    lease is taken, so writes landing mid-computation leave the new
+    snapshot stale rather than being lost.
+    """
+    CompanyStatsSnapshot.objects.get_or_create(pk=CompanyStatsSnapshot.SINGLETON_ID)
+    now = timezone.now()
+    snapshots = CompanyStatsSnapshot.objects.filter(pk=CompanyStatsSnapshot.SINGLETON_ID)
+    if not force:
+        snapshots = snapshots.filter(
+            Q(refreshing_since__isnull=True) | Q(refreshing_since__lt=now - timedelta(seconds=REFRESH_LEASE_SECONDS))
+        )
+    return bool(snapshots.update(refreshing_since=now, computed_version=F("version")))
+
+
+def refresh_company_stats(force: bool = True) -> CompanyStatsSnapshot | None:
+    """
+    Recompute the stats and store them as the current snapshot
+
+    args:
+        force: refresh even if another refresh is running
+
+    returns:
+        the new snapshot, or None if another refresh was already running
+    """
+    if not claim_refresh(force):
+        return None
+    try:
+        data = compute_company_stats()
+    except Exception:
+        CompanyStatsSnapshot.objects.filter(pk=CompanyStatsSnapshot.SINGLETON_ID).update(refreshing_since=None)
+        raise
+    encoded = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    CompanyStatsSnapshot.objects.filter(pk=CompanyStatsSnapshot.SINGLETON_ID).update(
+        data=data,
+        etag=hashlib.sha1(encoded.encode("utf-8")).hexdigest(),
+        computed_at=timezone.now(),
+        refreshing_since=None,
+    )
+    snapshot = CompanyStatsSnapshot.objects.get(pk=CompanyStatsSnapshot.SINGLETON_ID)
+    logger.info("Refreshed company stats snapshot at version %d", snapshot.computed_version)
+    return snapshot
+
+
+def get_company_stats() -> CompanyStatsSnapshot:
+    """
+    Return the current stats snapshot, refreshing it first when needed
+
+    A snapshot is refreshed when there is none yet, when it's older than
+    MAX_AGE, or when writes made it stale, REFRESH_ON_WRITE is set and
+    it's older than MIN_REFRESH_INTERVAL. Only one reader refreshes at a
+    time; the others are served the snapshot they found meanwhile.
+    """
+    config = get_stats_settings()
+    snapshot = CompanyStatsSnapshot.objects.filter(pk=CompanyStatsSnapshot.SINGLETON_ID).first()
+    if snapshot is None or snapshot.computed_at is None:
+        # Nothing to serve yet, so wait on a refresh even if one is running
+        return refresh_company_stats()
+
+    age = (timezone.now() - snapshot.computed_at).total_seconds()
+    if age > config["MAX_AGE"] or (
+        config["REFRESH_ON_WRITE"] and snapshot.stale and age >= config["MIN_REFRESH_INTERVAL"]
+    ):
+        return refresh_company_stats(force=False) or snapshot
+    return snapshot
@@ -0,0 +1,374 @@
+"""
+Seedable synthetic data for load and capacity testing
+
+Rows are drawn a chunk of companies at a time with NumPy from name pools
+sampled once up front, so generating a row costs a few array lookups
+rather than several Faker calls. Each chunk has its own random generator
+seeded from `(seed, chunk index)`, which makes the output independent of
+how chunks are spread across worker processes.
+
+NumPy comes with the `loadtest` extra and is imported when data is
+generated, so the rest of the app doesn't need it.
+"""
+
+from __future__ import annotations
+
+import datetime
+import functools
+import itertools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import django
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from faker import Faker
+
+from .models import Company, CompanyStatsSnapshot, Country, Deal, Employee
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_BATCH_SIZE = 5000
+POOL_SIZE = 2000
+
+COUNTRIES = [
+    ("GB", "United Kingdom"),
+    ("US", "United States"),
+    ("DE", "Germany"),
+    ("FR", "France"),
+    ("ES", "Spain"),
+    ("IT", "Italy"),
+    ("NL", "Netherlands"),
+    ("SE", "Sweden"),
+    ("CH", "Switzerland"),
+    ("IE", "Ireland"),
+]
+# Share of companies per country, in COUNTRIES order
+COUNTRY_WEIGHTS = [0.4, 0.2, 0.08, 0.08, 0.05, 0.05, 0.05, 0.03, 0.03, 0.03]
+
+COMPANY_TYPES = ["Tech", "Finance", "Healthcare", "Retail", "Energy", "Media", "Logistics", "Bio"]
+GENDERS = [gender for gender, _ in Employee.GENDERS]
+
+# Deal sizes follow a Pareto distribution above the minimum round; an
+# alpha near 1.16 puts about 80% of the money raised in 20% of the deals
+DEAL_PARETO_ALPHA = 1.16
+DEAL_MIN_AMOUNT = 50_000
+DEAL_MAX_AMOUNT = 1_000_000_000
+
+
+@dataclass
+class GenerationResult:
+    companies: int = 0
+    employees: int = 0
+    deals: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.companies + self.employees + self.deals
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add(self, other: "GenerationResult"):
+        self.companies += other.companies
+        self.employees += other.employees
+        self.deals += other.deals
+
+
+@dataclass(frozen=True)
+class NamePools:
+    company_stems: np.ndarray
+    first_names: np.ndarray
+    last_names: np.ndarray
+    job_titles: np.ndarray
+    domains: np.ndarray
+    descriptions: np.ndarray
+
+    @classmethod
+    def sample(cls, seed: int, size: int = POOL_SIZE) -> "NamePools":
+        """Sample every pool from a seeded Faker, once per process."""
+        import numpy as np
+
+        fake = Faker()
+        fake.seed_instance(seed)
+        return cls(
+            company_stems=np.array([fake.company() for _ in range(size)]),
+            first_names=np.array([fake.first_name() for _ in range(size)]),
+            last_names=np.array([fake.last_name() for _ in range(size)]),
+            job_titles=np.array([fake.job()[:200] for _ in range(size // 10)]),
+            domains=np.array([fake.domain_name() for _ in range(size // 10)]),
+            descriptions=np.array([fake.text(max_nb_chars=200) for _ in range(size // 10)]),
+        )
+
+
+@functools.lru_cache
+def name_pools(seed: int) -> NamePools:
+    return NamePools.sample(seed)
+
+
+def get_or_create_countries() -> list[int]:
+    return [
+        Country.objects.get_or_create(iso_code=iso_code, defaults={"name": name})[0].pk for iso_code, name in COUNTRIES
+    ]
+
+
+def insert_rows(model_class, fields: list[str], rows, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    INSERT already adapted row tuples with executemany, bypassing the ORM
+
+    bulk_create builds and compiles a model instance per row, which costs
+    more than the insert itself at these volumes. No signals are sent and
+    `RollupSourceQuerySet` is skipped, so callers fill the rollups.
+    """
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model_class._meta.get_field(field).column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    sql = f"INSERT INTO {quote(model_class._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    with connection.cursor() as cursor:
+        for batch in itertools.batched(rows, batch_size):
+            cursor.executemany(sql, batch)
+
+
+def draw_counts(rng, mean: float, size: int, maximum: int) -> np.ndarray:
+    """Right-skewed per-company counts with the given mean: many small, few large."""
+    import numpy as np
+
+    if mean <= 0:
+        return np.zeros(size, dtype=np.int64)
+    sigma = 1.0
+    # The mean of a lognormal is exp(mu + sigma^2 / 2)
+    mu = np.log(mean) - sigma**2 / 2
+    return np.clip(np.rint(rng.lognormal(mu, sigma, size)), 0, maximum).astype(np.int64)
+
+
+def draw_deal_amounts(rng, size: int) -> np.ndarray:
+    import numpy as np
+
+    amounts = (rng.pareto(DEAL_PARETO_ALPHA, size) + 1) * DEAL_MIN_AMOUNT
+    return np.round(np.minimum(amounts, DEAL_MAX_AMOUNT), -3)
+
+
+def generate_chunk(
+    seed: int,
+    chunk: int,
+    start: int,
+    companies: int,
+    employees_per_company: float,
+    deals_per_company: float,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pools: NamePools = None,
+    country_ids: list[int] = None,
+) -> GenerationResult:
+    """
+    Generate and insert one chunk of companies with their employees and deals
+
+    The rollup columns are computed from the generated rows and written
+    with the companies, so employees and deals are inserted raw.
+
+    args:
+        seed: seed of the whole run
+        chunk: index of this chunk, mixed into the seed
+        start: global index of the chunk's first company, used for
+            companies house ids
+        companies: number of companies in this chunk
+        employees_per_company: mean number of employees per company
+        deals_per_company: mean number of deals per company
+        batch_size: rows per INSERT
+        pools: name pools, sampled from `seed` once per process when not given
+        country_ids: country primary keys, created when not given
+
+    returns:
+        GenerationResult with the rows inserted
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    rng = np.random.default_rng([seed, chunk])
+    pools = pools or name_pools(seed)
+    country_ids = country_ids or get_or_create_countries()
+    today = datetime.date.today()
+
+    # Companies
+    founded_days_ago = rng.integers(0, 365 * 30, companies)
+    stems = rng.integers(0, len(pools.company_stems), companies)
+    types = rng.integers(0, len(COMPANY_TYPES), companies)
+    descriptions = rng.integers(0, len(pools.descriptions), companies)
+    countries = rng.choice(country_ids, companies, p=COUNTRY_WEIGHTS)
+    active = rng.random(companies) < 0.85
+    employee_counts = draw_counts(rng, employees_per_company, companies, maximum=5000)
+    deal_counts = draw_counts(rng, deals_per_company, companies, maximum=200)
+
+    # Deals, grouped by company and oldest first within each company, so
+    # the last one is the latest deal exactly as refresh_rollups picks it
+    deal_total = int(deal_counts.sum())
+    deal_owner = np.repeat(np.arange(companies), deal_counts)
+    deal_amounts = draw_deal_amounts(rng, deal_total)
+    # Deals happen after founding: a uniform share of the company's age
+    deal_days_ago = (founded_days_ago[deal_owner] * rng.random(deal_total)).astype(np.int64)
+    order = np.lexsort((-deal_days_ago, deal_owner))
+    deal_amounts, deal_days_ago = deal_amounts[order], deal_days_ago[order]
+    last_deal = np.cumsum(deal_counts) - 1
+    has_deals = deal_counts > 0
+    totals = np.bincount(deal_owner, weights=deal_amounts, minlength=companies)
+
+    company_rows = [
+        Company(
+            companies_house_id=f"{start + i:08d}"[-8:],
+            name=f"{pools.company_stems[stems[i]]} {COMPANY_TYPES[types[i]]}"[:100],
+            description=pools.descriptions[descriptions[i]],
+            country_id=int(countries[i]),
+            date_founded=today - datetime.timedelta(days=int(founded_days_ago[i])),
+            active=bool(active[i]),
+            employee_count=int(employee_counts[i]),
+            total_deals_amount=float(totals[i]),
+            last_deal_amount=float(deal_amounts[last_deal[i]]) if has_deals[i] else None,
+            last_deal_date=(
+                today - datetime.timedelta(days=int(deal_days_ago[last_deal[i]])) if has_deals[i] else None
+            ),
+        )
+        for i in range(companies)
+    ]
+
+    # Employees
+    employee_total = int(employee_counts.sum())
+    employee_owner = np.repeat(np.arange(companies), employee_counts)
+    # Position within the company keeps (company, email) unique
+    employee_position = np.arange(employee_total) - np.repeat(
+        np.concatenate(([0], np.cumsum(employee_counts)[:-1])), employee_counts
+    )
+    first_names = pools.first_names[rng.integers(0, len(pools.first_names), employee_total)]
+    last_names = pools.last_names[rng.integers(0, len(pools.last_names), employee_total)]
+    job_titles = pools.job_titles[rng.integers(0, len(pools.job_titles), employee_total)]
+    domains = pools.domains[rng.integers(0, len(pools.domains), companies)]
+    genders = rng.choice(GENDERS, employee_total)
+    phones = rng.integers(10**9, 10**10, employee_total)
+
+    names = np.char.add(np.char.add(first_names, " "), last_names)
+    emails = np.char.lower(
+        np.char.add(
+            np.char.add(np.char.add(np.char.replace(names, " ", "."), "."), employee_position.astype(str)),
+            np.char.add("@", domains[employee_owner]),
+        )
+    )
+    phone_numbers = np.char.add("+44", phones.astype(str))
+    deal_dates = (np.datetime64(today) - deal_days_ago.astype("timedelta64[D]")).astype(str)
+
+    with transaction.atomic():
+        # Companies go through the ORM for their primary keys; there are
+        # far fewer of them than of the rows below
+        Company.objects.bulk_create(company_rows, batch_size=batch_size)
+        company_ids = np.array([company.pk for company in company_rows])
+        stamp = connection.ops.adapt_datetimefield_value(timezone.now())
+        insert_rows(
+            Employee,
+            ["company", "name", "job_title", "gender", "email", "phone_number", "created", "modified"],
+            zip(
+                company_ids[employee_owner].tolist(),
+                names.tolist(),
+                job_titles.tolist(),
+                genders.tolist(),
+                emails.tolist(),
+                phone_numbers.tolist(),
+                itertools.repeat(stamp),
+                itertools.repeat(stamp),
+            ),
+            batch_size,
+        )
+        insert_rows(
+            Deal,
+            ["company", "date_of_deal", "amount_raised", "created", "modified"],
+            zip(
+                company_ids[deal_owner].tolist(),
+                deal_dates.tolist(),
+                deal_amounts.tolist(),
+                itertools.repeat(stamp),
+                itertools.repeat(stamp),
+            ),
+            batch_size,
+        )
+
+    return GenerationResult(
+        companies=companies,
+        employees=employee_total,
+        deals=deal_total,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def _init_worker():
+    django.setup()
+
+
+def generate(
+    companies: int,
+    employees_per_company: float = 10,
+    deals_per_company: float = 2,
+    seed: int = 0,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_chunk=None,
+) -> GenerationResult:
+    """
+    Generate `companies` companies with employees and deals, in parallel chunks
+
+    The same seed and sizes produce the same rows for any number of
+    workers; only primary keys depend on insert order.
+
+    args:
+        companies: number of companies to generate
+        employees_per_company: mean number of employees per company
+        deals_per_company: mean number of deals per company
+        seed: seed for the name pools and every chunk's draws
+        workers: number of worker processes; 1 generates in this process
+        chunk_size: companies per chunk, each inserted in one transaction
+        batch_size: rows per INSERT
+        on_chunk: optional callable receiving each chunk's GenerationResult
+
+    returns:
+        GenerationResult with the totals and wall-clock seconds
+
+    raises:
+        ImportError: if numpy isn't installed
+    """
+    # Fail before writing anything, not in the first chunk
+    import numpy  # noqa: F401
+
+    started = time.perf_counter()
+    country_ids = get_or_create_countries()
+    chunks = [
+        (seed, chunk, start, min(chunk_size, companies - start), employees_per_company, deals_per_company, batch_size)
+        for chunk, start in enumerate(range(0, companies, chunk_size))
+    ]
+    result = GenerationResult()
+
+    if workers <= 1:
+        for args in chunks:
+            chunk_result = generate_chunk(*args, country_ids=country_ids)
+            result.add(chunk_result)
+            if on_chunk:
+                on_chunk(chunk_result)
+    else:
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(generate_chunk, *args, country_ids=country_ids) for args in chunks]
+            for future in as_completed(futures):
+                chunk_result = future.result()
+                result.add(chunk_result)
+                if on_chunk:
+                    on_chunk(chunk_result)
+
+    # The inserts skipped refresh_rollups, whose signal marks stats stale
+    CompanyStatsSnapshot.mark_stale()
+    result.seconds = time.perf_counter() - started
+    return result
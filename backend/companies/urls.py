@@ -10,5 +10,10 @@ router.register(r"companies", views.CompanyViewSet)
 router.register(r"employees", views.EmployeeViewSet)
 
 urlpatterns = [
+    path(
+        "export/<str:name>.<str:file_format>",
+        views.ExportView.as_view(),
+        name="export",
+    ),
     path("", include(router.urls)),
 ]
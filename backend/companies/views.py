@@ -1,35 +1,73 @@
 from __future__ import unicode_literals
 
-from rest_framework import viewsets
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from .export import EXPORTS, FORMATS, parse_modified_since, stream_export
 from .models import Company, Employee, Deal
-from .serializers import CompanySerializer, EmployeeSerializer, DealSerializer
+from .pagination import KeysetPaginationMixin
+from .serializers import (
+    CompanyListSerializer,
+    CompanySerializer,
+    EmployeeSerializer,
+    DealSerializer,
+)
+from .stats import get_company_stats, get_stats_settings, most_recently_founded
+
+# Number of deals nested in each company on list pages
+LIST_RECENT_DEALS = 3
 
 
 def most_recently_founded_companies(limit=10):
-    companies = []
-    for comp in Company.objects.all():
-        serialized = {
-            "companies_house_id": comp.companies_house_id,
-            "name": comp.name,
-            "description": comp.description,
-            "date_founded": comp.date_founded,
-            "country__iso_code": comp.country.iso_code,
-            "creator__username": comp.creator.username,
-        }
-        companies.append(serialized)
-
-    if limit:
-        companies = companies[:limit]
-    return sorted(companies, key=lambda comp: comp["date_founded"])
-
-
-class CompanyViewSet(viewsets.ModelViewSet):
+    return most_recently_founded(limit)
+
+
+class CompanyViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("country")
+        if self.action == "list":
+            # Sliced prefetches are capped per company in a single query
+            recent_deals = Deal.objects.order_by("-date_of_deal", "-pk")[:LIST_RECENT_DEALS]
+            return queryset.prefetch_related(
+                Prefetch("deal_set", queryset=recent_deals, to_attr="recent_deals")
+            ).order_by("pk")
+        if self.action == "retrieve":
+            return queryset.prefetch_related("employee_set", "deal_set")
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return CompanyListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        """
+        Company stats served from the materialised snapshot
+
+        Responds 304 when `If-None-Match` carries the snapshot's ETag.
+        """
+        snapshot = get_company_stats()
+        etag = quote_etag(snapshot.etag)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot.data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(snapshot.computed_at.timestamp())
+        patch_cache_control(response, public=True, max_age=get_stats_settings()["CACHE_MAX_AGE"])
+        return response
+
     @action(detail=True, methods=["get"])
     def employees(self, request, pk=None):
         company = self.get_object()
@@ -45,7 +83,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
 
@@ -55,3 +93,33 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         if company_id:
             queryset = queryset.filter(company_id=company_id)
         return queryset
+
+
+class ExportView(APIView):
+    """
+    Stream every row of companies, deals or employees as NDJSON or CSV
+
+    Rows are read with a server-side cursor and written as they're read,
+    so memory use doesn't depend on the size of the extract.
+
+    Query params:
+        modified__gte: ISO date or datetime; only rows modified since then
+    """
+
+    def get(self, request, name, file_format):
+        if name not in EXPORTS or file_format not in FORMATS:
+            raise NotFound(f"No {file_format} export of {name}")
+
+        modified_since = request.query_params.get("modified__gte")
+        if modified_since:
+            try:
+                modified_since = parse_modified_since(modified_since)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            stream_export(name, file_format, modified_since or None),
+            content_type=FORMATS[file_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{name}.{file_format}"'
+        return response
@@ -0,0 +1,51 @@
+from django.contrib import admin
+
+from .models import CrmAccount, CrmObjectMapping, SyncBatch, SyncRun
+
+
+@admin.register(CrmAccount)
+class CrmAccountAdmin(admin.ModelAdmin):
+    list_display = ("name", "provider", "portal_id", "requests_per_second", "max_workers", "active")
+    list_filter = ("provider", "active")
+    search_fields = ("name", "portal_id")
+
+
+@admin.register(CrmObjectMapping)
+class CrmObjectMappingAdmin(admin.ModelAdmin):
+    list_display = ("account", "object_type", "local_id", "external_id", "matched_on", "modified")
+    list_filter = ("object_type", "matched_on")
+    list_select_related = ("account",)
+    raw_id_fields = ("account",)
+    search_fields = ("=local_id", "=external_id")
+    show_full_result_count = False
+
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "account",
+        "object_type",
+        "status",
+        "created",
+        "seconds",
+        "records",
+        "succeeded",
+        "failed",
+        "unchanged",
+        "api_calls",
+        "latency_p95",
+        "checkpoint_pk",
+    )
+    list_filter = ("status", "object_type", "dry_run")
+    list_select_related = ("account",)
+    raw_id_fields = ("account", "resumed_from")
+    date_hierarchy = "created"
+    show_full_result_count = False
+
+
+@admin.register(SyncBatch)
+class SyncBatchAdmin(admin.ModelAdmin):
+    list_display = ("run", "number", "first_pk", "last_pk", "records", "failed", "api_calls", "bytes", "seconds")
+    list_select_related = ("run__account",)
+    raw_id_fields = ("run",)
+    show_full_result_count = False
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CrmConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "crm"
+    verbose_name = "CRM integration"
+
+    def ready(self):
+        # Registers the sync queue gauges
+        import crm.scheduler  # noqa
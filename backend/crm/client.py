@@ -0,0 +1,190 @@
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+
+from .ratelimit import TokenBucket, bucket_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "BASE_URL": "https://api.hubapi.com",
+    # HubSpot's batch endpoints take at most 100 inputs
+    "BATCH_SIZE": 100,
+    "MAX_RETRIES": 5,
+    "RETRY_BACKOFF": 0.5,
+    "RETRY_BACKOFF_MAX": 30.0,
+    "TIMEOUT": 30,
+    # A running sync that hasn't saved progress for this long is taken to
+    # have died, and is resumed by the next one
+    "STALE_RUN_SECONDS": 900,
+    # Daily syncs are spread over a window starting at this local hour
+    "SCHEDULE_WINDOW_START_HOUR": 0,
+    "SCHEDULE_WINDOW_HOURS": 6,
+    # Syncs run at once by the scheduler, across all accounts and per account
+    "SCHEDULE_MAX_CONCURRENT": 4,
+    "SCHEDULE_MAX_PER_ACCOUNT": 1,
+    # Wait before retrying a failed sync, which resumes it
+    "SCHEDULE_RETRY_SECONDS": 900,
+    "SCHEDULE_POLL_SECONDS": 30,
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def get_crm_settings() -> dict:
+    """Merge `settings.CRM` over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "CRM", {})}
+
+
+class CrmError(Exception):
+    """A CRM API call failed and won't be retried (any more)."""
+
+    def __init__(self, message: str, status: int | None = None, body=None, attempts: int = 1, bytes_sent: int = 0):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+        self.attempts = attempts
+        self.bytes_sent = bytes_sent
+
+    @property
+    def is_auth_error(self) -> bool:
+        return self.status in (401, 403)
+
+
+@dataclass
+class ApiResponse:
+    status: int
+    data: dict
+    # Requests made, including retries, and bytes sent across all of them
+    attempts: int
+    bytes_sent: int
+    seconds: float
+
+
+class HubSpotClient:
+    """
+    Minimal HubSpot CRM v3 client shared by a pool of worker threads
+
+    Every call takes a token from the account's rate limiter first. 429s
+    and 5xx responses, timeouts and dropped connections are retried with
+    exponential backoff; a 429 also pauses the limiter so the other
+    workers back off too. Each thread keeps its own keep-alive session.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        bucket: TokenBucket | None = None,
+        base_url: str | None = None,
+        max_retries: int | None = None,
+        backoff_factor: float | None = None,
+        backoff_max: float | None = None,
+        timeout: float | None = None,
+    ):
+        config = get_crm_settings()
+        self.access_token = access_token
+        self.bucket = bucket
+        self.base_url = (base_url or config["BASE_URL"]).rstrip("/")
+        self.max_retries = config["MAX_RETRIES"] if max_retries is None else max_retries
+        self.backoff_factor = config["RETRY_BACKOFF"] if backoff_factor is None else backoff_factor
+        self.backoff_max = config["RETRY_BACKOFF_MAX"] if backoff_max is None else backoff_max
+        self.timeout = config["TIMEOUT"] if timeout is None else timeout
+        self._local = threading.local()
+
+    @classmethod
+    def for_account(cls, account, **kwargs):
+        return cls(account.access_token, bucket=bucket_for(account), **kwargs)
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(
+                {
+                    "Authorization": f"Bearer {self.access_token}",
+                    "Content-Type": "application/json",
+                }
+            )
+        return session
+
+    def _backoff(self, attempt: int) -> float:
+        # Jittered so workers that failed together don't retry together
+        delay = min(self.backoff_max, self.backoff_factor * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def request(self, method: str, path: str, body=None, params=None) -> ApiResponse:
+        """
+        Call the API, retrying throttled and failed requests
+
+        raises:
+            CrmError: on a non-retryable response, or once retries run out
+        """
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        url = f"{self.base_url}{path}"
+        started = time.perf_counter()
+        bytes_sent = 0
+
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            bytes_sent += len(data or b"")
+            try:
+                response = self.session.request(method, url, data=data, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise CrmError(f"{method} {path} failed: {e}", attempts=attempt + 1, bytes_sent=bytes_sent) from e
+                delay = self._backoff(attempt)
+                logger.warning("%s %s failed (%s), retrying in %.1fs", method, path, e, delay)
+                time.sleep(delay)
+                continue
+
+            if response.status_code < 400:
+                return ApiResponse(
+                    status=response.status_code,
+                    data=response.json() if response.content else {},
+                    attempts=attempt + 1,
+                    bytes_sent=bytes_sent,
+                    seconds=time.perf_counter() - started,
+                )
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                raise CrmError(
+                    f"{method} {path} returned {response.status_code}",
+                    status=response.status_code,
+                    body=response.text,
+                    attempts=attempt + 1,
+                    bytes_sent=bytes_sent,
+                )
+
+            delay = self._backoff(attempt)
+            retry_after = response.headers.get("Retry-After", "")
+            if response.status_code == 429 and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            logger.warning("%s %s returned %d, retrying in %.1fs", method, path, response.status_code, delay)
+            if response.status_code == 429 and self.bucket is not None:
+                # The next acquire() waits out the pause, in every worker
+                self.bucket.pause(delay)
+                continue
+            time.sleep(delay)
+
+    def batch_upsert(self, object_type: str, inputs: list[dict]) -> ApiResponse:
+        """Create or update up to 100 objects matched on their `idProperty`."""
+        return self.request("POST", f"/crm/v3/objects/{object_type}/batch/upsert", body={"inputs": inputs})
+
+    def batch_update(self, object_type: str, inputs: list[dict]) -> ApiResponse:
+        """Update up to 100 objects by their CRM `id`."""
+        return self.request("POST", f"/crm/v3/objects/{object_type}/batch/update", body={"inputs": inputs})
+
+    def list_objects(self, object_type: str, properties: list[str], after=None, limit: int = 100) -> ApiResponse:
+        """One page of an object type; follow `paging.next.after` for the next."""
+        params = {"limit": limit, "properties": ",".join(properties), "archived": "false"}
+        if after:
+            params["after"] = after
+        return self.request("GET", f"/crm/v3/objects/{object_type}", params=params)
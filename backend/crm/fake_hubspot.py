@@ -0,0 +1,190 @@
+import itertools
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BATCH_LIMIT = 100
+
+
+class FakeHubSpot:
+    """
+    In-memory stand-in for the parts of the HubSpot CRM API the sync uses
+
+    Objects are kept per type, listed a page at a time, updated by id and
+    upserted on whichever property an upsert names as its `idProperty`.
+    `fail_next` queues error responses, to exercise throttling and
+    retries; `calls` records every request made.
+    """
+
+    def __init__(self, access_token: str = "test-token"):
+        self.access_token = access_token
+        self.objects = {}
+        self.calls = []
+        self._failures = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def fail_next(self, status: int, times: int = 1, headers: dict | None = None):
+        """Answer the next `times` requests with `status`."""
+        with self._lock:
+            self._failures.extend([(status, headers or {})] * times)
+
+    def take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def add(self, object_type: str, properties: dict) -> dict:
+        """Create an object directly, as if made in the CRM by the user."""
+        with self._lock:
+            return self._create(object_type, properties)
+
+    def _create(self, object_type: str, properties: dict) -> dict:
+        now = datetime.now(timezone.utc).isoformat()
+        record = {"id": str(next(self._ids)), "properties": dict(properties), "createdAt": now, "updatedAt": now}
+        self.objects.setdefault(object_type, {})[record["id"]] = record
+        return record
+
+    def find(self, object_type: str, prop: str, value: str):
+        for record in self.objects.get(object_type, {}).values():
+            if record["properties"].get(prop) == value:
+                return record
+        return None
+
+    def batch_upsert(self, object_type: str, inputs: list[dict]) -> tuple[int, dict]:
+        if len(inputs) > BATCH_LIMIT:
+            return 400, {"status": "error", "message": f"Batch is limited to {BATCH_LIMIT} inputs"}
+        if len({item["id"] for item in inputs}) != len(inputs):
+            return 400, {"status": "error", "message": "Duplicate IDs found in batch input"}
+
+        results = []
+        with self._lock:
+            for item in inputs:
+                record = self.find(object_type, item["idProperty"], item["id"])
+                new = record is None
+                if new:
+                    record = self._create(object_type, {**item["properties"], item["idProperty"]: item["id"]})
+                else:
+                    record["properties"].update(item["properties"])
+                    record["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                results.append({**record, "new": new})
+        return 200, {"status": "COMPLETE", "results": results}
+
+    def batch_update(self, object_type: str, inputs: list[dict]) -> tuple[int, dict]:
+        if len(inputs) > BATCH_LIMIT:
+            return 400, {"status": "error", "message": f"Batch is limited to {BATCH_LIMIT} inputs"}
+
+        results, errors = [], []
+        with self._lock:
+            objects = self.objects.get(object_type, {})
+            for item in inputs:
+                record = objects.get(item["id"])
+                if record is None:
+                    errors.append(
+                        {
+                            "status": "error",
+                            "category": "OBJECT_NOT_FOUND",
+                            "message": "Object not found",
+                            "context": {"ids": [item["id"]]},
+                        }
+                    )
+                    continue
+                record["properties"].update(item["properties"])
+                record["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                results.append(dict(record))
+        payload = {"status": "COMPLETE", "results": results}
+        if errors:
+            payload["errors"] = errors
+        return (207 if errors else 200), payload
+
+    def list_page(self, object_type: str, properties: list[str], after: str | None, limit: int) -> dict:
+        with self._lock:
+            records = sorted(self.objects.get(object_type, {}).values(), key=lambda record: int(record["id"]))
+        if after:
+            records = [record for record in records if int(record["id"]) >= int(after)]
+        limit = min(limit, BATCH_LIMIT)
+        page = [
+            {
+                "id": record["id"],
+                "properties": {name: record["properties"].get(name) for name in properties},
+                "createdAt": record["createdAt"],
+                "updatedAt": record["updatedAt"],
+            }
+            for record in records[:limit]
+        ]
+        payload = {"results": page}
+        if len(records) > limit:
+            payload["paging"] = {"next": {"after": records[limit]["id"]}}
+        return payload
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _send(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        fake = self.server.fake
+        body = self._body()
+        parsed = urlparse(self.path)
+        fake.calls.append((self.command, parsed.path, body))
+
+        if self.headers.get("Authorization") != f"Bearer {fake.access_token}":
+            return self._send({"status": "error", "category": "INVALID_AUTHENTICATION"}, 401)
+        failure = fake.take_failure()
+        if failure:
+            status, headers = failure
+            return self._send({"status": "error", "message": "Injected failure"}, status, headers)
+
+        parts = [part for part in parsed.path.split("/") if part]
+        if parts[:3] == ["crm", "v3", "objects"] and len(parts) == 4 and self.command == "GET":
+            query = parse_qs(parsed.query)
+            properties = query.get("properties", [""])[0].split(",")
+            after = query.get("after", [None])[0]
+            return self._send(fake.list_page(parts[3], properties, after, int(query.get("limit", ["10"])[0])))
+        if parts[:3] == ["crm", "v3", "objects"] and parts[4:5] == ["batch"] and self.command == "POST":
+            operation = {"upsert": fake.batch_upsert, "update": fake.batch_update}.get(parts[5])
+            if operation:
+                status, payload = operation(parts[3], body["inputs"])
+                return self._send(payload, status)
+        return self._send({"status": "error", "message": f"Unsupported by the fake: {self.command} {self.path}"}, 404)
+
+    do_GET = do_POST = do_PATCH = _dispatch
+
+
+@contextmanager
+def running_fake_hubspot(access_token: str = "test-token"):
+    """
+    Serve a FakeHubSpot on a free local port for the duration
+
+    yields:
+        (url, FakeHubSpot) tuple
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.fake = FakeHubSpot(access_token)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", server.fake
+    finally:
+        server.shutdown()
+        server.server_close()
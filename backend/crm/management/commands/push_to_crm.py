@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...client import CrmError
+from ...mapping import MAPPINGS
+from ...matching import refresh_mappings
+from ...models import CrmAccount
+from ...push import MAX_BATCH_SIZE
+from ...sync import SyncAlreadyRunning, sync_objects
+
+
+class Command(BaseCommand):
+    help = (
+        "Push the companies and employees (as contacts) that changed since the last "
+        "sync to a CRM account, through the batch update and upsert APIs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("account", type=int, help="Primary key of the CrmAccount")
+        parser.add_argument(
+            "--objects",
+            nargs="+",
+            choices=list(MAPPINGS),
+            default=list(MAPPINGS),
+            help="Object types to push, in order (default: companies contacts)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker threads sending batches (default: the account's max_workers)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=MAX_BATCH_SIZE,
+            help=f"Records per upsert call, at most {MAX_BATCH_SIZE} (default: {MAX_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--match",
+            action="store_true",
+            help="Download the account's objects and match them to ours first, so nothing is duplicated",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the last sync time and compare the payload hash of every row",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many records would be created, updated and skipped without pushing",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            account = CrmAccount.objects.get(pk=options["account"], active=True)
+        except CrmAccount.DoesNotExist:
+            raise CommandError(f"No active CRM account {options['account']}")
+
+        for object_type in options["objects"]:
+            try:
+                if options["match"]:
+                    matched = refresh_mappings(account, object_type)
+                    self.stdout.write(
+                        f"Matched {sum(matched.matched.values())} {object_type} to {matched.remote} in {account}, "
+                        f"kept {matched.kept} mappings"
+                    )
+                run = sync_objects(
+                    account,
+                    object_type,
+                    full=options["full"],
+                    dry_run=options["dry_run"],
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                )
+            except (CrmError, SyncAlreadyRunning) as e:
+                raise CommandError(f"Pushing {object_type} to {account} failed: {e}")
+
+            if options["dry_run"]:
+                self.stdout.write(
+                    f"Would push {run.records} {object_type} to {account}: {run.new} new, "
+                    f"{run.changed} changed; {run.unchanged} unchanged, {run.skipped} without an id"
+                )
+                continue
+            if run.resumed_from_id:
+                self.stdout.write(f"Resumed sync run {run.resumed_from_id} after pk {run.resumed_from.checkpoint_pk}")
+            style = self.style.SUCCESS if not run.failed else self.style.WARNING
+            self.stdout.write(
+                style(
+                    f"Pushed {run.succeeded}/{run.records} {object_type} to {account} "
+                    f"in {run.api_calls} calls, {run.seconds:.2f}s "
+                    f"({run.failed} failed, {run.unchanged} unchanged, {run.skipped} without an id)"
+                )
+            )
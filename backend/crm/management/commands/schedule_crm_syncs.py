@@ -0,0 +1,72 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...scheduler import Scheduler, outstanding_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every active CRM account's daily sync at its slot in the sync window, a few at a time "
+        "and accounts with the most changes first. Runs as a daemon, or with --once from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the syncs due now and exit, e.g. from cron every few minutes",
+        )
+        parser.add_argument(
+            "--max-concurrent",
+            type=int,
+            help="Syncs running at once across all accounts (default: CRM['SCHEDULE_MAX_CONCURRENT'])",
+        )
+        parser.add_argument(
+            "--max-per-account",
+            type=int,
+            help="Syncs running at once per account (default: CRM['SCHEDULE_MAX_PER_ACCOUNT'])",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker threads sending batches per sync (default: the account's max_workers)",
+        )
+        parser.add_argument(
+            "--list",
+            action="store_true",
+            help="List the outstanding syncs, in the order they would start, and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            now = timezone.now()
+            jobs, running = outstanding_jobs(now)
+            for job in jobs:
+                waiting = f", retry at {timezone.localtime(job.not_before):%H:%M}" if job.not_before > now else ""
+                self.stdout.write(
+                    f"{job.account} {job.object_type}: {job.pending} pending, "
+                    f"due {timezone.localtime(job.due):%H:%M}{waiting}"
+                )
+            self.stdout.write(f"{len(jobs)} outstanding, {len(running)} running")
+            return
+
+        scheduler = Scheduler(
+            max_concurrent=options["max_concurrent"],
+            max_per_account=options["max_per_account"],
+            workers=options["workers"],
+        )
+        stop = threading.Event()
+        if not options["once"]:
+
+            def shut_down(signum, frame):
+                self.stdout.write("Stopping once the running syncs finish")
+                stop.set()
+                scheduler.finished.set()
+
+            signal.signal(signal.SIGTERM, shut_down)
+            signal.signal(signal.SIGINT, shut_down)
+
+        scheduler.run(once=options["once"], stop=stop)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from django.db.models import F
+
+from companies.models import Company, Employee
+
+
+def _text(value) -> str:
+    """HubSpot property value: strings throughout, empty to clear a field."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def company_properties(row: dict) -> dict:
+    return {
+        "companies_house_id": _text(row["companies_house_id"]),
+        "name": _text(row["name"]),
+        "description": _text(row["description"]),
+        "country": _text(row["country_name"]),
+        "founded_year": _text(row["date_founded"].year if row["date_founded"] else None),
+        "numberofemployees": _text(row["employee_count"]),
+        "total_deals_amount": _text(row["total_deals_amount"]),
+        "last_deal_amount": _text(row["last_deal_amount"]),
+        "last_deal_date": _text(row["last_deal_date"]),
+        "active": _text(row["active"]),
+    }
+
+
+def contact_properties(row: dict) -> dict:
+    first_name, _, last_name = row["name"].partition(" ")
+    return {
+        "email": _text(row["email"]),
+        "firstname": first_name,
+        "lastname": last_name,
+        "jobtitle": _text(row["job_title"]),
+        "phone": _text(row["phone_number"]),
+        "company": _text(row["company_name"]),
+    }
+
+
+def payload_digest(properties: dict) -> str:
+    """Hash of the exact properties sent for a record, to tell if they changed."""
+    encoded = json.dumps(properties, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class ObjectMapping:
+    """How rows of one model become inputs of one CRM object type."""
+
+    object_type: str
+    model: type
+    # Values read per row, with `annotations` joined in as extra keys
+    fields: tuple
+    annotations: dict
+    # Unique CRM property upserts are matched on, present in `properties`
+    id_property: str
+    properties: Callable[[dict], dict]
+
+    def queryset(self):
+        return self.model.objects.all()
+
+    def rows(self, queryset):
+        return queryset.annotate(**self.annotations).values("pk", *self.fields, *self.annotations)
+
+    def upsert_input(self, properties: dict) -> dict:
+        return {"idProperty": self.id_property, "id": properties[self.id_property], "properties": properties}
+
+
+COMPANIES = ObjectMapping(
+    object_type="companies",
+    model=Company,
+    fields=(
+        "companies_house_id",
+        "name",
+        "description",
+        "date_founded",
+        "active",
+        "employee_count",
+        "total_deals_amount",
+        "last_deal_amount",
+        "last_deal_date",
+    ),
+    annotations={"country_name": F("country__name")},
+    # A custom unique-value property, created in the account beforehand
+    id_property="companies_house_id",
+    properties=company_properties,
+)
+
+CONTACTS = ObjectMapping(
+    object_type="contacts",
+    model=Employee,
+    fields=("name", "job_title", "email", "phone_number", "company_id"),
+    annotations={"company_name": F("company__name")},
+    id_property="email",
+    properties=contact_properties,
+)
+
+MAPPINGS = {mapping.object_type: mapping for mapping in (COMPANIES, CONTACTS)}
+
+
+def keyset_batches(rows, batch_size: int, after_pk: int = 0):
+    """
+    Stream a pk-ordered `values()` queryset one batch per query
+
+    Keyset pagination keeps every query an index range scan however deep
+    into the table it gets, and the last pk of a batch is all a later run
+    needs to carry on from there.
+
+    yields:
+        lists of row dicts, each with a `pk` key
+    """
+    while True:
+        batch = list(rows.filter(pk__gt=after_pk)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after_pk = batch[-1]["pk"]
+
+
+def row_batches(mapping: ObjectMapping, queryset=None, batch_size: int = 100, after_pk: int = 0):
+    """
+    Stream annotated rows of a mapping in primary-key order
+
+    args:
+        mapping: the ObjectMapping to read rows for
+        queryset: queryset of `mapping.model`, defaults to `mapping.queryset()`
+        batch_size: rows per batch
+        after_pk: only read rows with a greater primary key
+
+    yields:
+        lists of row dicts
+    """
+    if queryset is None:
+        queryset = mapping.queryset()
+    return keyset_batches(mapping.rows(queryset.order_by("pk")), batch_size, after_pk)
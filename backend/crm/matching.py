@@ -0,0 +1,236 @@
+import logging
+import re
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .client import HubSpotClient
+from .mapping import MAPPINGS, keyset_batches
+from .models import CrmObjectMapping
+
+logger = logging.getLogger(__name__)
+
+# Objects fetched per list call, the API's maximum
+PAGE_SIZE = 100
+DEFAULT_BATCH_SIZE = 2000
+
+LEGAL_SUFFIXES = {"co", "company", "corp", "corporation", "inc", "limited", "llc", "llp", "lp", "ltd", "plc"}
+
+
+def normalise_company_number(value) -> str:
+    """Companies House numbers: no spaces, upper case, zero-padded if numeric."""
+    value = re.sub(r"\s+", "", str(value or "")).upper()
+    return value.zfill(8) if value.isdigit() else value
+
+
+def normalise_domain(value) -> str:
+    value = str(value or "").strip().lower()
+    value = re.sub(r"^[a-z]+://", "", value).split("/")[0].split(":")[0]
+    return value.removeprefix("www.")
+
+
+def normalise_name(value) -> str:
+    """Company names without case, punctuation or a trailing legal form."""
+    words = re.sub(r"[^\w]+", " ", str(value or "").casefold().replace("&", " and ")).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+def normalise_email(value) -> str:
+    return str(value or "").strip().casefold()
+
+
+@dataclass(frozen=True)
+class MatchKey:
+    """A normalised key objects are matched on, strongest first."""
+
+    name: str
+    remote_property: str
+    # Row key holding our value, or None if we don't store one
+    local_field: str | None
+    normalise: Callable[[object], str]
+
+
+MATCH_KEYS = {
+    "companies": (
+        MatchKey("companies_house_id", "companies_house_id", "companies_house_id", normalise_company_number),
+        # Company has no website column, so only remote objects carry a
+        # domain; the key still guards against matching two of them by name
+        MatchKey("domain", "domain", None, normalise_domain),
+        MatchKey("name", "name", "name", normalise_name),
+    ),
+    "contacts": (MatchKey("email", "email", "email", normalise_email),),
+}
+
+# Marks a key value shared by several remote objects, which can't be matched on
+AMBIGUOUS = object()
+
+
+class MatchIndex:
+    """
+    In-memory hash indexes of one account's remote objects
+
+    One dict per key from normalised value to object id, so matching a
+    row is a few dict lookups however many objects the account has.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.external_ids = set()
+        self._indexes = {key.name: {} for key in keys}
+
+    def __len__(self):
+        return len(self.external_ids)
+
+    def add(self, external_id: str, properties: dict):
+        self.external_ids.add(external_id)
+        for key in self.keys:
+            value = key.normalise(properties.get(key.remote_property))
+            if not value:
+                continue
+            index = self._indexes[key.name]
+            current = index.get(value)
+            index[value] = external_id if current in (None, external_id) else AMBIGUOUS
+
+    def match(self, row: dict):
+        """
+        Find the remote object for a row, on the strongest key that is unique
+
+        returns:
+            (external id, key name), or None if nothing matches
+        """
+        for key in self.keys:
+            if key.local_field is None:
+                continue
+            value = key.normalise(row.get(key.local_field))
+            found = self._indexes[key.name].get(value) if value else None
+            if found is not None and found is not AMBIGUOUS:
+                return found, key.name
+        return None
+
+    @property
+    def ambiguous(self) -> int:
+        return sum(value is AMBIGUOUS for index in self._indexes.values() for value in index.values())
+
+
+@dataclass
+class MatchResult:
+    remote: int = 0
+    api_calls: int = 0
+    kept: int = 0
+    matched: Counter = field(default_factory=Counter)
+    unmatched: int = 0
+    removed: int = 0
+    ambiguous: int = 0
+    seconds: float = 0.0
+
+
+def download_index(client: HubSpotClient, object_type: str, result: MatchResult | None = None) -> MatchIndex:
+    """Page through every object of a type in the account into a `MatchIndex`."""
+    keys = MATCH_KEYS[object_type]
+    properties = [key.remote_property for key in keys]
+    index = MatchIndex(keys)
+    after = None
+    while True:
+        response = client.list_objects(object_type, properties, after=after, limit=PAGE_SIZE)
+        for record in response.data.get("results", []):
+            index.add(record["id"], record.get("properties") or {})
+        if result is not None:
+            result.api_calls += response.attempts
+        after = response.data.get("paging", {}).get("next", {}).get("after")
+        if not after:
+            return index
+
+
+def refresh_mappings(
+    account,
+    object_type: str,
+    client: HubSpotClient | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> MatchResult:
+    """
+    Match our rows to an account's existing CRM objects
+
+    Downloads the account's objects once, then streams our rows past the
+    in-memory indexes. A row keeps its mapping while the object it points
+    to still exists; otherwise it is matched afresh, and its mapping is
+    removed if nothing matches, so the next push creates the object.
+
+    args:
+        account: the CrmAccount to match against
+        object_type: 'companies' or 'contacts'
+        client: HubSpotClient, defaults to one for `account`
+        batch_size: rows matched and written per transaction
+
+    returns:
+        MatchResult with how every row was matched
+    """
+    started = time.perf_counter()
+    client = client or HubSpotClient.for_account(account)
+    mapping = MAPPINGS[object_type]
+    result = MatchResult()
+    index = download_index(client, object_type, result)
+    result.remote = len(index)
+    result.ambiguous = index.ambiguous
+
+    local_fields = [key.local_field for key in index.keys if key.local_field]
+    mappings = CrmObjectMapping.objects.filter(account=account, object_type=object_type)
+    rows = mapping.model.objects.order_by("pk").values("pk", *local_fields)
+    for batch in keyset_batches(rows, batch_size):
+        current = {item.local_id: item for item in mappings.filter(local_id__in=[row["pk"] for row in batch])}
+        creates, updates, removed = [], [], []
+        now = timezone.now()
+        for row in batch:
+            existing = current.get(row["pk"])
+            if existing and existing.external_id in index.external_ids:
+                result.kept += 1
+                continue
+            found = index.match(row)
+            if found is None:
+                result.unmatched += 1
+                if existing:
+                    removed.append(existing.pk)
+                continue
+            external_id, key = found
+            result.matched[key] += 1
+            if existing:
+                # A different object hasn't had our payload yet
+                existing.external_id, existing.matched_on, existing.modified = external_id, key, now
+                existing.payload_hash = ""
+                updates.append(existing)
+            else:
+                creates.append(
+                    CrmObjectMapping(
+                        account=account,
+                        object_type=object_type,
+                        local_id=row["pk"],
+                        external_id=external_id,
+                        matched_on=key,
+                    )
+                )
+
+        with transaction.atomic():
+            CrmObjectMapping.objects.bulk_create(creates)
+            CrmObjectMapping.objects.bulk_update(updates, ["external_id", "matched_on", "payload_hash", "modified"])
+            CrmObjectMapping.objects.filter(pk__in=removed).delete()
+        result.removed += len(removed)
+
+    result.seconds = time.perf_counter() - started
+    logger.info(
+        "Matched %s of %s against %d remote objects: %d kept, %s, %d unmatched in %.2fs",
+        object_type,
+        account,
+        result.remote,
+        result.kept,
+        dict(result.matched),
+        result.unmatched,
+        result.seconds,
+    )
+    return result
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:54
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="CrmAccount",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                ("name", models.CharField(max_length=200)),
+                ("provider", models.CharField(choices=[("hubspot", "HubSpot")], default="hubspot", max_length=20)),
+                ("portal_id", models.CharField(blank=True, max_length=50)),
+                ("access_token", models.CharField(max_length=255)),
+                ("requests_per_second", models.FloatField(default=10.0)),
+                ("burst", models.PositiveIntegerField(default=10)),
+                ("max_workers", models.PositiveSmallIntegerField(default=4)),
+                ("active", models.BooleanField(default=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
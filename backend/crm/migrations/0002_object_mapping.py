@@ -0,0 +1,52 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:55
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crm", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrmObjectMapping",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                (
+                    "object_type",
+                    models.CharField(choices=[("companies", "Companies"), ("contacts", "Contacts")], max_length=20),
+                ),
+                ("local_id", models.BigIntegerField()),
+                ("external_id", models.CharField(max_length=50)),
+                ("matched_on", models.CharField(max_length=30)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="mappings", to="crm.crmaccount"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["account", "object_type", "external_id"], name="crm_mapping_external_idx")
+                ],
+                "unique_together": {("account", "object_type", "local_id")},
+            },
+        ),
+    ]
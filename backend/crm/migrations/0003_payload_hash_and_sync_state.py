@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("crm", "0002_object_mapping"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crmobjectmapping",
+            name="payload_hash",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="crmobjectmapping",
+            name="pushed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="CrmSyncState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "object_type",
+                    models.CharField(choices=[("companies", "Companies"), ("contacts", "Contacts")], max_length=20),
+                ),
+                ("high_water_mark", models.DateTimeField(blank=True, null=True)),
+                ("last_run", models.DateTimeField(blank=True, null=True)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="sync_states", to="crm.crmaccount"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("account", "object_type")},
+            },
+        ),
+    ]
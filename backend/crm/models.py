@@ -0,0 +1,166 @@
+from django.db import models
+from model_utils.models import TimeStampedModel
+
+
+class CrmAccount(TimeStampedModel):
+    """A user's CRM account that companies and employees are pushed to."""
+
+    HUBSPOT = "hubspot"
+    PROVIDERS = ((HUBSPOT, "HubSpot"),)
+
+    name = models.CharField(max_length=200)
+    provider = models.CharField(max_length=20, choices=PROVIDERS, default=HUBSPOT)
+    # HubSpot portal (hub) id, for reference only
+    portal_id = models.CharField(max_length=50, blank=True)
+    # Private app token; OAuth accounts would store their refresh token instead
+    access_token = models.CharField(max_length=255)
+    # The account's API quota, shared by every worker pushing to it
+    requests_per_second = models.FloatField(default=10.0)
+    burst = models.PositiveIntegerField(default=10)
+    max_workers = models.PositiveSmallIntegerField(default=4)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class CrmObjectMapping(TimeStampedModel):
+    """
+    Which CRM object one of our rows corresponds to, per account
+
+    Filled by crm.matching from a download of the account's objects, and
+    by pushes as they create objects, so later pushes update the matched
+    object rather than creating a duplicate.
+    """
+
+    COMPANIES = "companies"
+    CONTACTS = "contacts"
+    OBJECT_TYPES = (
+        (COMPANIES, "Companies"),
+        (CONTACTS, "Contacts"),
+    )
+
+    account = models.ForeignKey(CrmAccount, on_delete=models.CASCADE, related_name="mappings")
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES)
+    # Primary key of the Company or Employee
+    local_id = models.BigIntegerField()
+    external_id = models.CharField(max_length=50)
+    # The normalised key the objects were matched on, or "push" for objects we created
+    matched_on = models.CharField(max_length=30)
+    # crm.mapping.payload_digest of the properties last pushed successfully;
+    # empty when the object needs a push whether or not the row changed
+    payload_hash = models.CharField(max_length=32, blank=True)
+    pushed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("account", "object_type", "local_id")
+        indexes = [
+            models.Index(fields=["account", "object_type", "external_id"], name="crm_mapping_external_idx"),
+        ]
+
+    def __str__(self):
+        return "{0} {1} -> {2}".format(self.object_type, self.local_id, self.external_id)
+
+
+class CrmSyncState(models.Model):
+    """High-water mark of the last completed sync of one object type to an account."""
+
+    account = models.ForeignKey(CrmAccount, on_delete=models.CASCADE, related_name="sync_states")
+    object_type = models.CharField(max_length=20, choices=CrmObjectMapping.OBJECT_TYPES)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    last_run = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("account", "object_type")
+
+    def __str__(self):
+        return "{0} {1} ({2})".format(self.account, self.object_type, self.high_water_mark)
+
+
+class SyncRun(TimeStampedModel):
+    """
+    One sync of an object type to an account, with its running totals
+
+    `created` is when the run started. The totals and `checkpoint_pk` are
+    saved as batches complete, so `modified` doubles as a heartbeat and a
+    failed run can be resumed from its checkpoint by crm.sync.
+    """
+
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = (
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    )
+
+    account = models.ForeignKey(CrmAccount, on_delete=models.CASCADE, related_name="sync_runs")
+    object_type = models.CharField(max_length=20, choices=CrmObjectMapping.OBJECT_TYPES)
+    status = models.CharField(max_length=20, choices=STATUSES, default=RUNNING)
+    dry_run = models.BooleanField(default=False)
+    # The window synced: rows changed after `since`, as of `until`
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField()
+    resumed_from = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    seconds = models.FloatField(default=0.0)
+
+    batches = models.PositiveIntegerField(default=0)
+    records = models.PositiveIntegerField(default=0)
+    new = models.PositiveIntegerField(default=0)
+    changed = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    api_calls = models.PositiveIntegerField(default=0)
+    bytes = models.PositiveBigIntegerField(default=0)
+    # Every row up to this pk has been processed
+    checkpoint_pk = models.BigIntegerField(default=0)
+    # Percentiles of the time batches took to send, retries included
+    latency_p50 = models.FloatField(null=True, blank=True)
+    latency_p95 = models.FloatField(null=True, blank=True)
+    latency_p99 = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["account", "object_type", "-created"], name="crm_syncrun_account_idx"),
+            models.Index(fields=["status", "-created"], name="crm_syncrun_status_idx"),
+        ]
+
+    def __str__(self):
+        return "{0} {1} {2} ({3})".format(self.account, self.object_type, self.created, self.status)
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+class SyncBatch(models.Model):
+    """One batch of a SyncRun: its rows, the calls it made and how long they took."""
+
+    run = models.ForeignKey(SyncRun, on_delete=models.CASCADE, related_name="sync_batches")
+    number = models.PositiveIntegerField()
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField()
+    records = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    api_calls = models.PositiveIntegerField(default=0)
+    bytes = models.PositiveBigIntegerField(default=0)
+    seconds = models.FloatField(default=0.0)
+    # The first few errors the API reported, to keep rows small
+    errors = models.JSONField(default=list, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["run", "number"]
+        verbose_name_plural = "sync batches"
+        unique_together = ("run", "number")
+
+    def __str__(self):
+        return "{0} batch {1}".format(self.run, self.number)
@@ -0,0 +1,357 @@
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from django.utils import timezone
+
+from .client import CrmError, HubSpotClient, get_crm_settings
+from .mapping import MAPPINGS, payload_digest, row_batches
+from .models import CrmObjectMapping
+
+logger = logging.getLogger(__name__)
+
+# Hard limit of HubSpot's batch endpoints
+MAX_BATCH_SIZE = 100
+
+
+@dataclass(frozen=True)
+class Outbound:
+    """The payload of one row, ready to send."""
+
+    pk: int
+    properties: dict
+    digest: str
+    # The CRM object the row is mapped to, if any
+    external_id: str | None
+
+
+@dataclass
+class BatchReport:
+    """Outcome of pushing one batch of rows."""
+
+    number: int
+    first_pk: int
+    last_pk: int
+    # Rows sent: `new` ones without a mapping and `changed` mapped ones
+    records: int = 0
+    new: int = 0
+    changed: int = 0
+    # Rows whose payload hash matches the last push, which aren't sent
+    unchanged: int = 0
+    # Unmapped rows without an id property value, which can't be upserted
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    api_calls: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    errors: list[dict] = field(default_factory=list)
+    # (object id, payload digest) by row pk, for the rows pushed; the digest
+    # is empty when another row's payload was sent for the same object
+    pushed: dict = field(default_factory=dict)
+    failed_pks: list = field(default_factory=list)
+    # Rows whose mapped object no longer exists in the CRM
+    unmapped_pks: list = field(default_factory=list)
+
+    def add_response(self, response) -> list[dict]:
+        self.api_calls += response.attempts
+        self.bytes += response.bytes_sent
+        self.errors.extend({"batch": self.number, **error} for error in response.data.get("errors", []))
+        return response.data.get("results", [])
+
+    def add_error(self, error: CrmError):
+        self.api_calls += error.attempts
+        self.bytes += error.bytes_sent
+        self.errors.append({"batch": self.number, "status": error.status, "message": str(error)})
+
+
+@dataclass
+class PushResult:
+    """Totals across every batch pushed by `push_objects`."""
+
+    batches: int = 0
+    records: int = 0
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    api_calls: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    errors: list[dict] = field(default_factory=list)
+    # Highest pk every row up to which has been pushed; batches finish out
+    # of order, so this trails the furthest batch until the gaps close
+    checkpoint_pk: int = 0
+    _next_number: int = 1
+    _finished: dict = field(default_factory=dict, repr=False)
+
+    def add(self, report: BatchReport):
+        self.batches += 1
+        self.records += report.records
+        self.new += report.new
+        self.changed += report.changed
+        self.unchanged += report.unchanged
+        self.skipped += report.skipped
+        self.succeeded += report.succeeded
+        self.failed += report.failed
+        self.api_calls += report.api_calls
+        self.bytes += report.bytes
+        self.errors.extend(report.errors)
+
+        self._finished[report.number] = report.last_pk
+        while self._next_number in self._finished:
+            self.checkpoint_pk = self._finished.pop(self._next_number)
+            self._next_number += 1
+
+
+def prepare_batch(mapping, number: int, rows: list[dict], stored: dict) -> tuple[BatchReport, list[Outbound]]:
+    """
+    Build the payload of each row and drop those that haven't changed
+
+    args:
+        mapping: the ObjectMapping of the rows
+        number: batch number, for reporting
+        rows: row dicts from `row_batches`
+        stored: (object id, payload hash) by row pk, for the mapped rows
+
+    returns:
+        (BatchReport with the row counts, Outbound payloads to send)
+    """
+    report = BatchReport(number=number, first_pk=rows[0]["pk"], last_pk=rows[-1]["pk"])
+    items = []
+    for row in rows:
+        external_id, stored_digest = stored.get(row["pk"], (None, ""))
+        properties = mapping.properties(row)
+        if external_id is None and not properties[mapping.id_property]:
+            report.skipped += 1
+            continue
+        digest = payload_digest(properties)
+        if digest == stored_digest:
+            report.unchanged += 1
+            continue
+        if external_id is None:
+            report.new += 1
+        else:
+            report.changed += 1
+        items.append(Outbound(row["pk"], properties, digest, external_id))
+    report.records = len(items)
+    return report, items
+
+
+def send_batch(client: HubSpotClient, mapping, report: BatchReport, items: list[Outbound]) -> BatchReport:
+    """
+    Send one prepared batch: updates for mapped rows, upserts for the rest
+
+    Rows mapped to a CRM object update it by id, whatever it was matched
+    on; other rows are upserted on the mapping's id property, and the ids
+    of the objects that creates or finds are reported back. Rows whose
+    object was deleted in the CRM lose their mapping and are upserted
+    instead. A call the API rejects, or that still fails after the
+    client's retries, is reported as failed rather than raised, so one
+    bad batch doesn't stop a long push. Authentication errors are raised,
+    since every other batch would fail the same way.
+    """
+    # The API rejects a batch that names the same object twice, so the last
+    # row wins, e.g. one person employed by two companies
+    updates, upserts = {}, {}
+    # Rows by the key their results are matched back on, in batch order
+    rows = defaultdict(list)
+
+    def add_upsert(item):
+        upsert = mapping.upsert_input(item.properties)
+        upserts[upsert["id"]] = upsert
+        rows["value", upsert["id"].casefold()].append(item)
+
+    for item in items:
+        if item.external_id:
+            updates[item.external_id] = {"id": item.external_id, "properties": item.properties}
+            rows["id", item.external_id].append(item)
+        else:
+            add_upsert(item)
+
+    def send(operation, inputs):
+        call = client.batch_update if operation == "update" else client.batch_upsert
+        try:
+            response = call(mapping.object_type, list(inputs.values()))
+        except CrmError as e:
+            if e.is_auth_error:
+                raise
+            report.add_error(e)
+            return [], []
+        return report.add_response(response), response.data.get("errors", [])
+
+    started = time.perf_counter()
+    object_ids = {}
+    if updates:
+        results, errors = send("update", updates)
+        for result in results:
+            object_ids["id", result["id"]] = result["id"]
+        missing = {
+            external_id
+            for error in errors
+            if error.get("category") == "OBJECT_NOT_FOUND"
+            for external_id in error.get("context", {}).get("ids", [])
+        }
+        for external_id in missing:
+            for item in rows.pop(("id", external_id), ()):
+                report.unmapped_pks.append(item.pk)
+                if item.properties[mapping.id_property]:
+                    add_upsert(item)
+        if missing:
+            logger.info("%d %s were deleted in the CRM, upserting them again", len(missing), mapping.object_type)
+    if upserts:
+        results, _ = send("upsert", upserts)
+        for result in results:
+            # The CRM may normalise values, e.g. lower-case emails
+            object_ids["value", str(result["properties"].get(mapping.id_property, "")).casefold()] = result["id"]
+    for key, group in rows.items():
+        if key not in object_ids:
+            continue
+        sent = group[-1].digest
+        for item in group:
+            # Rows whose payload another row's replaced stay unhashed, so they are sent again
+            report.pushed[item.pk] = (object_ids[key], item.digest if item.digest == sent else "")
+    report.seconds = time.perf_counter() - started
+
+    report.failed_pks = [item.pk for item in items if item.pk not in report.pushed]
+    report.succeeded = len(report.pushed)
+    report.failed = len(report.failed_pks)
+    return report
+
+
+def save_push_state(account, object_type: str, report: BatchReport):
+    """
+    Record what a batch pushed, so later pushes skip or update those rows
+
+    Rows that failed lose their payload hash, so they are sent again even
+    if they don't change before the next sync. Mappings to objects deleted
+    in the CRM are dropped first.
+    """
+    now = timezone.now()
+    if report.unmapped_pks:
+        CrmObjectMapping.objects.filter(
+            account=account, object_type=object_type, local_id__in=report.unmapped_pks
+        ).delete()
+    CrmObjectMapping.objects.bulk_create(
+        [
+            CrmObjectMapping(
+                account=account,
+                object_type=object_type,
+                local_id=pk,
+                external_id=external_id,
+                matched_on="push",
+                payload_hash=digest,
+                pushed_at=now,
+            )
+            for pk, (external_id, digest) in report.pushed.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["account", "object_type", "local_id"],
+        update_fields=["external_id", "payload_hash", "pushed_at", "modified"],
+    )
+    if report.failed_pks:
+        CrmObjectMapping.objects.filter(
+            account=account, object_type=object_type, local_id__in=report.failed_pks
+        ).update(payload_hash="")
+
+
+def push_objects(
+    account,
+    object_type: str,
+    queryset=None,
+    client: HubSpotClient | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
+    after_pk: int = 0,
+    dry_run: bool = False,
+    on_batch=None,
+) -> PushResult:
+    """
+    Push the companies or contacts whose payload changed since their last push
+
+    Rows are read on the calling thread in pk-ordered batches, along with
+    their CrmObjectMapping rows, and only those whose payload hash differs
+    from the last successful push are handed to a pool of worker threads.
+    Database reads and writes overlap with API calls while only one
+    connection is used. At most two batches per worker are in flight,
+    which bounds memory however many rows there are; the account's rate
+    limiter bounds the request rate across the workers.
+
+    args:
+        account: the CrmAccount to push to
+        object_type: 'companies' or 'contacts'
+        queryset: rows to consider, defaults to every row
+        client: HubSpotClient, defaults to one for `account`
+        batch_size: rows per batch, at most 100 so a batch fits one call
+        workers: worker threads, defaults to `account.max_workers`
+        after_pk: only consider rows with a greater primary key
+        dry_run: count what would be sent without calling the API
+        on_batch: optional callable receiving each `BatchReport`, called
+            on this thread as batches complete
+
+    returns:
+        PushResult with the totals and every error reported
+
+    raises:
+        CrmError: if the account's credentials are rejected
+    """
+    mapping = MAPPINGS[object_type]
+    client = client or HubSpotClient.for_account(account)
+    batch_size = min(batch_size or get_crm_settings()["BATCH_SIZE"], MAX_BATCH_SIZE)
+    workers = workers or account.max_workers
+    result = PushResult(checkpoint_pk=after_pk)
+    started = time.perf_counter()
+
+    def finish(report):
+        result.add(report)
+        if report.records and not dry_run:
+            save_push_state(account, object_type, report)
+            logger.info(
+                "%s batch %d for %s: %d records, %d failed, %d calls in %.2fs",
+                object_type,
+                report.number,
+                account,
+                report.records,
+                report.failed,
+                report.api_calls,
+                report.seconds,
+            )
+        if on_batch:
+            on_batch(report)
+
+    def collect(futures):
+        # Record every batch that finished before raising for one that failed
+        for future in sorted(futures, key=lambda future: future.exception() is not None):
+            finish(future.result())
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"crm-push-{account.pk}")
+    try:
+        pending = set()
+        batches = row_batches(mapping, queryset, batch_size=batch_size, after_pk=after_pk)
+        mappings = CrmObjectMapping.objects.filter(account=account, object_type=object_type)
+        for number, rows in enumerate(batches, start=1):
+            stored = {
+                local_id: (external_id, digest)
+                for local_id, external_id, digest in mappings.filter(
+                    local_id__in=[row["pk"] for row in rows]
+                ).values_list("local_id", "external_id", "payload_hash")
+            }
+            report, items = prepare_batch(mapping, number, rows, stored)
+            if dry_run or not items:
+                finish(report)
+                continue
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(send_batch, client, mapping, report, items))
+        collect(wait(pending).done)
+    finally:
+        # Don't start queued batches once one has raised
+        pool.shutdown(cancel_futures=True)
+
+    result.seconds = time.perf_counter() - started
+    return result
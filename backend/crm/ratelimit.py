@@ -0,0 +1,69 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens a second, up to `capacity` saved
+
+    Every worker pushing to an account takes a token per API call from
+    the same bucket, so together they stay under the account's quota
+    however many threads there are.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take `tokens`, sleeping until they are available
+
+        returns:
+            seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """
+        Empty the bucket for `seconds`, e.g. after the API answers 429
+
+        Overlapping pauses end together rather than adding up, so workers
+        hitting the same 429 wait once for the Retry-After between them.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def bucket_for(account) -> TokenBucket:
+    """The process-wide bucket of a `CrmAccount`, rebuilt if its quota changed."""
+    with _lock:
+        bucket = _buckets.get(account.pk)
+        if bucket is None or (bucket.rate, bucket.capacity) != (account.requests_per_second, account.burst):
+            bucket = _buckets[account.pk] = TokenBucket(account.requests_per_second, account.burst)
+        return bucket
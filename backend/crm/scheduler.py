@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from instrumentation.metrics import REGISTRY
+
+from .client import get_crm_settings
+from .mapping import MAPPINGS
+from .models import CrmAccount, CrmSyncState, SyncRun
+from .sync import SyncAlreadyRunning, changed_rows, sync_objects
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """One account's daily sync of an object type, once it is due."""
+
+    account: CrmAccount
+    object_type: str
+    due: datetime
+    # The due time, or later while a failed run waits to be retried
+    not_before: datetime
+    # Rows that may need pushing, if counted
+    pending: int | None = None
+
+    @property
+    def key(self) -> tuple:
+        return self.account.pk, self.object_type
+
+
+def window_start(now: datetime) -> datetime:
+    """Start of the latest sync window to have opened by `now`, in local time."""
+    local = timezone.localtime(now)
+    start = local.replace(hour=get_crm_settings()["SCHEDULE_WINDOW_START_HOUR"], minute=0, second=0, microsecond=0)
+    return start if start <= local else start - timedelta(days=1)
+
+
+def slot_offset(account_pk: int, window: timedelta) -> timedelta:
+    """
+    When in the window an account's syncs are due
+
+    A hash of the pk spreads accounts evenly over the window and keeps
+    each at the same time every day, whichever accounts come and go.
+    """
+    digest = hashlib.blake2b(str(account_pk).encode(), digest_size=8).digest()
+    return window * (int.from_bytes(digest) / 2**64)
+
+
+def outstanding_jobs(
+    now: datetime | None = None, count_pending: bool = True, pending_counts: dict | None = None
+) -> tuple[list[Job], set]:
+    """
+    The syncs that are due in the current window and haven't succeeded yet
+
+    Syncs already running, here or in another process, aren't queued
+    again. With `count_pending`, jobs are ordered by how many rows they
+    may have to push, most first, so the accounts with the most changes
+    aren't left to the end of the window. Counting scans the whole table,
+    so callers polling this pass `pending_counts`, a dict the counts are
+    kept in by (account pk, object type, due), and each job is only
+    counted when it first falls due.
+
+    returns:
+        (jobs in the order to start them, (account pk, object type) of
+        the syncs running now)
+    """
+    now = now or timezone.now()
+    config = get_crm_settings()
+    start = window_start(now)
+    window = timedelta(hours=config["SCHEDULE_WINDOW_HOURS"])
+    retry = timedelta(seconds=config["SCHEDULE_RETRY_SECONDS"])
+
+    runs = SyncRun.objects.filter(dry_run=False).values("account", "object_type").order_by()
+    succeeded = {
+        (row["account"], row["object_type"]): row["last"]
+        for row in runs.filter(status=SyncRun.SUCCEEDED, created__gte=start).annotate(last=Max("created"))
+    }
+    failed = {
+        (row["account"], row["object_type"]): row["last"]
+        for row in runs.filter(status=SyncRun.FAILED, finished_at__gte=now - retry).annotate(last=Max("finished_at"))
+    }
+    running = {
+        (row["account"], row["object_type"])
+        for row in runs.filter(
+            status=SyncRun.RUNNING, modified__gte=now - timedelta(seconds=config["STALE_RUN_SECONDS"])
+        )
+    }
+    high_water_marks = {
+        (state.account_id, state.object_type): state.high_water_mark for state in CrmSyncState.objects.all()
+    }
+
+    pending_counts = {} if pending_counts is None else pending_counts
+    jobs = []
+    for account in CrmAccount.objects.filter(active=True).order_by("pk"):
+        due = start + slot_offset(account.pk, window)
+        if due > now:
+            continue
+        for object_type in MAPPINGS:
+            key = (account.pk, object_type)
+            if key in running or (key in succeeded and succeeded[key] >= due):
+                continue
+            not_before = max(due, failed[key] + retry) if key in failed else due
+            job = Job(account, object_type, due, not_before)
+            if count_pending:
+                counted = (account.pk, object_type, due)
+                if counted not in pending_counts:
+                    pending_counts[counted] = changed_rows(account, object_type, high_water_marks.get(key)).count()
+                job.pending = pending_counts[counted]
+            jobs.append(job)
+    jobs.sort(key=lambda job: (-(job.pending or 0), job.due))
+    return jobs, running
+
+
+class Scheduler:
+    """
+    Runs every active account's daily syncs, a few at a time
+
+    Each tick starts the outstanding jobs whose time has come, most
+    pending changes first, while fewer than `max_concurrent` syncs run
+    in all and fewer than `max_per_account` for the account. Syncs
+    running in other processes count towards both limits, so a cron run
+    overlapping the daemon doesn't exceed them, and a sync whose
+    previous run is still going is left alone.
+    """
+
+    def __init__(self, max_concurrent: int | None = None, max_per_account: int | None = None, **sync_kwargs):
+        config = get_crm_settings()
+        self.max_concurrent = max_concurrent or config["SCHEDULE_MAX_CONCURRENT"]
+        self.max_per_account = max_per_account or config["SCHEDULE_MAX_PER_ACCOUNT"]
+        self.sync_kwargs = sync_kwargs
+        # Set whenever a sync finishes, and a slot may have freed up
+        self.finished = threading.Event()
+        self._running = set()
+        # Pending rows of the outstanding jobs, counted once as they fall due
+        self._pending_counts = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="crm-sync")
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._running)
+
+    def tick(self, now: datetime | None = None) -> list[Job]:
+        """Start the jobs there are slots for; returns the jobs started."""
+        now = now or timezone.now()
+        jobs, running = outstanding_jobs(now, pending_counts=self._pending_counts)
+        outstanding = {(job.account.pk, job.object_type, job.due) for job in jobs}
+        for counted in self._pending_counts.keys() - outstanding:
+            del self._pending_counts[counted]
+        with self._lock:
+            running |= self._running
+        per_account = Counter(account_pk for account_pk, _ in running)
+        slots = self.max_concurrent - len(running)
+
+        started = []
+        for job in jobs:
+            if slots <= 0:
+                break
+            if job.key in running or job.not_before > now or per_account[job.account.pk] >= self.max_per_account:
+                continue
+            with self._lock:
+                self._running.add(job.key)
+            self._pool.submit(self._run, job)
+            running.add(job.key)
+            per_account[job.account.pk] += 1
+            slots -= 1
+            started.append(job)
+        if jobs:
+            logger.info("%d CRM syncs outstanding, started %d", len(jobs), len(started))
+        return started
+
+    def _run(self, job: Job):
+        try:
+            run = sync_objects(job.account, job.object_type, **self.sync_kwargs)
+            logger.info(
+                "Synced %d/%d %s to %s in %.2fs", run.succeeded, run.records, job.object_type, job.account, run.seconds
+            )
+        except SyncAlreadyRunning as e:
+            logger.info("Skipping: %s", e)
+        except Exception:
+            # Retried, and resumed, once SCHEDULE_RETRY_SECONDS have passed
+            logger.exception("%s sync for %s failed", job.object_type, job.account)
+        finally:
+            connection.close()
+            with self._lock:
+                self._running.discard(job.key)
+            self.finished.set()
+
+    def run(self, once: bool = False, stop: threading.Event | None = None):
+        """
+        Start jobs as they fall due and slots free up
+
+        args:
+            once: return once nothing more can start and every sync
+                started has finished, e.g. when run from cron
+            stop: event that ends the loop, after the syncs running finish
+        """
+        stop = stop or threading.Event()
+        poll = get_crm_settings()["SCHEDULE_POLL_SECONDS"]
+        try:
+            while not stop.is_set():
+                self.finished.clear()
+                started = self.tick()
+                if once and not started and not self.busy:
+                    break
+                self.finished.wait(poll)
+        finally:
+            self._pool.shutdown(wait=True)
+
+
+@REGISTRY.per_scrape
+def _outstanding_snapshot() -> tuple[datetime, list[Job], set]:
+    now = timezone.now()
+    return now, *outstanding_jobs(now, count_pending=False)
+
+
+def _queue_depth():
+    _, jobs, _ = _outstanding_snapshot()
+    return {(): len(jobs)}
+
+
+def _queue_lag():
+    now, jobs, _ = _outstanding_snapshot()
+    return {(): max(((now - job.due).total_seconds() for job in jobs), default=0.0)}
+
+
+def _running_syncs():
+    _, _, running = _outstanding_snapshot()
+    return {(): len(running)}
+
+
+SYNC_QUEUE_DEPTH = REGISTRY.gauge(
+    "crm_sync_queue_depth",
+    "Daily CRM syncs that are due and haven't started or succeeded",
+    collect=_queue_depth,
+)
+SYNC_QUEUE_LAG = REGISTRY.gauge(
+    "crm_sync_queue_lag_seconds",
+    "How long the longest-waiting due CRM sync has been due",
+    collect=_queue_lag,
+)
+SYNCS_RUNNING = REGISTRY.gauge(
+    "crm_syncs_running",
+    "CRM syncs running in any process",
+    collect=_running_syncs,
+)
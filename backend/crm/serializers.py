@@ -0,0 +1,59 @@
+from rest_framework import serializers
+
+from .models import SyncBatch, SyncRun
+
+
+class SyncBatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SyncBatch
+        fields = [
+            "number",
+            "first_pk",
+            "last_pk",
+            "records",
+            "unchanged",
+            "succeeded",
+            "failed",
+            "api_calls",
+            "bytes",
+            "seconds",
+            "errors",
+        ]
+
+
+class SyncRunSerializer(serializers.ModelSerializer):
+    account_name = serializers.CharField(source="account.name", read_only=True)
+    records_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SyncRun
+        fields = [
+            "id",
+            "account",
+            "account_name",
+            "object_type",
+            "status",
+            "dry_run",
+            "since",
+            "until",
+            "resumed_from",
+            "created",
+            "finished_at",
+            "seconds",
+            "batches",
+            "records",
+            "new",
+            "changed",
+            "unchanged",
+            "skipped",
+            "succeeded",
+            "failed",
+            "api_calls",
+            "bytes",
+            "records_per_second",
+            "checkpoint_pk",
+            "latency_p50",
+            "latency_p95",
+            "latency_p99",
+            "error",
+        ]
@@ -0,0 +1,196 @@
+import logging
+import statistics
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .client import get_crm_settings
+from .mapping import MAPPINGS
+from .models import CrmAccount, CrmObjectMapping, CrmSyncState, SyncBatch, SyncRun
+from .push import PushResult, push_objects
+
+logger = logging.getLogger(__name__)
+
+# PushResult totals copied onto the SyncRun
+RUN_TOTALS = (
+    "batches",
+    "records",
+    "new",
+    "changed",
+    "unchanged",
+    "skipped",
+    "succeeded",
+    "failed",
+    "api_calls",
+    "bytes",
+    "checkpoint_pk",
+)
+# Errors kept per SyncBatch row
+MAX_BATCH_ERRORS = 20
+# Least time between saves of a run's totals while only unchanged rows are read
+PROGRESS_INTERVAL = 5.0
+
+
+class SyncAlreadyRunning(Exception):
+    """The account's previous sync of the object type hasn't finished."""
+
+
+def changed_rows(account, object_type: str, since):
+    """
+    Rows whose payload may have changed since `since`, or that need a push anyway
+
+    Rows that changed themselves, or through their deals, employees or
+    company, are found from `modified`; rows never pushed to the account,
+    or whose last push failed, have no payload hash to compare against.
+    Every other row is skipped before it is even read.
+    """
+    changed = MAPPINGS[object_type].model.objects.changed_since(since)
+    if since is None:
+        return changed
+    pushed = CrmObjectMapping.objects.filter(account=account, object_type=object_type, local_id=OuterRef("pk")).exclude(
+        payload_hash=""
+    )
+    return changed | MAPPINGS[object_type].queryset().filter(~Exists(pushed))
+
+
+def latency_percentiles(latencies: list[float]) -> tuple:
+    """p50, p95 and p99 of batch latencies, or Nones without any."""
+    if not latencies:
+        return None, None, None
+    if len(latencies) == 1:
+        return latencies[0], latencies[0], latencies[0]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def claim_run(account, object_type: str, full: bool, dry_run: bool) -> SyncRun:
+    """
+    Start a SyncRun, resuming the last one if it didn't finish
+
+    A failed run, or a running one that stopped sending heartbeats, is
+    resumed over the same window from its checkpoint rather than started
+    over. Dry runs never resume and aren't resumed from.
+
+    raises:
+        SyncAlreadyRunning: if the previous run is still going
+    """
+    stale_before = timezone.now() - timedelta(seconds=get_crm_settings()["STALE_RUN_SECONDS"])
+    with transaction.atomic():
+        # Serialises claims for the account where the database supports it
+        CrmAccount.objects.select_for_update().filter(pk=account.pk).first()
+        last = SyncRun.objects.filter(account=account, object_type=object_type, dry_run=False).first()
+        if last and last.status == SyncRun.RUNNING:
+            if last.modified >= stale_before:
+                raise SyncAlreadyRunning(f"{object_type} sync {last.pk} for {account} is still running")
+            last.status, last.error, last.finished_at = SyncRun.FAILED, "Abandoned: no heartbeat", timezone.now()
+            last.save(update_fields=["status", "error", "finished_at", "modified"])
+
+        run = SyncRun(account=account, object_type=object_type, dry_run=dry_run)
+        if last and last.status == SyncRun.FAILED and not (full or dry_run):
+            run.resumed_from = last
+            run.since, run.until, run.checkpoint_pk = last.since, last.until, last.checkpoint_pk
+        else:
+            state = CrmSyncState.objects.filter(account=account, object_type=object_type).first()
+            run.since = None if full or state is None else state.high_water_mark
+            run.until = timezone.now()
+        run.save()
+    return run
+
+
+def sync_objects(account, object_type: str, full: bool = False, dry_run: bool = False, **push_kwargs) -> SyncRun:
+    """
+    Push what changed since the account's last sync of an object type
+
+    Candidate rows are narrowed by `modified` first, then by payload hash
+    in `push_objects`, so only rows whose outbound properties actually
+    changed are sent. Progress is recorded in a SyncRun, with a SyncBatch
+    for every batch that called the API, and a run that fails is resumed
+    from its checkpoint by the next one. The window's end is taken before
+    reading and stored as the high-water mark once every batch has been
+    sent; a dry run leaves it alone.
+
+    args:
+        account: the CrmAccount to sync
+        object_type: 'companies' or 'contacts'
+        full: ignore the high-water mark and hash every row
+        dry_run: count what would be sent without calling the API
+        **push_kwargs: passed through to `push_objects`
+
+    returns:
+        the finished SyncRun
+
+    raises:
+        SyncAlreadyRunning: if the previous run is still going
+    """
+    run = claim_run(account, object_type, full, dry_run)
+    if run.resumed_from_id:
+        logger.info(
+            "Resuming %s sync %d for %s after pk %d", object_type, run.resumed_from_id, account, run.checkpoint_pk
+        )
+    else:
+        logger.info("Syncing %s to %s with changes since %s", object_type, account, run.since or "the beginning")
+
+    started = time.perf_counter()
+    progress = PushResult(checkpoint_pk=run.checkpoint_pk)
+    latencies = []
+    saved = time.monotonic()
+
+    def save_progress():
+        for name in RUN_TOTALS:
+            setattr(run, name, getattr(progress, name))
+        run.seconds = time.perf_counter() - started
+        run.save()
+
+    def on_batch(report):
+        nonlocal saved
+        progress.add(report)
+        if report.api_calls:
+            latencies.append(report.seconds)
+            SyncBatch.objects.create(
+                run=run,
+                number=report.number,
+                first_pk=report.first_pk,
+                last_pk=report.last_pk,
+                records=report.records,
+                unchanged=report.unchanged,
+                succeeded=report.succeeded,
+                failed=report.failed,
+                api_calls=report.api_calls,
+                bytes=report.bytes,
+                seconds=report.seconds,
+                errors=report.errors[:MAX_BATCH_ERRORS],
+            )
+        elif time.monotonic() - saved < PROGRESS_INTERVAL:
+            return
+        save_progress()
+        saved = time.monotonic()
+
+    try:
+        push_objects(
+            account,
+            object_type,
+            queryset=changed_rows(account, object_type, run.since),
+            after_pk=run.checkpoint_pk,
+            dry_run=dry_run,
+            on_batch=on_batch,
+            **push_kwargs,
+        )
+    except BaseException as e:
+        run.status, run.error = SyncRun.FAILED, f"{type(e).__name__}: {e}"
+        raise
+    else:
+        run.status = SyncRun.SUCCEEDED
+        if not dry_run:
+            CrmSyncState.objects.update_or_create(
+                account=account,
+                object_type=object_type,
+                defaults={"high_water_mark": run.until, "last_run": timezone.now()},
+            )
+    finally:
+        run.latency_p50, run.latency_p95, run.latency_p99 = latency_percentiles(latencies)
+        run.finished_at = timezone.now()
+        save_progress()
+    return run
@@ -0,0 +1,301 @@
+import threading
+from unittest import mock
+
+import factory
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from companies.factories import CompanyFactory, CountryFactory, DealFactory, EmployeeFactory
+from companies.models import Company
+
+from .client import CrmError
+from .fake_hubspot import running_fake_hubspot
+from .matching import MATCH_KEYS, MatchIndex, refresh_mappings
+from .models import CrmAccount, CrmObjectMapping, CrmSyncState, SyncRun
+from .push import push_objects
+from .ratelimit import TokenBucket
+from .scheduler import Scheduler, outstanding_jobs
+from .sync import SyncAlreadyRunning, changed_rows, sync_objects
+
+
+@pytest.fixture
+def fake_hubspot(settings):
+    with running_fake_hubspot() as (url, fake):
+        settings.CRM = {"BASE_URL": url, "RETRY_BACKOFF": 0.01, "RETRY_BACKOFF_MAX": 0.05}
+        yield fake
+
+
+@pytest.fixture
+def account(db):
+    return CrmAccount.objects.create(name="Test", access_token="test-token", requests_per_second=1000, burst=100)
+
+
+def test_token_bucket_waits_for_tokens_at_the_configured_rate():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0], sleep=sleep)
+
+    waits = [bucket.acquire() for _ in range(4)]
+    assert waits == [0.0, 0.0, pytest.approx(0.1), pytest.approx(0.1)]
+
+    bucket.pause(1.0)
+    assert bucket.acquire() == pytest.approx(1.1)
+
+
+def test_token_bucket_pauses_from_several_threads_do_not_add_up():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0], sleep=sleep)
+    threads = [threading.Thread(target=bucket.pause, args=(1.0,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert bucket.acquire() == pytest.approx(1.1)
+
+
+@pytest.mark.django_db
+def test_push_upserts_companies_and_contacts_in_batches_of_100(fake_hubspot, account):
+    country = CountryFactory()
+    companies = CompanyFactory.create_batch(
+        250, country=country, companies_house_id=factory.Sequence(lambda n: f"{n:08d}")
+    )
+    DealFactory(company=companies[0], amount_raised=1000)
+    for n, company in enumerate(companies[:3]):
+        EmployeeFactory(company=company, name=f"Ada Lovelace{n}", email=f"ada{n}@example.com")
+
+    result = push_objects(account, "companies", workers=3)
+
+    upserts = [body for _, path, body in fake_hubspot.calls if path.endswith("/companies/batch/upsert")]
+    assert sorted(len(body["inputs"]) for body in upserts) == [50, 100, 100]
+    assert (result.records, result.succeeded, result.failed, result.api_calls) == (250, 250, 0, 3)
+    assert result.checkpoint_pk == companies[-1].pk
+    pushed = fake_hubspot.find("companies", "companies_house_id", companies[0].companies_house_id)
+    assert pushed["properties"]["total_deals_amount"] == "1000.0"
+    assert pushed["properties"]["country"] == country.name
+
+    push_objects(account, "contacts")
+    contact = fake_hubspot.find("contacts", "email", "ada0@example.com")
+    assert contact["properties"]["firstname"] == "Ada"
+    assert contact["properties"]["company"] == companies[0].name
+
+    # Upserts match on the id property, so pushing again creates nothing
+    push_objects(account, "companies")
+    assert len(fake_hubspot.objects["companies"]) == 250
+
+
+@pytest.mark.django_db
+def test_push_retries_throttled_and_failed_calls(fake_hubspot, account):
+    CompanyFactory.create_batch(3, companies_house_id=factory.Sequence(lambda n: f"R{n:07d}"))
+    fake_hubspot.fail_next(429, headers={"Retry-After": "0"})
+    fake_hubspot.fail_next(503)
+
+    result = push_objects(account, "companies", workers=1)
+
+    assert (result.succeeded, result.failed, result.api_calls) == (3, 0, 3)
+
+    Company.objects.update(description="Changed")
+    fake_hubspot.fail_next(500, times=10)
+    result = push_objects(account, "companies", workers=1)
+    assert (result.changed, result.succeeded, result.failed) == (3, 0, 3)
+    assert result.errors[0]["status"] == 500
+    # Failed rows lose their hash, so they are retried whether or not they change
+    assert not CrmObjectMapping.objects.exclude(payload_hash="").exists()
+
+    account.access_token = "revoked"
+    with pytest.raises(CrmError) as e:
+        push_objects(account, "companies")
+    assert e.value.is_auth_error
+
+
+def test_match_index_matches_on_normalised_keys_and_skips_ambiguous_ones():
+    index = MatchIndex(MATCH_KEYS["companies"])
+    index.add("1", {"companies_house_id": "123", "name": "Acme Widgets Ltd"})
+    index.add("2", {"name": "The Duplicate Co"})
+    index.add("3", {"name": "duplicate", "domain": "https://www.dup.example/about"})
+
+    assert index.match({"companies_house_id": "00000123", "name": "Other"}) == ("1", "companies_house_id")
+    assert index.match({"companies_house_id": "", "name": "ACME widgets limited"}) == ("1", "name")
+    assert index.match({"companies_house_id": "", "name": "Duplicate"}) is None
+    assert index.ambiguous == 1
+
+
+@pytest.mark.django_db
+def test_pushes_update_matched_objects_and_only_create_new_ones(fake_hubspot, account):
+    existing = fake_hubspot.add("companies", {"name": "Acme Widgets Ltd"})
+    for n in range(150):
+        fake_hubspot.add("companies", {"name": f"Unrelated {n}"})
+    acme = CompanyFactory(name="Acme Widgets", companies_house_id="")
+    CompanyFactory(name="Acme Widgets", companies_house_id="", country=acme.country)
+    new = CompanyFactory(name="Brand New", companies_house_id="NEW00001")
+    unpushable = CompanyFactory(name="No Number", companies_house_id="")
+
+    matched = refresh_mappings(account, "companies")
+
+    assert (matched.remote, matched.api_calls, matched.matched["name"], matched.unmatched) == (151, 2, 2, 2)
+    result = push_objects(account, "companies")
+    assert (result.records, result.skipped, result.succeeded) == (3, 1, 3)
+    assert len(fake_hubspot.objects["companies"]) == 152
+    assert fake_hubspot.objects["companies"][existing["id"]]["properties"]["country"] == acme.country.name
+
+    # The object created by the upsert is mapped, so the next push updates it
+    mapped = CrmObjectMapping.objects.get(account=account, local_id=new.pk)
+    assert fake_hubspot.objects["companies"][mapped.external_id]["properties"]["name"] == "Brand New"
+    assert not CrmObjectMapping.objects.filter(local_id=unpushable.pk).exists()
+    calls = len(fake_hubspot.calls)
+    Company.objects.filter(pk=new.pk).update(description="Now described")
+    push_objects(account, "companies")
+    assert [path for _, path, _ in fake_hubspot.calls[calls:]] == ["/crm/v3/objects/companies/batch/update"]
+
+
+@pytest.mark.django_db
+def test_push_upserts_rows_whose_object_was_deleted_in_the_crm(fake_hubspot, account):
+    company = CompanyFactory(companies_house_id="GONE0001")
+    push_objects(account, "companies")
+    deleted = CrmObjectMapping.objects.get(local_id=company.pk).external_id
+    fake_hubspot.objects["companies"].pop(deleted)
+
+    Company.objects.filter(pk=company.pk).update(description="Changed")
+    calls = len(fake_hubspot.calls)
+    result = push_objects(account, "companies")
+
+    assert (result.changed, result.succeeded, result.failed) == (1, 1, 0)
+    assert [path.rsplit("/", 1)[1] for _, path, _ in fake_hubspot.calls[calls:]] == ["update", "upsert"]
+    mapped = CrmObjectMapping.objects.get(local_id=company.pk)
+    assert (mapped.matched_on, mapped.payload_hash != "") == ("push", True)
+    assert fake_hubspot.objects["companies"][mapped.external_id]["properties"]["description"] == "Changed"
+    assert mapped.external_id != deleted
+
+
+@pytest.mark.django_db
+def test_push_only_hashes_the_row_sent_for_a_shared_upsert_key(fake_hubspot, account):
+    first, last = EmployeeFactory.create_batch(2, email="shared@example.com")
+
+    result = push_objects(account, "contacts")
+
+    assert result.succeeded == 2
+    assert len(fake_hubspot.objects["contacts"]) == 1
+    hashes = dict(CrmObjectMapping.objects.values_list("local_id", "payload_hash"))
+    assert hashes[first.pk] == "" and hashes[last.pk] != ""
+    # The row whose payload was dropped goes out on the next push
+    assert push_objects(account, "contacts").records == 1
+
+
+@pytest.mark.django_db
+def test_sync_only_pushes_rows_whose_payload_changed(fake_hubspot, account):
+    companies = CompanyFactory.create_batch(5, companies_house_id=factory.Sequence(lambda n: f"S{n:07d}"))
+
+    dry_run = sync_objects(account, "companies", dry_run=True)
+    assert (dry_run.new, dry_run.changed, dry_run.records) == (5, 0, 5)
+    assert not fake_hubspot.calls
+    assert sync_objects(account, "companies").succeeded == 5
+
+    # Touched without a payload change, and changed through a new deal
+    companies[0].save()
+    DealFactory(company=companies[1], amount_raised=500)
+    result = sync_objects(account, "companies")
+    assert (result.unchanged, result.changed, result.records) == (1, 1, 1)
+    pushed = fake_hubspot.find("companies", "companies_house_id", companies[1].companies_house_id)
+    assert pushed["properties"]["total_deals_amount"] == "500.0"
+
+    # Rows modified before the high-water mark aren't read at all
+    assert sync_objects(account, "companies").batches == 0
+
+
+@pytest.mark.django_db
+def test_failed_sync_resumes_from_its_checkpoint(fake_hubspot, account):
+    companies = CompanyFactory.create_batch(5, companies_house_id=factory.Sequence(lambda n: f"C{n:07d}"))
+    upsert = fake_hubspot.batch_upsert
+
+    def revoke_after_first_batch(object_type, inputs):
+        fake_hubspot.access_token = "revoked"
+        return upsert(object_type, inputs)
+
+    fake_hubspot.batch_upsert = revoke_after_first_batch
+    with pytest.raises(CrmError):
+        sync_objects(account, "companies", batch_size=2, workers=1)
+    failed = SyncRun.objects.get()
+    assert failed.status == SyncRun.FAILED
+    assert (failed.succeeded, failed.checkpoint_pk) == (2, companies[1].pk)
+    assert failed.sync_batches.get().api_calls == 1
+    assert not CrmSyncState.objects.exists()
+
+    fake_hubspot.batch_upsert, fake_hubspot.access_token = upsert, "test-token"
+    resumed = sync_objects(account, "companies", batch_size=2, workers=1)
+    assert resumed.resumed_from == failed
+    assert (resumed.status, resumed.records, resumed.batches) == (SyncRun.SUCCEEDED, 3, 2)
+    assert (resumed.since, resumed.until) == (failed.since, failed.until)
+    assert resumed.checkpoint_pk == companies[-1].pk
+    assert CrmSyncState.objects.get().high_water_mark == failed.until
+
+    SyncRun.objects.create(account=account, object_type="companies", until=timezone.now())
+    with pytest.raises(SyncAlreadyRunning):
+        sync_objects(account, "companies")
+
+    response = APIClient().get("/api/v1/crm/summary/")
+    assert response.status_code == 200
+    [summary] = response.json()["accounts"]
+    assert (summary["runs"], summary["failed_runs"], summary["records"]) == (3, 1, 5)
+    assert summary["last_status"] == SyncRun.RUNNING
+    runs = APIClient().get("/api/v1/crm/runs/", {"status": SyncRun.FAILED}).json()
+    assert [run["id"] for run in runs["results"]] == [failed.pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_scheduler_runs_due_syncs_with_the_most_pending_changes_first(fake_hubspot, settings):
+    settings.CRM = {**settings.CRM, "SCHEDULE_WINDOW_HOURS": 0}
+    companies = CompanyFactory.create_batch(3, companies_house_id=factory.Sequence(lambda n: f"D{n:07d}"))
+    busy, quiet, behind = (
+        CrmAccount.objects.create(name=name, access_token="test-token", requests_per_second=1000, burst=100)
+        for name in ("Busy", "Quiet", "Behind")
+    )
+    for company in companies[:2]:
+        CrmObjectMapping.objects.create(
+            account=quiet, object_type="companies", local_id=company.pk, external_id="1", payload_hash="x"
+        )
+    CrmSyncState.objects.create(account=quiet, object_type="companies", high_water_mark=timezone.now())
+    SyncRun.objects.create(account=behind, object_type="companies", until=timezone.now())
+
+    jobs, running = outstanding_jobs()
+    assert running == {(behind.pk, "companies")}
+    companies_jobs = [job.account for job in jobs if job.object_type == "companies"]
+    assert companies_jobs == [busy, quiet]
+    assert next(job for job in jobs if job.account == quiet and job.object_type == "companies").pending == 1
+
+    metrics = APIClient().get("/metrics").content.decode()
+    assert f"crm_sync_queue_depth {len(jobs)}" in metrics
+    assert "crm_syncs_running 1" in metrics
+
+    Scheduler(max_concurrent=2).run(once=True)
+    # Behind's contacts wait for its companies sync, which never finishes
+    jobs, running = outstanding_jobs()
+    assert [(job.account, job.object_type) for job in jobs] == [(behind, "contacts")]
+    assert SyncRun.objects.filter(status=SyncRun.SUCCEEDED).count() == 4
+    assert SyncRun.objects.get(account=quiet, object_type="companies", status=SyncRun.SUCCEEDED).records == 1
+    assert SyncRun.objects.filter(account=behind, object_type="companies").count() == 1
+
+
+@pytest.mark.django_db
+def test_scheduler_counts_pending_rows_once_a_job_is_due_and_once_per_scrape(settings, account):
+    settings.CRM = {**settings.CRM, "SCHEDULE_WINDOW_HOURS": 0}
+    CompanyFactory.create_batch(2)
+    pending_counts = {}
+
+    with mock.patch("crm.scheduler.changed_rows", wraps=changed_rows) as counted:
+        outstanding_jobs(pending_counts=pending_counts)
+        jobs, _ = outstanding_jobs(pending_counts=pending_counts)
+    assert counted.call_count == 2
+    assert {job.object_type: job.pending for job in jobs}["companies"] == 2
+
+    with mock.patch("crm.scheduler.outstanding_jobs", wraps=outstanding_jobs) as collected:
+        metrics = APIClient().get("/metrics").content.decode()
+    assert collected.call_count == 1
+    assert "crm_sync_queue_depth 2" in metrics
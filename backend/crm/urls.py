@@ -0,0 +1,14 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = "crm"
+
+router = DefaultRouter()
+router.register(r"runs", views.SyncRunViewSet)
+
+urlpatterns = [
+    path("summary/", views.SyncSummaryView.as_view(), name="sync_summary"),
+    path("", include(router.urls)),
+]
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import SyncRun
+from .serializers import SyncBatchSerializer, SyncRunSerializer
+
+DEFAULT_SUMMARY_DAYS = 7
+
+
+class SyncRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The sync run ledger, newest first
+
+    Query params:
+        account: only runs for this CrmAccount id
+        object_type: 'companies' or 'contacts'
+        status: 'running', 'succeeded' or 'failed'
+    """
+
+    queryset = SyncRun.objects.select_related("account")
+    serializer_class = SyncRunSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for name in ("account", "object_type", "status"):
+            if params.get(name):
+                queryset = queryset.filter(**{name: params[name]})
+        return queryset
+
+    @action(detail=True, methods=["get"])
+    def batches(self, request, pk=None):
+        """The batches of one run that called the API, in order."""
+        run = self.get_object()
+        page = self.paginate_queryset(run.sync_batches.all())
+        return self.get_paginated_response(SyncBatchSerializer(page, many=True).data)
+
+
+class SyncSummaryView(APIView):
+    """
+    Per-account sync totals over recent days, slowest accounts first
+
+    Accounts are ordered by their worst p95 batch latency, so accounts
+    with slow or throttled APIs stand out.
+
+    Query params:
+        days: how many days of runs to summarise (default: 7)
+    """
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", DEFAULT_SUMMARY_DAYS))
+        except ValueError:
+            raise ValidationError({"days": "Must be a whole number of days"})
+
+        runs = SyncRun.objects.filter(created__gte=timezone.now() - timedelta(days=days), dry_run=False)
+        latest = SyncRun.objects.filter(
+            account=OuterRef("account"), object_type=OuterRef("object_type"), dry_run=False
+        ).order_by("-created")
+        rows = (
+            runs.values("account", "object_type")
+            .annotate(
+                account_name=F("account__name"),
+                runs=Count("pk"),
+                failed_runs=Count("pk", filter=Q(status=SyncRun.FAILED)),
+                records=Sum("records"),
+                succeeded=Sum("succeeded"),
+                failed=Sum("failed"),
+                unchanged=Sum("unchanged"),
+                api_calls=Sum("api_calls"),
+                bytes=Sum("bytes"),
+                seconds=Sum("seconds"),
+                latency_p95=Max("latency_p95"),
+                latency_p99=Max("latency_p99"),
+                last_run=Max("created"),
+                last_status=Subquery(latest.values("status")[:1]),
+            )
+            .order_by(F("latency_p95").desc(nulls_last=True), "account")
+        )
+        accounts = []
+        for row in rows:
+            row["records_per_second"] = row["records"] / row["seconds"] if row["seconds"] else 0.0
+            accounts.append(row)
+        return Response({"days": days, "accounts": accounts})
@@ -0,0 +1,187 @@
+import bisect
+import functools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds; Prometheus' defaults stretched to cover slow exports and searches
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Histogram:
+    """
+    Prometheus histogram with labels, kept in this process
+
+    Each process keeps its own counts; with several workers, scrape each
+    of them or aggregate at the collector.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Gauge:
+    """
+    Prometheus gauge with labels, set directly or read when scraped
+
+    A gauge given `collect` calls it on every scrape for a dict of label
+    values tuple -> value, so state kept outside this process, e.g. in
+    the database, can be reported by any of them.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.collect = collect
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._series[key] = value
+
+    def render(self) -> list[str]:
+        if self.collect is None:
+            with self._lock:
+                series = dict(self._series)
+        else:
+            try:
+                series = self.collect()
+            except Exception:
+                logger.exception("Collecting %s failed", self.name)
+                return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(series.items()):
+            labels = dict(zip(self.label_names, key))
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._scrape = threading.local()
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def per_scrape(self, func):
+        """
+        Wrap `func` so it runs at most once per `render`
+
+        For gauges whose `collect` functions read the same expensive state;
+        outside a render the wrapper calls `func` every time.
+        """
+
+        @functools.wraps(func)
+        def wrapper():
+            results = getattr(self._scrape, "results", None)
+            if results is None:
+                return func()
+            if func not in results:
+                results[func] = func()
+            return results[func]
+
+        return wrapper
+
+    def render(self) -> str:
+        lines = []
+        self._scrape.results = {}
+        try:
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        finally:
+            self._scrape.results = None
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time from the request reaching the view stack to the response being returned",
+    ("route", "method", "status"),
+)
+REQUEST_DB_DURATION = REGISTRY.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL statements per request",
+    ("route",),
+)
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries",
+    "Number of SQL statements per request",
+    ("route",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_OPENSEARCH_DURATION = REGISTRY.histogram(
+    "http_request_opensearch_duration_seconds",
+    "Wall time of the OpenSearch calls made per request",
+    ("route",),
+)
+REQUEST_OPENSEARCH_TOOK = REGISTRY.histogram(
+    "http_request_opensearch_took_seconds",
+    "Time OpenSearch reported spending on the calls made per request",
+    ("route",),
+)
+REQUEST_SERIALIZE_DURATION = REGISTRY.histogram(
+    "http_request_serialize_duration_seconds",
+    "Time spent in DRF serializers per request",
+    ("route",),
+)
@@ -0,0 +1,99 @@
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .timing import collect_timings, query_timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    # Requests slower than this are logged with their full breakdown
+    "SLOW_REQUEST_SECONDS": 1.0,
+    # Share of slow requests logged, to bound log volume under load
+    "SLOW_REQUEST_SAMPLE_RATE": 1.0,
+}
+
+
+def get_instrumentation_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "INSTRUMENTATION", {})}
+
+
+def route_name(request) -> str:
+    """Low-cardinality route label: the URL name, never the raw path."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.route
+
+
+def server_timing(timings) -> str:
+    entries = [
+        f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.db_queries} queries"',
+        f"serialize;dur={timings.serialize_seconds * 1000:.1f}",
+        f"total;dur={timings.elapsed * 1000:.1f}",
+    ]
+    if timings.opensearch_requests:
+        entries[1:1] = [
+            f'search;dur={timings.opensearch_seconds * 1000:.1f};desc="{timings.opensearch_requests} calls"',
+            f"search-took;dur={timings.opensearch_took_seconds * 1000:.1f}",
+        ]
+    return ", ".join(entries)
+
+
+class InstrumentationMiddleware:
+    """
+    Time each request and where it went: SQL, OpenSearch and serializers
+
+    SQL is timed with `connection.execute_wrapper` on every database;
+    OpenSearch calls and serializers report into the same request-scoped
+    timings from search_service.client and instrumentation.serializers.
+    The breakdown is returned as a Server-Timing header, recorded in the
+    per-route histograms served by /metrics, and logged for slow requests.
+    Streaming responses are timed up to the point they start streaming.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_instrumentation_settings()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        with collect_timings() as timings, ExitStack() as stack:
+            # Wrappers live on this thread's connection objects, so they
+            # apply whether or not the connection is open yet
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            response = self.get_response(request)
+
+            elapsed = timings.elapsed
+            route = route_name(request)
+            metrics.REQUEST_DURATION.observe(
+                elapsed, route=route, method=request.method, status=f"{response.status_code // 100}xx"
+            )
+            metrics.REQUEST_DB_DURATION.observe(timings.db_seconds, route=route)
+            metrics.REQUEST_DB_QUERIES.observe(timings.db_queries, route=route)
+            metrics.REQUEST_SERIALIZE_DURATION.observe(timings.serialize_seconds, route=route)
+            if timings.opensearch_requests:
+                metrics.REQUEST_OPENSEARCH_DURATION.observe(timings.opensearch_seconds, route=route)
+                metrics.REQUEST_OPENSEARCH_TOOK.observe(timings.opensearch_took_seconds, route=route)
+
+            if config["SERVER_TIMING"]:
+                response["Server-Timing"] = server_timing(timings)
+
+            if elapsed >= config["SLOW_REQUEST_SECONDS"] and random.random() < config["SLOW_REQUEST_SAMPLE_RATE"]:
+                logger.warning(
+                    "Slow request %s %s (%s): %s",
+                    request.method,
+                    request.path,
+                    route,
+                    timings.breakdown(),
+                )
+        return response
@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from .timing import timed_serialization
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List counterpart of `TimedSerializerMixin`, set as `Meta.list_serializer_class`."""
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Add the time spent building `serializer.data` to the request timings
+
+    Only the top-level `data` is timed: nested serializers render through
+    `to_representation`, so they aren't counted twice.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
@@ -0,0 +1,103 @@
+import contextvars
+import heapq
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Statements kept per request for the slow-request log
+SLOWEST_QUERIES = 5
+
+
+@dataclass
+class RequestTimings:
+    """Where one request spent its time, filled in by the hooks below."""
+
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    # Min-heap of (seconds, sql), so the fastest is dropped first
+    slowest_queries: list = field(default_factory=list)
+    opensearch_requests: int = 0
+    opensearch_seconds: float = 0.0
+    opensearch_took_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record_query(self, sql: str, seconds: float):
+        self.db_queries += 1
+        self.db_seconds += seconds
+        entry = (seconds, sql)
+        if len(self.slowest_queries) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest_queries, entry)
+        elif entry > self.slowest_queries[0]:
+            heapq.heapreplace(self.slowest_queries, entry)
+
+    def breakdown(self) -> dict:
+        return {
+            "total_ms": round(self.elapsed * 1000, 2),
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "opensearch_requests": self.opensearch_requests,
+            "opensearch_ms": round(self.opensearch_seconds * 1000, 2),
+            "opensearch_took_ms": round(self.opensearch_took_seconds * 1000, 2),
+            "serialize_ms": round(self.serialize_seconds * 1000, 2),
+            "slowest_queries": [
+                {"ms": round(seconds * 1000, 2), "sql": sql}
+                for seconds, sql in sorted(self.slowest_queries, reverse=True)
+            ],
+        }
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def current_timings():
+    """Timings of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+@contextmanager
+def collect_timings():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def query_timer(execute, sql, params, many, context):
+    """`connection.execute_wrapper` hook adding each statement to the request."""
+    timings = current_timings()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(sql, time.perf_counter() - started)
+
+
+def record_opensearch(seconds: float, took_ms=None):
+    """Record one OpenSearch call: wall time, and the server's own `took`."""
+    timings = current_timings()
+    if timings is None:
+        return
+    timings.opensearch_requests += 1
+    timings.opensearch_seconds += seconds
+    if took_ms is not None:
+        timings.opensearch_took_seconds += took_ms / 1000
+
+
+@contextmanager
+def timed_serialization():
+    timings = current_timings()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.serialize_seconds += time.perf_counter() - started
@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+
+from .metrics import REGISTRY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics(request):
+    """Prometheus scrape endpoint for this process' request histograms and the gauges."""
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -1,5 +1,12 @@
 from django.core.management.base import BaseCommand
+
 from search_service.client import get_opensearch_client
+from search_service.indexing import (
+    COMPANY_INDEX,
+    EMPLOYEE_INDEX,
+    index_versions,
+    is_legacy_index,
+)
 
 
 class Command(BaseCommand):
@@ -9,14 +16,13 @@ class Command(BaseCommand):
         """Handle the command."""
         client = get_opensearch_client()
 
-        if client.indices.exists(index="companies"):
-            client.indices.delete(index="companies")
-            self.stdout.write(
-                self.style.SUCCESS("Successfully deleted companies index")
-            )
+        for alias in (COMPANY_INDEX, EMPLOYEE_INDEX):
+            names = [name for _, name in index_versions(alias, client)]
+            if is_legacy_index(alias, client):
+                names.append(alias)
 
-        if client.indices.exists(index="employees"):
-            client.indices.delete(index="employees")
-            self.stdout.write(
-                self.style.SUCCESS("Successfully deleted employees index")
-            )
+            for name in names:
+                client.indices.delete(index=name)
+                self.stdout.write(
+                    self.style.SUCCESS(f"Successfully deleted {name} index")
+                )
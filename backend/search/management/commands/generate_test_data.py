@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 import random
 from faker import Faker
 from companies.models import Company, Employee, Country
+from search.models import IndexQueueEntry
+from search_service.queue import enqueue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -126,6 +128,8 @@ class Command(BaseCommand):
 
         self.stdout.write("Saving companies to database...")
         Company.objects.bulk_create(companies)
+        # bulk_create doesn't send post_save, so queue the indexing here
+        enqueue(IndexQueueEntry.COMPANY, [company.pk for company in companies])
 
         total_employees = 0
         self.stdout.write("Generating employees...")
@@ -141,6 +145,10 @@ class Command(BaseCommand):
                 total_employees += 1
 
             Employee.objects.bulk_create(employees)
+            enqueue(
+                IndexQueueEntry.EMPLOYEE,
+                [employee.pk for employee in employees],
+            )
 
             if total_employees % 1000 == 0:
                 self.stdout.write(f"Generated {total_employees} employees...")
@@ -1,8 +1,25 @@
+import time
+
 from django.core.management.base import BaseCommand
-from companies.models import Company, Employee
-from search_service.indexing import index_company, index_employee
 from tqdm import tqdm
 
+from companies.models import Company, Employee
+from search_service.bulk import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_BYTES,
+    BulkResult,
+    bulk_index,
+    bulk_indexing_settings,
+)
+from search_service.client import get_opensearch_client
+from search_service.indexing import COMPANY_WRITE_ALIAS, EMPLOYEE_WRITE_ALIAS
+from search_service.parallel import (
+    DEFAULT_RETRIES,
+    DEFAULT_SLICE_SIZE,
+    SOURCES,
+    parallel_index,
+)
+
 
 class Command(BaseCommand):
     help = "Index all companies and employees in OpenSearch"
@@ -21,15 +38,55 @@ class Command(BaseCommand):
         parser.add_argument(
             "--batch-size",
             type=int,
-            default=100,
-            help="Number of records to process in each batch (default: 100)",
+            default=DEFAULT_BATCH_SIZE,
+            help=(
+                "Max number of documents per bulk request "
+                f"(default: {DEFAULT_BATCH_SIZE})"
+            ),
+        )
+        parser.add_argument(
+            "--max-batch-bytes",
+            type=int,
+            default=DEFAULT_MAX_BATCH_BYTES,
+            help=(
+                "Max size of a bulk request body in bytes "
+                f"(default: {DEFAULT_MAX_BATCH_BYTES})"
+            ),
+        )
+        parser.add_argument(
+            "--disable-replicas",
+            action="store_true",
+            help="Drop replicas to 0 while indexing and restore them after",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes to index with (default: 1)",
+        )
+        parser.add_argument(
+            "--slice-size",
+            type=int,
+            default=DEFAULT_SLICE_SIZE,
+            help=(
+                "Number of primary keys handed to a worker at a time "
+                f"(default: {DEFAULT_SLICE_SIZE})"
+            ),
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=DEFAULT_RETRIES,
+            help=(
+                "Times a failed slice is retried when using --workers "
+                f"(default: {DEFAULT_RETRIES})"
+            ),
         )
 
     def handle(self, *args, **options):
         """Handle the command."""
         companies_only = options.get("companies_only", False)
         employees_only = options.get("employees_only", False)
-        batch_size = options.get("batch_size", 100)
 
         if not companies_only and not employees_only:
             companies_only = True
@@ -37,65 +94,86 @@ class Command(BaseCommand):
 
         if companies_only:
             self.stdout.write("Indexing companies...")
-            total_companies = Company.objects.count()
-            companies = Company.objects.iterator(chunk_size=batch_size)
-            for company in tqdm(
-                companies, total=total_companies, desc="Companies"
-            ):
-                deals = company.deal_set.all().order_by("-date_of_deal")
-                total_deals_amount = sum(deal.amount_raised for deal in deals)
-                last_deal = deals.first()
-
-                company_data = {
-                    "id": company.id,
-                    "companies_house_id": company.companies_house_id,
-                    "name": company.name,
-                    "description": company.description,
-                    "date_founded": company.date_founded,
-                    "country": {
-                        "id": company.country.id,
-                        "iso_code": company.country.iso_code,
-                        "name": company.country.name,
-                    },
-                    "active": company.active,
-                    "employee_count": company.employee_set.count(),
-                    "total_deals_amount": total_deals_amount,
-                    "last_deal_amount": (
-                        last_deal.amount_raised if last_deal else None
-                    ),
-                    "last_deal_date": (
-                        last_deal.date_of_deal if last_deal else None
-                    ),
-                    "created": company.created,
-                    "modified": company.modified,
-                }
-                index_company(company_data)
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Successfully indexed {total_companies} companies"
-                )
+            result = self.index(
+                COMPANY_WRITE_ALIAS,
+                "companies",
+                Company.objects.count(),
+                "Companies",
+                options,
             )
+            self.report(result, "companies")
 
         if employees_only:
             self.stdout.write("Indexing employees...")
-            total_employees = Employee.objects.count()
-            employees = Employee.objects.iterator(chunk_size=batch_size)
-            for employee in tqdm(
-                employees, total=total_employees, desc="Employees"
+            result = self.index(
+                EMPLOYEE_WRITE_ALIAS,
+                "employees",
+                Employee.objects.count(),
+                "Employees",
+                options,
+            )
+            self.report(result, "employees")
+
+    def index(self, index, source, total, desc, options) -> BulkResult:
+        client = get_opensearch_client()
+
+        started = time.perf_counter()
+        with tqdm(total=total, desc=desc) as progress:
+            failed = 0
+
+            def on_batch(report):
+                nonlocal failed
+                failed += len(report.failures)
+                progress.update(report.docs)
+                progress.set_postfix(
+                    docs_per_s=f"{report.docs_per_second:.0f}",
+                    failed=failed,
+                )
+
+            with bulk_indexing_settings(
+                index,
+                client=client,
+                disable_replicas=options["disable_replicas"],
             ):
-                employee_data = {
-                    "id": employee.id,
-                    "name": employee.name,
-                    "job_title": employee.job_title,
-                    "email": employee.email,
-                    "company": {
-                        "id": employee.company.id,
-                        "name": employee.company.name,
-                    },
-                }
-                index_employee(employee_data)
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Successfully indexed {total_employees} employees"
+                if options["workers"] > 1:
+                    result = parallel_index(
+                        source,
+                        index,
+                        workers=options["workers"],
+                        slice_size=options["slice_size"],
+                        retries=options["retries"],
+                        on_slice=on_batch,
+                        batch_size=options["batch_size"],
+                        max_bytes=options["max_batch_bytes"],
+                    )
+                else:
+                    _, build_documents = SOURCES[source]
+                    result = bulk_index(
+                        index,
+                        build_documents(chunk_size=options["batch_size"]),
+                        client=client,
+                        batch_size=options["batch_size"],
+                        max_bytes=options["max_batch_bytes"],
+                        on_batch=on_batch,
+                    )
+
+        # Wall time rather than the summed bulk time of every worker
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def report(self, result, label):
+        rate = result.docs / result.seconds if result.seconds else 0
+        message = (
+            f"Indexed {result.succeeded} of {result.docs} {label} in "
+            f"{result.batches} batches ({rate:.0f} docs/s)"
+        )
+        if result.failures:
+            self.stdout.write(self.style.WARNING(message))
+            for failure in result.failures[:10]:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"  {failure['id']}: {failure['error']}"
+                    )
                 )
-            )
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
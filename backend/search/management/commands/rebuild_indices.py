@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from search_service.bulk import DEFAULT_BATCH_SIZE, DEFAULT_MAX_BATCH_BYTES
+from search_service.indexing import COMPANY_INDEX, EMPLOYEE_INDEX
+from search_service.rebuild import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild indices under a new version and swap the aliases over without interrupting searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--companies-only",
+            action="store_true",
+            help="Rebuild only the companies index",
+        )
+        parser.add_argument(
+            "--employees-only",
+            action="store_true",
+            help="Rebuild only the employees index",
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=1,
+            help="Number of previous versions to keep for rollback (default: 1)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Max number of documents per bulk request (default: {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--max-batch-bytes",
+            type=int,
+            default=DEFAULT_MAX_BATCH_BYTES,
+            help=f"Max size of a bulk request body in bytes (default: {DEFAULT_MAX_BATCH_BYTES})",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command."""
+        aliases = []
+        if not options["employees_only"]:
+            aliases.append(COMPANY_INDEX)
+        if not options["companies_only"]:
+            aliases.append(EMPLOYEE_INDEX)
+
+        for alias in aliases:
+            self.stdout.write(f"Rebuilding {alias}...")
+            result = rebuild_index(
+                alias,
+                keep=options["keep"],
+                batch_size=options["batch_size"],
+                max_bytes=options["max_batch_bytes"],
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{alias} now points at {result.index}: loaded "
+                    f"{result.loaded.succeeded} documents, caught up "
+                    f"{result.caught_up}, removed {result.orphans_deleted} "
+                    "deleted during the load"
+                )
+            )
+            if result.loaded.failures:
+                self.stdout.write(self.style.WARNING(f"{len(result.loaded.failures)} documents failed to index"))
+            for name in result.retired:
+                self.stdout.write(f"Deleted old index {name}")
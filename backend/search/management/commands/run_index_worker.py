@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from search_service.queue import (
+    DEFAULT_DRAIN_SIZE,
+    DEFAULT_FLUSH_INTERVAL,
+    run_worker,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain the search index queue into OpenSearch bulk requests. Several workers can run on "
+        "databases that skip locked rows, like PostgreSQL; run only one on SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=DEFAULT_FLUSH_INTERVAL,
+            help=f"Seconds to wait when the queue is empty (default: {DEFAULT_FLUSH_INTERVAL})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_DRAIN_SIZE,
+            help=f"Max number of queue entries per bulk request (default: {DEFAULT_DRAIN_SIZE})",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue until it is empty, then exit",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command."""
+        self.stdout.write("Starting index worker...")
+        try:
+            run_worker(
+                flush_interval=options["flush_interval"],
+                batch_size=options["batch_size"],
+                once=options["once"],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping index worker")
+            return
+
+        self.stdout.write(self.style.SUCCESS("Index queue drained"))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from search_service.bulk import DEFAULT_BATCH_SIZE
+from search_service.sync import DEFAULT_STATE_NAME, sync_indices
+
+
+class Command(BaseCommand):
+    help = "Reindex companies and employees modified since the last sync"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Reindex rows modified at or after this ISO datetime instead of the stored high-water mark",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the high-water mark and reindex everything",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Also delete documents whose rows no longer exist",
+        )
+        parser.add_argument(
+            "--state",
+            default=DEFAULT_STATE_NAME,
+            help=f"Name of the stored high-water mark (default: {DEFAULT_STATE_NAME})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Max number of documents per bulk request (default: {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command."""
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+
+        result = sync_indices(
+            since=since,
+            full=options["full"],
+            reconcile_deletes=options["reconcile"],
+            state_name=options["state"],
+            batch_size=options["batch_size"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced changes since {result.since or 'the beginning'}: "
+                f"{result.companies.succeeded} companies, "
+                f"{result.employees.succeeded} employees"
+            )
+        )
+        for index, deleted in result.deleted.items():
+            self.stdout.write(f"Deleted {deleted} orphaned documents from {index}")
+
+        failures = result.companies.failures + result.employees.failures
+        if failures:
+            raise CommandError(f"{len(failures)} documents failed to index; they were queued for the index worker")
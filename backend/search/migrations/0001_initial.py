@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="IndexQueueEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model", models.CharField(choices=[("company", "Company"), ("employee", "Employee")], max_length=20)),
+                ("object_id", models.IntegerField()),
+                (
+                    "op",
+                    models.CharField(
+                        choices=[("index", "Index"), ("delete", "Delete")], default="index", max_length=10
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name_plural": "index queue entries",
+                "ordering": ["id"],
+            },
+        ),
+    ]
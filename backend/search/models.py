@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class IndexQueueEntry(models.Model):
+    """A pending change to a search document, drained by the index worker."""
+
+    COMPANY = "company"
+    EMPLOYEE = "employee"
+    MODELS = (
+        (COMPANY, "Company"),
+        (EMPLOYEE, "Employee"),
+    )
+
+    INDEX = "index"
+    DELETE = "delete"
+    OPS = (
+        (INDEX, "Index"),
+        (DELETE, "Delete"),
+    )
+
+    model = models.CharField(max_length=20, choices=MODELS)
+    object_id = models.IntegerField()
+    op = models.CharField(max_length=10, choices=OPS, default=INDEX)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name_plural = "index queue entries"
+
+    def __str__(self):
+        return "{0} {1} {2}".format(self.op, self.model, self.object_id)
+
+
+class IndexSyncState(models.Model):
+    """High-water mark of the last successful incremental index sync."""
+
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    last_run = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return "{0} ({1})".format(self.name, self.high_water_mark)
@@ -1,33 +1,42 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from companies.models import Company, Employee
-from search_service.indexing import (
-    index_company,
-    index_employee,
-    delete_company,
-    delete_employee,
-)
+from companies.models import Company, Deal, Employee
+from search.models import IndexQueueEntry
+from search_service.queue import enqueue
+
+COMPANY = IndexQueueEntry.COMPANY
+EMPLOYEE = IndexQueueEntry.EMPLOYEE
+DELETE = IndexQueueEntry.DELETE
 
 
 @receiver(post_save, sender=Company)
 def handle_company_save(sender, instance, **kwargs):
-    """Index company when saved."""
-    index_company(instance)
+    """Queue company for indexing when saved."""
+    enqueue(COMPANY, [instance.id])
 
 
 @receiver(post_delete, sender=Company)
 def handle_company_delete(sender, instance, **kwargs):
-    """Remove company from index when deleted."""
-    delete_company(instance.id)
+    """Queue company for removal from the index when deleted."""
+    enqueue(COMPANY, [instance.id], DELETE)
 
 
 @receiver(post_save, sender=Employee)
 def handle_employee_save(sender, instance, **kwargs):
-    """Index employee when saved."""
-    index_employee(instance)
+    """Queue employee, and their company's employee count, for indexing."""
+    enqueue(EMPLOYEE, [instance.id])
+    enqueue(COMPANY, [instance.company_id])
 
 
 @receiver(post_delete, sender=Employee)
 def handle_employee_delete(sender, instance, **kwargs):
-    """Remove employee from index when deleted."""
-    delete_employee(instance.id)
+    """Queue employee for removal and their company for reindexing."""
+    enqueue(EMPLOYEE, [instance.id], DELETE)
+    enqueue(COMPANY, [instance.company_id])
+
+
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+def handle_deal_change(sender, instance, **kwargs):
+    """Queue the owning company so its deal totals are refreshed."""
+    enqueue(COMPANY, [instance.company_id])
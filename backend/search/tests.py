@@ -0,0 +1,388 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connection
+from opensearchpy.serializer import JSONSerializer
+from rest_framework.test import APIClient
+
+from companies.models import Company, Country, Deal, Employee
+from search.models import IndexQueueEntry, IndexSyncState
+from search_service import client as client_module
+from search_service import indexing, parallel, queue, rebuild, sync
+from search_service.bulk import BulkResult, index_actions, iter_action_batches
+from search_service.cache import GENERATION_KEY, LocalBackend, SearchCache, get_search_cache, reset_search_cache
+from search_service.documents import company_documents
+from search_service.queries import MAX_SUGGEST_SIZE, InvalidCursor, encode_cursor, search_companies_and_employees
+
+
+def test_bulk_batches_split_on_document_count():
+    documents = [{"id": i, "name": f"Company {i}"} for i in range(5)]
+
+    batches = list(iter_action_batches(index_actions("companies", documents), JSONSerializer(), batch_size=2))
+
+    assert [docs for _, docs, _ in batches] == [2, 2, 1]
+    assert all(len(lines) == docs * 2 for lines, docs, _ in batches)
+
+
+def test_bulk_batches_split_on_byte_size():
+    documents = [{"id": i, "name": "x" * 100} for i in range(4)]
+
+    batches = list(
+        iter_action_batches(index_actions("companies", documents), JSONSerializer(), batch_size=100, max_bytes=400)
+    )
+
+    assert [docs for _, docs, _ in batches] == [2, 2]
+    assert all(size <= 400 for _, _, size in batches)
+
+
+def create_companies(country, count):
+    companies = Company.objects.bulk_create(
+        Company(name=f"Company {i}", description="", country=country) for i in range(count)
+    )
+    for company in companies:
+        Deal.objects.bulk_create(
+            [
+                Deal(company=company, date_of_deal=datetime.date(2020, 1, 1), amount_raised=100),
+                Deal(company=company, date_of_deal=datetime.date(2021, 1, 1), amount_raised=250),
+            ]
+        )
+        Employee.objects.bulk_create(
+            Employee(company=company, name=f"Employee {i}", email=f"{i}@example.com") for i in range(3)
+        )
+
+
+@pytest.mark.django_db
+def test_company_documents_use_constant_queries(django_assert_num_queries):
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+
+    create_companies(country, 1)
+    with django_assert_num_queries(1):
+        documents = list(company_documents())
+    assert len(documents) == 1
+
+    create_companies(country, 20)
+    with django_assert_num_queries(1):
+        documents = list(company_documents())
+    assert len(documents) == 21
+
+    document = documents[0]
+    assert document["employee_count"] == 3
+    assert document["total_deals_amount"] == 350
+    assert document["last_deal_amount"] == 250
+    assert document["last_deal_date"] == datetime.date(2021, 1, 1)
+    assert document["country"]["iso_code"] == "GB"
+
+
+def test_opensearch_client_is_shared_per_process():
+    client_module.reset_opensearch_client()
+
+    client = client_module.get_opensearch_client()
+    assert client_module.get_opensearch_client() is client
+
+    with mock.patch("search_service.client.os.getpid", return_value=-1):
+        assert client_module.get_opensearch_client() is not client
+
+    client_module.reset_opensearch_client()
+
+
+@pytest.mark.django_db
+def test_signals_queue_changes_after_commit(django_capture_on_commit_callbacks):
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        company = Company.objects.create(name="A Company LTD", description="", country=country)
+        assert not IndexQueueEntry.objects.exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Employee.objects.create(company=company, name="Someone", email="someone@example.com")
+
+    entries = {(entry.model, entry.object_id, entry.op) for entry in IndexQueueEntry.objects.all()}
+    assert entries == {
+        (IndexQueueEntry.COMPANY, company.id, IndexQueueEntry.INDEX),
+        (IndexQueueEntry.EMPLOYEE, company.employee_set.get().id, IndexQueueEntry.INDEX),
+    }
+
+
+@pytest.mark.django_db
+def test_drain_coalesces_queue_into_one_bulk_request():
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+    company = Company.objects.create(name="A Company LTD", description="", country=country)
+    queue.record(IndexQueueEntry.COMPANY, [company.id, company.id, company.id])
+    queue.record(IndexQueueEntry.COMPANY, [999])
+
+    client = mock.Mock()
+    client.transport.serializer = JSONSerializer()
+    client.bulk.return_value = {"errors": False, "items": []}
+
+    assert queue.drain(client=client) == 4
+
+    body = client.bulk.call_args.kwargs["body"].decode().splitlines()
+    assert client.bulk.call_count == 1
+    assert body[0] == f'{{"index":{{"_index":"companies_write","_id":{company.id}}}}}'
+    assert body[2] == '{"delete":{"_index":"companies_write","_id":999}}'
+    assert not IndexQueueEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_drain_requeues_documents_the_bulk_request_rejected():
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+    rejected, indexed = (
+        Company.objects.create(name=name, description="", country=country) for name in ("Rejected", "Indexed")
+    )
+    queue.record(IndexQueueEntry.COMPANY, [rejected.id, indexed.id])
+
+    client = mock.Mock()
+    client.transport.serializer = JSONSerializer()
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [
+            {
+                "index": {
+                    "_id": str(rejected.id),
+                    "status": 429,
+                    "error": {"type": "es_rejected_execution_exception"},
+                }
+            },
+            {"index": {"_id": str(indexed.id), "status": 201}},
+        ],
+    }
+
+    assert queue.drain(client=client) == 2
+    entries = [(entry.model, entry.object_id, entry.op) for entry in IndexQueueEntry.objects.all()]
+    assert entries == [(IndexQueueEntry.COMPANY, rejected.id, IndexQueueEntry.INDEX)]
+
+
+@pytest.mark.django_db
+def test_sync_queues_documents_that_failed_to_index():
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+    company = Company.objects.create(name="A Company LTD", description="", country=country)
+
+    client = mock.Mock()
+    client.transport.serializer = JSONSerializer()
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [{"index": {"_id": str(company.id), "status": 400, "error": {"type": "mapper_parsing_exception"}}}],
+    }
+    result = sync.sync_indices(client=client)
+
+    assert len(result.companies.failures) == 1
+    assert IndexSyncState.objects.get().high_water_mark == result.until
+    entries = [(entry.model, entry.object_id, entry.op) for entry in IndexQueueEntry.objects.all()]
+    assert entries == [(IndexQueueEntry.COMPANY, company.id, IndexQueueEntry.INDEX)]
+
+
+def test_swap_aliases_moves_read_and_write_aliases_atomically():
+    client = mock.Mock()
+    client.indices.exists_alias.return_value = True
+    client.indices.exists.return_value = True
+    client.indices.get_alias.return_value = {"companies_v1": {"aliases": {}}}
+
+    previous = indexing.swap_aliases("companies", "companies_v2", client)
+
+    assert previous == ["companies_v1"]
+    client.indices.update_aliases.assert_called_once()
+    actions = client.indices.update_aliases.call_args.kwargs["body"]["actions"]
+    assert actions == [
+        {"remove": {"index": "companies_v1", "alias": "companies"}},
+        {"remove": {"index": "companies_v1", "alias": "companies_write"}},
+        {"add": {"index": "companies_v2", "alias": "companies"}},
+        {"add": {"index": "companies_v2", "alias": "companies_write", "is_write_index": True}},
+    ]
+
+
+def fake_msearch(alias):
+    """msearch that rejects sorts on fields the alias' mapping can't sort on, like OpenSearch."""
+    properties = indexing.INDEX_MAPPINGS[alias]["mappings"]["properties"]
+
+    def msearch(body, **kwargs):
+        responses = []
+        for search in body[1::2]:
+            fields = [field for sort in search["sort"] if isinstance(sort, dict) for field in sort]
+            unsortable = [field for field in fields if properties.get(field, {}).get("type", "text") == "text"]
+            if unsortable:
+                responses.append({"error": f"No mapping found for [{unsortable[0]}] in order to sort on"})
+            else:
+                responses.append({"took": 1})
+        return {"responses": responses}
+
+    return msearch
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("alias", [indexing.COMPANY_INDEX, indexing.EMPLOYEE_INDEX])
+def test_rebuild_warms_up_with_searches_the_mapping_supports(alias):
+    client = mock.Mock()
+    client.indices.get.return_value = {}
+    client.indices.get_settings.return_value = {f"{alias}_v1": {"settings": {"index": {}}}}
+    client.indices.exists.return_value = False
+    client.indices.exists_alias.return_value = False
+    client.msearch.side_effect = fake_msearch(alias)
+
+    swapped = []
+
+    def orphaned_ids(*args):
+        swapped.append(client.indices.update_aliases.called)
+        return []
+
+    with mock.patch("search_service.rebuild.orphaned_ids", side_effect=orphaned_ids):
+        result = rebuild.rebuild_index(alias, client=client)
+
+    assert result.index == f"{alias}_v1"
+    assert client.msearch.call_count == 1
+    client.indices.update_aliases.assert_called_once()
+    # Orphans are dropped again after the swap, for deletes that went to the old version
+    assert swapped == [False, True]
+
+
+@pytest.mark.django_db
+def test_pk_slices_cover_the_primary_key_space():
+    country = Country.objects.create(iso_code="GB", name="United Kingdom")
+    companies = Company.objects.bulk_create(
+        Company(name=f"Company {i}", description="", country=country) for i in range(25)
+    )
+    low, high = companies[0].pk, companies[-1].pk
+
+    slices = parallel.pk_slices("companies", slice_size=10)
+
+    assert [(s.start, s.end) for s in slices] == [(low, low + 10), (low + 10, low + 20), (low + 20, high + 1)]
+    assert parallel.pk_slices("employees") == []
+
+
+def test_slice_results_count_the_bulk_requests_sent():
+    task = parallel.Slice("companies", 1, 100)
+    sent = BulkResult(batches=3, docs=250, bytes=4096, seconds=1.5)
+
+    with mock.patch("search_service.parallel.bulk_index", return_value=sent):
+        slice_result = parallel.index_slice(task, "companies_v1")
+
+    assert (slice_result.batches, slice_result.docs, slice_result.bytes) == (3, 250, 4096)
+
+
+def test_search_cache_shares_equivalent_searches_until_invalidated():
+    search_cache = SearchCache(LocalBackend(max_entries=10), ttl=60, generation_cache=caches["default"])
+    compute = mock.Mock(side_effect=[{"companies": [1]}, {"companies": [2]}])
+
+    first = search_cache.get_or_set({"query": "a", "country_codes": ["GB", "FR"], "date_from": None}, compute)
+    second = search_cache.get_or_set({"query": "a", "country_codes": ["FR", "GB"]}, compute)
+    assert first is second
+    assert (search_cache.hits, search_cache.misses) == (1, 1)
+
+    search_cache.invalidate()
+    assert search_cache.get_or_set({"query": "a", "country_codes": ["GB", "FR"]}, compute) == {"companies": [2]}
+
+
+@pytest.mark.django_db
+def test_search_cache_generation_is_shared_between_processes(settings):
+    settings.SEARCH_CACHE = {"CACHE_ALIAS": "default"}
+    reset_search_cache()
+    assert get_search_cache() is None
+
+    settings.SEARCH_CACHE = {"CACHE_ALIAS": "search", "GENERATION_MAX_AGE": 0}
+    reset_search_cache()
+    key = get_search_cache().key({"query": "a"})
+    # e.g. the index worker, with its own connection to the cache table
+    other_process = DatabaseCache(settings.CACHES["search"]["LOCATION"], {})
+    other_process.set(GENERATION_KEY, other_process.get(GENERATION_KEY, 0) + 1)
+    assert get_search_cache().key({"query": "a"}) != key
+
+    # Bumped generations never expire, or the counter would start over
+    get_search_cache().invalidate()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT expires FROM search_cache WHERE cache_key = %s", [other_process.make_key(GENERATION_KEY)]
+        )
+        assert str(cursor.fetchone()[0]).startswith("9999")
+
+    # Within GENERATION_MAX_AGE a process reuses the generation it read, except after its own writes
+    search_cache = SearchCache(
+        LocalBackend(max_entries=10), ttl=60, generation_cache=other_process, generation_max_age=60
+    )
+    generation = search_cache.generation()
+    other_process.incr(GENERATION_KEY)
+    assert search_cache.generation() == generation
+    search_cache.invalidate()
+    assert search_cache.generation() == generation + 2
+    reset_search_cache()
+
+
+@pytest.mark.django_db
+def test_point_in_time_pages_are_never_cached(settings):
+    settings.SEARCH_CACHE = {"CACHE_ALIAS": "search"}
+    reset_search_cache()
+    cursor = encode_cursor({"search": "abc", "pages": {"companies": {"after": [1], "pit": "pit-id"}}})
+
+    with mock.patch("search_service.queries.execute_search", return_value={"next": None}) as execute:
+        # A follow-up page only passes the cursor, without pit=1
+        search_companies_and_employees("a", cursor=cursor)
+        search_companies_and_employees("a", cursor=cursor)
+
+    assert execute.call_count == 2
+    assert execute.call_args.kwargs["use_pit"]
+    reset_search_cache()
+
+
+def test_search_cache_local_backend_evicts_least_recently_used():
+    backend = LocalBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+
+
+def test_suggest_returns_only_id_name_and_url(settings):
+    settings.SEARCH_CACHE = {"ENABLED": False}
+    client = mock.Mock()
+    client.msearch.return_value = {
+        "responses": [{"hits": {"hits": [{"_source": {"id": 7, "name": "Acme Tech"}}]}}],
+    }
+
+    with mock.patch("search_service.queries.get_opensearch_client", return_value=client):
+        response = APIClient().get("/api/v1/search/suggest/", {"q": " Ac ", "type": "companies", "size": 50})
+        too_small = APIClient().get("/api/v1/search/suggest/", {"q": "ac", "size": 0})
+
+    assert response.status_code == 200
+    assert response.json() == {"companies": [{"id": 7, "name": "Acme Tech", "url": "/companies/7"}], "employees": []}
+    body = client.msearch.call_args.kwargs["body"]
+    assert body[1]["size"] == MAX_SUGGEST_SIZE
+    assert body[1]["query"]["multi_match"] == {**body[1]["query"]["multi_match"], "query": "ac", "type": "bool_prefix"}
+    assert too_small.status_code == 400
+    assert client.msearch.call_count == 1
+
+
+def test_search_pages_with_search_after_cursor(settings):
+    settings.SEARCH_CACHE = {"ENABLED": False}
+    client = mock.Mock()
+    client.msearch.side_effect = [
+        {
+            "responses": [
+                {
+                    "hits": {
+                        "total": {"value": 3},
+                        "hits": [
+                            {"_source": {"id": 1}, "sort": [1.0, 1]},
+                            {"_source": {"id": 2}, "sort": [1.0, 2]},
+                        ],
+                    }
+                }
+            ]
+        },
+        {"responses": [{"hits": {"total": {"value": 3}, "hits": [{"_source": {"id": 3}, "sort": [0.5, 3]}]}}]},
+    ]
+
+    with mock.patch("search_service.queries.get_opensearch_client", return_value=client):
+        first = search_companies_and_employees("acme", search_type="companies", size=2)
+        second = search_companies_and_employees("acme", search_type="companies", size=2, cursor=first["next"])
+
+        with pytest.raises(InvalidCursor):
+            search_companies_and_employees("other", search_type="companies", size=2, cursor=first["next"])
+
+    assert [c["id"] for c in first["companies"] + second["companies"]] == [1, 2, 3]
+    assert second["next"] is None
+    second_body = client.msearch.call_args_list[1].kwargs["body"][1]
+    assert second_body["search_after"] == [1.0, 2]
+    assert second_body["sort"] == ["_score", {"id": "asc"}]
@@ -1,14 +1,26 @@
 from django.urls import path
-from .views import SearchView, RawSearchView, FilterConfigView
+from .views import (
+    SearchView,
+    RawSearchView,
+    FilterConfigView,
+    SearchCacheStatsView,
+    SuggestView,
+)
 
 app_name = "search"
 
 urlpatterns = [
     path("", SearchView.as_view(), name="search"),
     path("raw/", RawSearchView.as_view(), name="raw_search"),
+    path("suggest/", SuggestView.as_view(), name="suggest"),
     path(
         "config/filteroptions/",
         FilterConfigView.as_view(),
         name="filter_config",
     ),
+    path(
+        "cache/stats/",
+        SearchCacheStatsView.as_view(),
+        name="cache_stats",
+    ),
 ]
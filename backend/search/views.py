@@ -1,7 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from search_service.queries import search_companies_and_employees
+from search_service.cache import get_search_cache
+from search_service.queries import (
+    DEFAULT_SUGGEST_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    search_companies_and_employees,
+    suggest_companies_and_employees,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -123,7 +130,7 @@ def render_search_results(results):
         results: Raw search results from search_companies_and_employees
 
     Returns:
-        dict: Normalized results with sections
+        dict: Normalized results with sections and the next page token
     """
     sections = []
 
@@ -148,7 +155,7 @@ def render_search_results(results):
                 }
             )
 
-    return {"sections": sections}
+    return {"sections": sections, "next": results.get("next")}
 
 
 class SearchView(APIView):
@@ -164,7 +171,10 @@ class SearchView(APIView):
             q: Search query string
             type: Type of search ('all', 'companies', 'employees') -
                 can be multiple
-            size: Number of results to return (default: 10)
+            size: Number of results to return per type (default: 10,
+                max: 100)
+            cursor: `next` token from the previous page
+            pit: '1' to page through a point-in-time snapshot
             date_from: Filter companies founded on or after this date
                 (YYYY-MM-DD)
             date_to: Filter companies founded on or before this date
@@ -181,6 +191,8 @@ class SearchView(APIView):
         query = request.query_params.get("q", "")
         search_types = request.query_params.getlist("type", ["all"])
         size = int(request.query_params.get("size", 10))
+        cursor = request.query_params.get("cursor")
+        use_pit = request.query_params.get("pit") in ("1", "true")
 
         allowed_types = {"all", "companies", "employees"}
         if not all(t in allowed_types for t in search_types):
@@ -194,6 +206,12 @@ class SearchView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if not 1 <= size <= MAX_PAGE_SIZE:
+            return Response(
+                {"error": f"Invalid size. Must be between 1 and {MAX_PAGE_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         if "all" in search_types:
             search_type = "all"
         else:
@@ -240,9 +258,15 @@ class SearchView(APIView):
                 employee_count_max=employee_count_max,
                 sort_by=sort_by,
                 sort_order=sort_order,
+                cursor=cursor,
+                use_pit=use_pit,
             )
             rendered_results = render_search_results(results)
             return Response(rendered_results)
+        except InvalidCursor as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -263,7 +287,10 @@ class RawSearchView(APIView):
             q: Search query string
             type: Type of search ('all', 'companies', 'employees') -
                 can be multiple
-            size: Number of results to return (default: 10)
+            size: Number of results to return per type (default: 10,
+                max: 100)
+            cursor: `next` token from the previous page
+            pit: '1' to page through a point-in-time snapshot
             date_from: Filter companies founded on or after this date
                 (YYYY-MM-DD)
             date_to: Filter companies founded on or before this date
@@ -279,6 +306,8 @@ class RawSearchView(APIView):
         query = request.query_params.get("q", "")
         search_types = request.query_params.getlist("type", ["all"])
         size = int(request.query_params.get("size", 10))
+        cursor = request.query_params.get("cursor")
+        use_pit = request.query_params.get("pit") in ("1", "true")
 
         allowed_types = {"all", "companies", "employees"}
         if not all(t in allowed_types for t in search_types):
@@ -292,6 +321,12 @@ class RawSearchView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if not 1 <= size <= MAX_PAGE_SIZE:
+            return Response(
+                {"error": f"Invalid size. Must be between 1 and {MAX_PAGE_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         if "all" in search_types:
             search_type = "all"
         else:
@@ -338,6 +373,67 @@ class RawSearchView(APIView):
                 employee_count_max=employee_count_max,
                 sort_by=sort_by,
                 sort_order=sort_order,
+                cursor=cursor,
+                use_pit=use_pit,
+            )
+            return Response(results)
+        except InvalidCursor as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SuggestView(APIView):
+    """
+    API endpoint for autocompleting company and employee names.
+    """
+
+    def get(self, request):
+        """
+        Suggest api endpoint. Cheaper than SearchView and meant to be called
+        on every keystroke; returns only the id, name and url of matches.
+
+        Query params:
+            q: Prefix typed so far
+            type: Type of search ('all', 'companies', 'employees') -
+                can be multiple
+            size: Number of suggestions per type (default: 5, max: 10)
+        """
+        query = request.query_params.get("q", "")
+        search_types = request.query_params.getlist("type", ["all"])
+        size = int(request.query_params.get("size", DEFAULT_SUGGEST_SIZE))
+
+        allowed_types = {"all", "companies", "employees"}
+        if not all(t in allowed_types for t in search_types):
+            return Response(
+                {
+                    "error": (
+                        "Invalid search type. Must be one of: "
+                        "all, companies, employees"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Larger sizes are capped at MAX_SUGGEST_SIZE rather than rejected
+        if size < 1:
+            return Response(
+                {"error": "Invalid size. Must be at least 1"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if "all" in search_types:
+            search_type = "all"
+        else:
+            search_type = ",".join(search_types)
+
+        try:
+            results = suggest_companies_and_employees(
+                query=query, search_type=search_type, size=size
             )
             return Response(results)
         except Exception as e:
@@ -353,3 +449,15 @@ class FilterConfigView(APIView):
 
     def get(self, request):
         return Response(FILTER_CONFIG)
+
+
+class SearchCacheStatsView(APIView):
+    """
+    API endpoint for the search result cache hit and miss counters.
+    """
+
+    def get(self, request):
+        cache = get_search_cache()
+        if cache is None:
+            return Response({"enabled": False})
+        return Response({"enabled": True, **cache.stats()})
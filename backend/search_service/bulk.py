@@ -0,0 +1,219 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from .cache import invalidate_search_cache
+from .client import get_opensearch_client, get_timeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_BATCH_BYTES = 10 * 1024 * 1024
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a single `_bulk` request."""
+
+    number: int
+    docs: int
+    bytes: int
+    seconds: float
+    failures: list[dict] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class BulkResult:
+    """Totals across every batch sent by `bulk_index`."""
+
+    batches: int = 0
+    docs: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    failures: list[dict] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> int:
+        return self.docs - len(self.failures)
+
+    def add(self, report: BatchReport):
+        self.batches += 1
+        self.docs += report.docs
+        self.bytes += report.bytes
+        self.seconds += report.seconds
+        self.failures.extend(report.failures)
+
+
+def iter_action_batches(
+    actions,
+    serializer,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+):
+    """
+    Group `(action, source)` pairs into newline-delimited `_bulk` bodies
+
+    A batch is closed as soon as it holds `batch_size` documents or adding
+    the next document would take it past `max_bytes`. A single document
+    larger than `max_bytes` is still sent, on its own.
+
+    args:
+        actions: iterable of (action metadata, document source or None)
+        serializer: object with a `dumps` method, usually the client's
+        batch_size: max number of documents per batch
+        max_bytes: max encoded size of a batch in bytes
+
+    yields:
+        (list of encoded lines, number of documents, size in bytes)
+    """
+    lines = []
+    docs = 0
+    size = 0
+
+    for action, source in actions:
+        encoded = [serializer.dumps(action).encode("utf-8")]
+        if source is not None:
+            encoded.append(serializer.dumps(source).encode("utf-8"))
+        encoded_size = sum(len(line) + 1 for line in encoded)
+
+        if docs and size + encoded_size > max_bytes:
+            yield lines, docs, size
+            lines, docs, size = [], 0, 0
+
+        lines.extend(encoded)
+        docs += 1
+        size += encoded_size
+
+        if docs >= batch_size:
+            yield lines, docs, size
+            lines, docs, size = [], 0, 0
+
+    if docs:
+        yield lines, docs, size
+
+
+def index_actions(index: str, documents):
+    """Turn documents with an `id` key into bulk `index` actions."""
+    for document in documents:
+        yield {"index": {"_index": index, "_id": document["id"]}}, document
+
+
+def delete_actions(index: str, ids):
+    """Turn document ids into bulk `delete` actions."""
+    for doc_id in ids:
+        yield {"delete": {"_index": index, "_id": doc_id}}, None
+
+
+def _failed_items(response) -> list[dict]:
+    if not response.get("errors"):
+        return []
+
+    failures = []
+    for item in response["items"]:
+        op_type, result = next(iter(item.items()))
+        if "error" in result and not (op_type == "delete" and result.get("status") == 404):
+            failures.append(
+                {
+                    "op": op_type,
+                    "id": result.get("_id"),
+                    "status": result.get("status"),
+                    "error": result["error"],
+                }
+            )
+    return failures
+
+
+def send_bulk(
+    actions,
+    client=None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    on_batch=None,
+) -> BulkResult:
+    """
+    Stream bulk actions to OpenSearch in batches
+
+    Failed documents are collected rather than raised so that one bad
+    document does not abort a long reindex. Deleting a missing document is
+    not counted as a failure.
+
+    args:
+        actions: iterable of (action metadata, document source or None)
+        client: OpenSearch client, defaults to `get_opensearch_client()`
+        batch_size: max number of documents per `_bulk` request
+        max_bytes: max size of a `_bulk` request body in bytes
+        on_batch: optional callable receiving each `BatchReport`
+
+    returns:
+        BulkResult with the totals and every failed item
+    """
+    client = client or get_opensearch_client()
+    result = BulkResult()
+
+    batches = iter_action_batches(actions, client.transport.serializer, batch_size, max_bytes)
+    for number, (lines, docs, size) in enumerate(batches, start=1):
+        started = time.perf_counter()
+        response = client.bulk(body=b"\n".join(lines) + b"\n", request_timeout=get_timeout("bulk"))
+        report = BatchReport(
+            number=number,
+            docs=docs,
+            bytes=size,
+            seconds=time.perf_counter() - started,
+            failures=_failed_items(response),
+        )
+        result.add(report)
+        invalidate_search_cache()
+
+        logger.info(
+            "Bulk batch %d: %d docs, %d bytes in %.2fs (%.0f docs/s), %d failed",
+            report.number,
+            report.docs,
+            report.bytes,
+            report.seconds,
+            report.docs_per_second,
+            len(report.failures),
+        )
+        if on_batch:
+            on_batch(report)
+
+    return result
+
+
+def bulk_index(index: str, documents, **kwargs) -> BulkResult:
+    """Index documents with an `id` key into `index` via the bulk API."""
+    return send_bulk(index_actions(index, documents), **kwargs)
+
+
+@contextmanager
+def bulk_indexing_settings(index: str, client=None, disable_replicas: bool = False):
+    """
+    Relax index settings for the duration of a bulk load
+
+    Turns periodic refresh off (and optionally replicas) while the block
+    runs, then restores whatever was configured before and refreshes the
+    index once so the loaded documents become searchable.
+    """
+    client = client or get_opensearch_client()
+    timeout = get_timeout("admin")
+    # Keyed by concrete index name, which differs from `index` for an alias
+    response = client.indices.get_settings(index=index, request_timeout=timeout)
+    current = next(iter(response.values()))["settings"]["index"]
+
+    previous = {"refresh_interval": current.get("refresh_interval")}
+    relaxed = {"refresh_interval": "-1"}
+    if disable_replicas:
+        previous["number_of_replicas"] = current.get("number_of_replicas")
+        relaxed["number_of_replicas"] = 0
+
+    client.indices.put_settings(index=index, body={"index": relaxed}, request_timeout=timeout)
+    try:
+        yield
+    finally:
+        # A None value resets the setting to the cluster default
+        client.indices.put_settings(index=index, body={"index": previous}, request_timeout=timeout)
+        client.indices.refresh(index=index, request_timeout=timeout)
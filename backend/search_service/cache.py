@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    # "local" keeps results in this process, "django" in CACHE_ALIAS
+    "BACKEND": "local",
+    # Holds the generation counter, so it must be shared between processes
+    "CACHE_ALIAS": "search",
+    # Seconds a process reuses the generation it read, sparing a cache read
+    # per search; writes in other processes show up within this long
+    "GENERATION_MAX_AGE": 1.0,
+    "TTL": 30,
+    "MAX_ENTRIES": 1000,
+}
+
+GENERATION_KEY = "search:generation"
+
+# Cache backends that keep their data in the process; a generation counter
+# in one never hears about writes made by the index worker
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+_cache = None
+_lock = threading.Lock()
+
+
+class LocalBackend:
+    """Thread-safe in-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoBackend:
+    """Results stored in a Django cache, shared by every process using it."""
+
+    def __init__(self, alias: str):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+
+class SearchCache:
+    """
+    Search result cache keyed on the normalised search parameters
+
+    Every key embeds a generation counter kept in a Django cache shared by
+    every process, including the index worker that writes to the indices.
+    Writes to the indices bump the counter, which orphans every cached
+    result at once; orphaned entries then age out through the TTL or LRU.
+    The counter is re-read at most every `generation_max_age` seconds.
+    """
+
+    def __init__(self, backend, ttl: int, generation_cache, generation_max_age: float = 0.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.generation_cache = generation_cache
+        self.generation_max_age = generation_max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (monotonic time read, generation)
+        self._generation = None
+
+    @staticmethod
+    def normalise(params: dict) -> dict:
+        """Drop empty filters and sort lists so equivalent searches share a key."""
+        normalised = {}
+        for name, value in params.items():
+            if value is None or value == "" or value == []:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                value = sorted(value)
+            elif name == "search_type":
+                value = ",".join(sorted(value.split(",")))
+            normalised[name] = value
+        return normalised
+
+    def generation(self) -> int:
+        read = self._generation
+        if read is not None and time.monotonic() - read[0] < self.generation_max_age:
+            return read[1]
+        generation = self.generation_cache.get(GENERATION_KEY, 0)
+        self._generation = (time.monotonic(), generation)
+        return generation
+
+    def key(self, params: dict) -> str:
+        encoded = json.dumps(self.normalise(params), sort_keys=True, default=str)
+        digest = hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+        return f"search:{self.generation()}:{digest}"
+
+    def get_or_set(self, params: dict, compute):
+        key = self.key(params)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            value = compute()
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self):
+        """Bump the generation so every cached result is skipped from now on."""
+        try:
+            self.generation_cache.incr(GENERATION_KEY)
+        except ValueError:
+            # incr() fails when the key is missing; add() avoids racing another writer
+            if not self.generation_cache.add(GENERATION_KEY, 1, timeout=None):
+                self.generation_cache.incr(GENERATION_KEY)
+        # Backends without a native incr(), like the database one, store the
+        # result with the default timeout; an expired counter would restart
+        # and bring back results cached under an old generation
+        self.generation_cache.touch(GENERATION_KEY, None)
+        self._generation = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "generation": self.generation(),
+            "ttl": self.ttl,
+        }
+        if isinstance(self.backend, LocalBackend):
+            stats["entries"] = len(self.backend)
+            stats["max_entries"] = self.backend.max_entries
+        return stats
+
+
+def get_cache_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "SEARCH_CACHE", {})}
+
+
+def get_search_cache():
+    """
+    Return the process-wide search cache, or None when it's disabled
+
+    The cache also stays off when CACHE_ALIAS is local to the process,
+    since index writes made elsewhere couldn't invalidate it.
+    """
+    global _cache
+
+    config = get_cache_settings()
+    if not config["ENABLED"]:
+        return None
+
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                generation_cache = caches[config["CACHE_ALIAS"]]
+                if isinstance(generation_cache, PROCESS_LOCAL_BACKENDS):
+                    logger.warning(
+                        "Search cache disabled: cache %r isn't shared between processes", config["CACHE_ALIAS"]
+                    )
+                    _cache = False
+                else:
+                    if config["BACKEND"] == "django":
+                        backend = DjangoBackend(config["CACHE_ALIAS"])
+                    else:
+                        backend = LocalBackend(config["MAX_ENTRIES"])
+                    _cache = SearchCache(backend, config["TTL"], generation_cache, config["GENERATION_MAX_AGE"])
+    return _cache or None
+
+
+def reset_search_cache():
+    global _cache
+
+    with _lock:
+        _cache = None
+
+
+def invalidate_search_cache():
+    """Called by the indexing layer after every write to the indices."""
+    cache = get_search_cache()
+    if cache is None:
+        return
+    try:
+        cache.invalidate()
+    except Exception:
+        # A cache outage must not fail the write; the TTL bounds staleness
+        logger.exception("Failed to invalidate the search cache")
@@ -1,15 +1,117 @@
 import os
-from opensearchpy import OpenSearch
+import threading
+import time
 
+from django.conf import settings
+from opensearchpy import OpenSearch, Transport
 
-def get_opensearch_client():
+from instrumentation.timing import record_opensearch
+
+DEFAULTS = {
+    "HOST": "http://localhost:9200",
+    "USER": "admin",
+    "PASSWORD": "admin",
+    "POOL_MAXSIZE": 25,
+    "MAX_RETRIES": 3,
+    "RETRY_BACKOFF": 0.5,
+    "RETRY_BACKOFF_MAX": 10.0,
+    "TIMEOUTS": {
+        "default": 30,
+        "search": 5,
+        "bulk": 120,
+        "admin": 60,
+    },
+}
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+class BackoffTransport(Transport):
+    """Transport that waits with exponential backoff between retries."""
+
+    def __init__(self, hosts, backoff_factor=0.5, backoff_max=10.0, **kwargs):
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self._attempts = threading.local()
+        super().__init__(hosts, **kwargs)
+
+    def perform_request(self, *args, **kwargs):
+        self._attempts.count = 0
+        started = time.perf_counter()
+        response = super().perform_request(*args, **kwargs)
+        # Wall time includes retries and (de)serialisation; `took` is the
+        # server's own time, so the gap between them is client and network
+        took = response.get("took") if isinstance(response, dict) else None
+        record_opensearch(time.perf_counter() - started, took)
+        return response
+
+    def mark_dead(self, connection):
+        super().mark_dead(connection)
+        # Only called when the request is about to be retried
+        attempt = getattr(self._attempts, "count", 0)
+        self._attempts.count = attempt + 1
+        if attempt < self.max_retries:
+            time.sleep(min(self.backoff_max, self.backoff_factor * 2**attempt))
+
+
+def get_client_settings() -> dict:
+    """Merge `settings.OPENSEARCH` over the defaults."""
+    configured = getattr(settings, "OPENSEARCH", {})
+    merged = {**DEFAULTS, **configured}
+    merged["TIMEOUTS"] = {**DEFAULTS["TIMEOUTS"], **configured.get("TIMEOUTS", {})}
+    return merged
+
+
+def get_timeout(operation: str) -> float:
+    """Request timeout in seconds for 'search', 'bulk' or 'admin' calls."""
+    timeouts = get_client_settings()["TIMEOUTS"]
+    return timeouts.get(operation, timeouts["default"])
+
+
+def create_opensearch_client():
+    config = get_client_settings()
     return OpenSearch(
-        hosts=[os.environ.get("OPENSEARCH_HOST", "http://localhost:9200")],
-        http_auth=(
-            os.environ.get("OPENSEARCH_USER", "admin"),
-            os.environ.get("OPENSEARCH_PASS", "admin"),
-        ),
-        timeout=30,
+        hosts=[config["HOST"]],
+        http_auth=(config["USER"], config["PASSWORD"]),
+        timeout=config["TIMEOUTS"]["default"],
+        maxsize=config["POOL_MAXSIZE"],
+        max_retries=config["MAX_RETRIES"],
+        retry_on_timeout=True,
+        transport_class=BackoffTransport,
+        backoff_factor=config["RETRY_BACKOFF"],
+        backoff_max=config["RETRY_BACKOFF_MAX"],
         use_ssl=False,
         verify_certs=False,
     )
+
+
+def get_opensearch_client():
+    """
+    Return the process-wide OpenSearch client
+
+    The client is created on first use and shared between threads, so its
+    keep-alive connection pool stays warm across requests. A forked child
+    process gets its own client instead of inheriting the parent's sockets.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = create_opensearch_client()
+                _client_pid = pid
+    return _client
+
+
+def reset_opensearch_client():
+    """Drop the shared client, e.g. after changing `settings.OPENSEARCH`."""
+    global _client, _client_pid
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,91 @@
+from companies.models import Company, Employee
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def company_document(company) -> dict:
+    """Build the search document for a company, with `country` selected."""
+    return {
+        "id": company.id,
+        "companies_house_id": company.companies_house_id,
+        "name": company.name,
+        "description": company.description,
+        "date_founded": company.date_founded,
+        "country": {
+            "id": company.country.id,
+            "iso_code": company.country.iso_code,
+            "name": company.country.name,
+        },
+        "active": company.active,
+        "employee_count": company.employee_count,
+        "total_deals_amount": company.total_deals_amount,
+        "last_deal_amount": company.last_deal_amount,
+        "last_deal_date": company.last_deal_date,
+        "created": company.created,
+        "modified": company.modified,
+    }
+
+
+def employee_document(employee) -> dict:
+    """Build the search document for an employee, with `company` selected."""
+    return {
+        "id": employee.id,
+        "name": employee.name,
+        "job_title": employee.job_title,
+        "gender": employee.gender,
+        "email": employee.email,
+        "phone_number": employee.phone_number,
+        "company": {
+            "id": employee.company.id,
+            "name": employee.company.name,
+        },
+        "created": employee.created,
+        "modified": employee.modified,
+    }
+
+
+def company_documents(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream ready-to-index company documents
+
+    args:
+        queryset: Company queryset to export, defaults to every company
+        chunk_size: number of rows fetched from the database at a time
+
+    yields:
+        company documents
+    """
+    if queryset is None:
+        queryset = Company.objects.all()
+    # The rollups are denormalised onto Company, so no aggregation is needed
+    queryset = queryset.select_related("country").order_by("pk")
+    for company in queryset.iterator(chunk_size=chunk_size):
+        yield company_document(company)
+
+
+def employee_documents(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream ready-to-index employee documents
+
+    args:
+        queryset: Employee queryset to export, defaults to every employee
+        chunk_size: number of rows fetched from the database at a time
+
+    yields:
+        employee documents
+    """
+    if queryset is None:
+        queryset = Employee.objects.all()
+    queryset = queryset.select_related("company").order_by("pk")
+    for employee in queryset.iterator(chunk_size=chunk_size):
+        yield employee_document(employee)
+
+
+def build_company_document(company_id):
+    """Build a single company document, or None if the company is gone."""
+    return next(company_documents(Company.objects.filter(pk=company_id)), None)
+
+
+def build_employee_document(employee_id):
+    """Build a single employee document, or None if the employee is gone."""
+    return next(employee_documents(Employee.objects.filter(pk=employee_id)), None)
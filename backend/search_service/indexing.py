@@ -1,14 +1,22 @@
-from .client import get_opensearch_client
+from .cache import invalidate_search_cache
+from .client import get_opensearch_client, get_timeout
 
+# Read aliases; each points at a versioned index such as `companies_v3`
 COMPANY_INDEX = "companies"
 EMPLOYEE_INDEX = "employees"
+COMPANY_WRITE_ALIAS = "companies_write"
+EMPLOYEE_WRITE_ALIAS = "employees_write"
 
 COMPANY_MAPPING = {
     "mappings": {
         "properties": {
             "id": {"type": "integer"},
             "companies_house_id": {"type": "keyword"},
-            "name": {"type": "text", "analyzer": "standard"},
+            "name": {
+                "type": "text",
+                "analyzer": "standard",
+                "fields": {"suggest": {"type": "search_as_you_type"}},
+            },
             "description": {"type": "text", "analyzer": "standard"},
             "date_founded": {"type": "date"},
             "country": {
@@ -33,7 +41,11 @@ EMPLOYEE_MAPPING = {
     "mappings": {
         "properties": {
             "id": {"type": "integer"},
-            "name": {"type": "text", "analyzer": "standard"},
+            "name": {
+                "type": "text",
+                "analyzer": "standard",
+                "fields": {"suggest": {"type": "search_as_you_type"}},
+            },
             "job_title": {"type": "text", "analyzer": "standard"},
             "gender": {"type": "keyword"},
             "email": {"type": "keyword"},
@@ -51,41 +63,123 @@ EMPLOYEE_MAPPING = {
 }
 
 
-def init_indices():
-    client = get_opensearch_client()
+INDEX_MAPPINGS = {
+    COMPANY_INDEX: COMPANY_MAPPING,
+    EMPLOYEE_INDEX: EMPLOYEE_MAPPING,
+}
 
-    if not client.indices.exists(index=COMPANY_INDEX):
-        client.indices.create(index=COMPANY_INDEX, body=COMPANY_MAPPING)
 
-    if not client.indices.exists(index=EMPLOYEE_INDEX):
-        client.indices.create(index=EMPLOYEE_INDEX, body=EMPLOYEE_MAPPING)
+def write_alias(alias: str) -> str:
+    """Alias that index writes go through, alongside the read alias."""
+    return f"{alias}_write"
 
 
-def index_company(company_data):
-    client = get_opensearch_client()
-    client.index(
-        index=COMPANY_INDEX,
-        id=company_data["id"],
-        body=company_data,
-        refresh=True,
-    )
+def versioned_name(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
 
 
-def index_employee(employee_data):
-    client = get_opensearch_client()
-    client.index(
-        index=EMPLOYEE_INDEX,
-        id=employee_data["id"],
-        body=employee_data,
-        refresh=True,
+def index_versions(alias: str, client=None) -> list[tuple[int, str]]:
+    """Every versioned index for an alias, oldest first."""
+    client = client or get_opensearch_client()
+    names = client.indices.get(index=f"{alias}_v*", ignore_unavailable=True, request_timeout=get_timeout("admin"))
+    versions = []
+    for name in names:
+        suffix = name[len(alias) + 2 :]
+        if suffix.isdigit():
+            versions.append((int(suffix), name))
+    return sorted(versions)
+
+
+def aliased_indices(alias: str, client=None) -> list[str]:
+    """Concrete indices the alias currently points at."""
+    client = client or get_opensearch_client()
+    timeout = get_timeout("admin")
+    if not client.indices.exists_alias(name=alias, request_timeout=timeout):
+        return []
+    return sorted(client.indices.get_alias(name=alias, request_timeout=timeout))
+
+
+def is_legacy_index(alias: str, client=None) -> bool:
+    """Whether `alias` is still a concrete index from before versioning."""
+    client = client or get_opensearch_client()
+    timeout = get_timeout("admin")
+    return client.indices.exists(index=alias, request_timeout=timeout) and not client.indices.exists_alias(
+        name=alias, request_timeout=timeout
     )
 
 
-def delete_company(company_id):
-    client = get_opensearch_client()
-    client.delete(index=COMPANY_INDEX, id=company_id, refresh=True)
+def create_index_version(alias: str, client=None) -> str:
+    """
+    Create the next `<alias>_vN` index with the current mapping
 
+    The new index has no aliases, so nothing reads from or writes to it
+    until `swap_aliases` is called.
+    """
+    client = client or get_opensearch_client()
+    versions = index_versions(alias, client)
+    name = versioned_name(alias, versions[-1][0] + 1 if versions else 1)
+    client.indices.create(index=name, body=INDEX_MAPPINGS[alias], request_timeout=get_timeout("admin"))
+    return name
 
-def delete_employee(employee_id):
+
+def swap_aliases(alias: str, index: str, client=None) -> list[str]:
+    """
+    Atomically point the read and write aliases at `index`
+
+    A legacy concrete index with the alias' name is removed in the same
+    request, since an alias can't be created while it exists.
+
+    returns:
+        the indices the aliases pointed at before
+    """
+    client = client or get_opensearch_client()
+    previous = aliased_indices(alias, client)
+
+    actions = []
+    for old_index in previous:
+        actions.append({"remove": {"index": old_index, "alias": alias}})
+    for old_index in aliased_indices(write_alias(alias), client):
+        actions.append({"remove": {"index": old_index, "alias": write_alias(alias)}})
+    if is_legacy_index(alias, client):
+        actions.append({"remove_index": {"index": alias}})
+        previous.append(alias)
+    actions.append({"add": {"index": index, "alias": alias}})
+    actions.append({"add": {"index": index, "alias": write_alias(alias), "is_write_index": True}})
+
+    client.indices.update_aliases(body={"actions": actions}, request_timeout=get_timeout("admin"))
+    invalidate_search_cache()
+    return previous
+
+
+def retire_versions(alias: str, keep: int = 1, client=None) -> list[str]:
+    """
+    Delete versioned indices no alias points at, keeping the newest `keep`
+
+    returns:
+        the deleted index names
+    """
+    client = client or get_opensearch_client()
+    live = set(aliased_indices(alias, client)) | set(aliased_indices(write_alias(alias), client))
+    unused = [name for _, name in index_versions(alias, client) if name not in live]
+    retired = unused[: max(len(unused) - keep, 0)]
+    for name in retired:
+        client.indices.delete(index=name, request_timeout=get_timeout("admin"))
+    return retired
+
+
+def init_indices():
+    """
+    Create the first version of each index behind its aliases
+
+    Existing concrete indices from before versioning are left serving
+    reads and just get a write alias; `rebuild_indices` replaces them.
+    """
     client = get_opensearch_client()
-    client.delete(index=EMPLOYEE_INDEX, id=employee_id, refresh=True)
+    timeout = get_timeout("admin")
+
+    for alias in INDEX_MAPPINGS:
+        if is_legacy_index(alias, client):
+            if not client.indices.exists_alias(name=write_alias(alias), request_timeout=timeout):
+                client.indices.put_alias(index=alias, name=write_alias(alias), request_timeout=timeout)
+        elif not client.indices.exists_alias(name=alias, request_timeout=timeout):
+            swap_aliases(alias, create_index_version(alias, client), client)
@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import django
+from django.db import connections
+from django.db.models import Max, Min
+
+from companies.models import Company, Employee
+
+from .bulk import BulkResult, bulk_index
+from .documents import company_documents, employee_documents
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLICE_SIZE = 20000
+DEFAULT_RETRIES = 2
+
+SOURCES = {
+    "companies": (Company, company_documents),
+    "employees": (Employee, employee_documents),
+}
+
+
+@dataclass(frozen=True)
+class Slice:
+    """A half-open primary-key range `[start, end)` of one model."""
+
+    source: str
+    start: int
+    end: int
+
+
+@dataclass
+class SliceResult:
+    slice: Slice
+    # Bulk requests sent for the slice
+    batches: int = 0
+    docs: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    failures: list[dict] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.0
+
+
+def pk_slices(source: str, slice_size: int = DEFAULT_SLICE_SIZE) -> list[Slice]:
+    """
+    Split a model's primary-key space into ranges of `slice_size` keys
+
+    Ranges are by key value rather than row count, so they only need one
+    MIN/MAX query; gaps in the key space just make some slices smaller.
+    """
+    model_class, _ = SOURCES[source]
+    bounds = model_class.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return []
+    return [
+        Slice(source, start, min(start + slice_size, bounds["high"] + 1))
+        for start in range(bounds["low"], bounds["high"] + 1, slice_size)
+    ]
+
+
+def _init_worker():
+    # Needed when processes are spawned rather than forked
+    django.setup()
+
+
+def index_slice(task: Slice, index: str, **bulk_kwargs) -> SliceResult:
+    """Build and bulk index the documents of one slice, in a worker process."""
+    model_class, build_documents = SOURCES[task.source]
+    queryset = model_class.objects.filter(pk__gte=task.start, pk__lt=task.end)
+    result = bulk_index(index, build_documents(queryset), **bulk_kwargs)
+    return SliceResult(
+        slice=task,
+        batches=result.batches,
+        docs=result.docs,
+        bytes=result.bytes,
+        seconds=result.seconds,
+        failures=result.failures,
+    )
+
+
+def parallel_index(
+    source: str,
+    index: str,
+    workers: int,
+    slice_size: int = DEFAULT_SLICE_SIZE,
+    retries: int = DEFAULT_RETRIES,
+    on_slice=None,
+    **bulk_kwargs,
+) -> BulkResult:
+    """
+    Index a model across a pool of worker processes, one pk slice at a time
+
+    Each worker builds documents with its own database connection and
+    sends them with its own OpenSearch client. A slice that raises is
+    resubmitted up to `retries` times; per-document failures are reported
+    but not retried.
+
+    args:
+        source: 'companies' or 'employees'
+        index: index or alias to write to
+        workers: number of worker processes
+        slice_size: number of primary keys per slice
+        retries: times a failed slice is resubmitted
+        on_slice: optional callable receiving each `SliceResult`
+        **bulk_kwargs: passed through to `bulk_index`
+
+    returns:
+        BulkResult with the totals across all slices, where `seconds` is
+        the summed bulk time of every worker
+
+    raises:
+        RuntimeError: if a slice still fails after its retries
+    """
+    slices = pk_slices(source, slice_size)
+    result = BulkResult()
+    attempts = {task: 0 for task in slices}
+
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {pool.submit(index_slice, task, index, **bulk_kwargs): task for task in slices}
+        while pending:
+            for future in as_completed(list(pending)):
+                task = pending.pop(future)
+                try:
+                    slice_result = future.result()
+                except Exception:
+                    attempts[task] += 1
+                    if attempts[task] > retries:
+                        raise RuntimeError(f"Slice {task} failed after {retries} retries")
+                    logger.exception("Slice %s failed, retrying (attempt %d)", task, attempts[task])
+                    pending[pool.submit(index_slice, task, index, **bulk_kwargs)] = task
+                    continue
+
+                result.batches += slice_result.batches
+                result.docs += slice_result.docs
+                result.bytes += slice_result.bytes
+                result.seconds += slice_result.seconds
+                result.failures.extend(slice_result.failures)
+                if on_slice:
+                    on_slice(slice_result)
+
+    return result
@@ -1,8 +1,31 @@
-from .client import get_opensearch_client
+import base64
+import hashlib
+import json
 import logging
 
+from .cache import SearchCache, get_search_cache
+from .client import get_opensearch_client, get_timeout
+
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 100
+PIT_KEEP_ALIVE = "1m"
+
+DEFAULT_SUGGEST_SIZE = 5
+MAX_SUGGEST_SIZE = 10
+
+# `name.suggest` is a search_as_you_type subfield, which indexes edge
+# n-grams and shingles up front so prefix matching is a term lookup
+SUGGEST_FIELDS = [
+    "name.suggest",
+    "name.suggest._2gram",
+    "name.suggest._3gram",
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
 
 def build_search_body(
     index_type: str,
@@ -17,6 +40,7 @@ def build_search_body(
     employee_count_max: int = None,
     sort_by: str = None,
     sort_order: str = None,
+    search_after: list = None,
 ) -> dict:
     """
     Build the search body for opensearch query
@@ -34,6 +58,7 @@ def build_search_body(
         employee_count_max: max number of employees
         sort_by: field to sort by
         sort_order: sort order ('asc' or 'desc')
+        search_after: sort values of the last hit on the previous page
 
     returns:
         dict containing the search query body
@@ -167,10 +192,45 @@ def build_search_body(
         search_body["sort"] = [
             {sort_by: {"order": sort_order if sort_order else "asc"}}
         ]
+    else:
+        search_body["sort"] = ["_score"]
+    # unique tiebreaker so that search_after pages never skip or repeat hits
+    search_body["sort"].append({"id": "asc"})
+
+    if search_after:
+        search_body["search_after"] = search_after
 
     return search_body
 
 
+def encode_cursor(state: dict) -> str:
+    """Encode per-index pagination state into an opaque page token."""
+    encoded = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(encoded).decode("ascii")
+
+
+def decode_cursor(token: str) -> dict:
+    """
+    Decode a page token from `encode_cursor`
+
+    raises:
+        InvalidCursor: if the token is malformed
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor("Invalid page cursor") from e
+    if not isinstance(state, dict) or "pages" not in state:
+        raise InvalidCursor("Invalid page cursor")
+    return state
+
+
+def search_fingerprint(params: dict) -> str:
+    """Short hash of the search parameters a cursor was issued for."""
+    encoded = json.dumps(SearchCache.normalise(params), sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
 def search_companies_and_employees(
     query: str,
     search_type: str = "all",
@@ -184,17 +244,136 @@ def search_companies_and_employees(
     employee_count_max: int = None,
     sort_by: str = None,
     sort_order: str = None,
+    cursor: str = None,
+    use_pit: bool = False,
 ) -> dict:
+    """
+    Search companies and employees, serving repeated searches from cache
+
+    Takes the same arguments as `execute_search`. Results are cached on
+    the normalised arguments until the TTL expires or the indices are
+    written to. Point-in-time pages are never cached since each response
+    renews the point in time.
+
+    raises:
+        InvalidCursor: if `cursor` is malformed
+    """
+    if cursor and not use_pit:
+        # Later pages of a point in time carry it in the cursor alone
+        use_pit = any(page.get("pit") for page in decode_cursor(cursor)["pages"].values())
+    params = {
+        "query": query,
+        "search_type": search_type,
+        "size": size,
+        "date_from": date_from,
+        "date_to": date_to,
+        "deal_amount_min": deal_amount_min,
+        "deal_amount_max": deal_amount_max,
+        "country_codes": country_codes,
+        "employee_count_min": employee_count_min,
+        "employee_count_max": employee_count_max,
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "cursor": cursor,
+        "use_pit": use_pit,
+    }
+    cache = get_search_cache()
+    if cache is None or use_pit:
+        return execute_search(**params)
+    return cache.get_or_set(params, lambda: execute_search(**params))
+
+
+def execute_search(
+    query: str,
+    search_type: str = "all",
+    size: int = 10,
+    date_from: str = None,
+    date_to: str = None,
+    deal_amount_min: float = None,
+    deal_amount_max: float = None,
+    country_codes: list[str] = None,
+    employee_count_min: int = None,
+    employee_count_max: int = None,
+    sort_by: str = None,
+    sort_order: str = None,
+    cursor: str = None,
+    use_pit: bool = False,
+) -> dict:
+    """
+    Search companies and employees one page at a time
+
+    Every page is fetched with `search_after` on the sort values of the
+    previous page's last hit, with `id` as tiebreaker, so page 500 costs
+    the same as page one. With `use_pit` the pages are read from a point
+    in time, so documents indexed mid-way don't shift later pages.
+
+    args:
+        cursor: `next` token from the previous page, or None for page one
+        use_pit: open a point in time on page one and page through it
+        others: see `build_search_body`; size is capped at MAX_PAGE_SIZE
+
+    returns:
+        dict of `companies` and `employees` hits, their `total` and a
+        `next` token, which is None once every index is exhausted
+
+    raises:
+        InvalidCursor: if the cursor is malformed or from another search
+    """
     client = get_opensearch_client()
+    size = min(size, MAX_PAGE_SIZE)
     search_types = set(search_type.split(","))
-    msearch_body = []
 
     if not search_types or "all" in search_types:
         search_types = {"companies", "employees"}
+    search_types = [t for t in ("companies", "employees") if t in search_types]
+
+    fingerprint = search_fingerprint(
+        {
+            "query": query,
+            "search_type": ",".join(search_types),
+            "date_from": date_from,
+            "date_to": date_to,
+            "deal_amount_min": deal_amount_min,
+            "deal_amount_max": deal_amount_max,
+            "country_codes": country_codes,
+            "employee_count_min": employee_count_min,
+            "employee_count_max": employee_count_max,
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+        }
+    )
+    if cursor:
+        state = decode_cursor(cursor)
+        if state.get("search") != fingerprint:
+            raise InvalidCursor("Page cursor belongs to a different search")
+        pages = state["pages"]
+        # Indices that ran out of results on an earlier page are dropped
+        search_types = [t for t in search_types if t in pages]
+    else:
+        pages = {}
+        if use_pit:
+            for index_type in search_types:
+                pit = client.create_point_in_time(
+                    index=index_type,
+                    keep_alive=PIT_KEEP_ALIVE,
+                    request_timeout=get_timeout("search"),
+                )
+                pages[index_type] = {"after": None, "pit": pit["pit_id"]}
+
+    results = {
+        "companies": [],
+        "employees": [],
+        "total": {"companies": 0, "employees": 0},
+        "next": None,
+    }
+    if not search_types:
+        return results
 
-    if "companies" in search_types:
-        company_body = build_search_body(
-            "companies",
+    msearch_body = []
+    for index_type in search_types:
+        page = pages.get(index_type, {})
+        body = build_search_body(
+            index_type,
             query,
             size,
             date_from,
@@ -206,63 +385,120 @@ def search_companies_and_employees(
             employee_count_max,
             sort_by,
             sort_order,
+            search_after=page.get("after"),
         )
-        msearch_body.extend([{"index": "companies"}, company_body])
+        if page.get("pit"):
+            # A point in time already names its indices
+            body["pit"] = {"id": page["pit"], "keep_alive": PIT_KEEP_ALIVE}
+            msearch_body.extend([{}, body])
+        else:
+            msearch_body.extend([{"index": index_type}, body])
 
-    if "employees" in search_types:
-        employee_body = build_search_body(
-            "employees",
-            query,
-            size,
-            date_from,
-            date_to,
-            deal_amount_min,
-            deal_amount_max,
-            country_codes,
-            employee_count_min,
-            employee_count_max,
-            sort_by,
-            sort_order,
+    response = client.msearch(
+        body=msearch_body, request_timeout=get_timeout("search")
+    )
+
+    next_pages = {}
+    for index_type, index_response in zip(search_types, response["responses"]):
+        pit = index_response.get("pit_id", pages.get(index_type, {}).get("pit"))
+        if "hits" in index_response:
+            hits = index_response["hits"]["hits"]
+            results[index_type] = [hit["_source"] for hit in hits]
+            results["total"][index_type] = index_response["hits"]["total"][
+                "value"
+            ]
+            if "aggregations" in index_response:
+                results["aggregations"] = index_response["aggregations"]
+            if len(hits) == size:
+                next_pages[index_type] = {"after": hits[-1]["sort"], "pit": pit}
+                continue
+
+        if pit:
+            client.delete_point_in_time(
+                body={"pit_id": [pit]}, request_timeout=get_timeout("search")
+            )
+
+    if next_pages:
+        results["next"] = encode_cursor(
+            {"search": fingerprint, "pages": next_pages}
         )
-        msearch_body.extend([{"index": "employees"}, employee_body])
+    return results
 
-    if not msearch_body:
-        return {
-            "companies": [],
-            "employees": [],
-            "total": {"companies": 0, "employees": 0},
-        }
 
-    response = client.msearch(body=msearch_body)
+def build_suggest_body(query: str, size: int = DEFAULT_SUGGEST_SIZE) -> dict:
+    """
+    Build the autocomplete body for opensearch query
 
-    results = {
-        "companies": [],
-        "employees": [],
-        "total": {"companies": 0, "employees": 0},
+    args:
+        query: prefix typed so far
+        size: number of suggestions to return
+
+    returns:
+        dict containing the search query body
+    """
+    return {
+        "size": size,
+        "_source": ["id", "name"],
+        "track_total_hits": False,
+        "query": {
+            "multi_match": {
+                "query": query,
+                "type": "bool_prefix",
+                "fields": SUGGEST_FIELDS,
+            }
+        },
     }
-    response_index = 0
 
-    if "companies" in search_types:
-        company_response = response["responses"][response_index]
-        if "hits" in company_response:
-            results["companies"] = [
-                hit["_source"] for hit in company_response["hits"]["hits"]
-            ]
-            results["total"]["companies"] = company_response["hits"]["total"][
-                "value"
-            ]
-            if "aggregations" in company_response:
-                results["aggregations"] = company_response["aggregations"]
-        response_index += 1
-
-    if "employees" in search_types:
-        employee_response = response["responses"][response_index]
-        if "hits" in employee_response:
-            results["employees"] = [
-                hit["_source"] for hit in employee_response["hits"]["hits"]
-            ]
-            results["total"]["employees"] = employee_response["hits"]["total"][
-                "value"
-            ]
 
+def execute_suggest(query: str, search_type: str = "all", size: int = DEFAULT_SUGGEST_SIZE) -> dict:
+    client = get_opensearch_client()
+    search_types = set(search_type.split(","))
+    if not search_types or "all" in search_types:
+        search_types = {"companies", "employees"}
+    search_types = sorted(search_types)
+
+    msearch_body = []
+    for index in search_types:
+        msearch_body.extend([{"index": index}, build_suggest_body(query, size)])
+
+    response = client.msearch(body=msearch_body, request_timeout=get_timeout("search"))
+
+    results = {"companies": [], "employees": []}
+    for index, index_response in zip(search_types, response["responses"]):
+        for hit in index_response.get("hits", {}).get("hits", []):
+            results[index].append(
+                {
+                    "id": hit["_source"]["id"],
+                    "name": hit["_source"]["name"],
+                    "url": f"/{index}/{hit['_source']['id']}",
+                }
+            )
     return results
+
+
+def suggest_companies_and_employees(
+    query: str, search_type: str = "all", size: int = DEFAULT_SUGGEST_SIZE
+) -> dict:
+    """
+    Autocomplete company and employee names from a prefix
+
+    args:
+        query: prefix typed so far
+        search_type: 'all', 'companies', 'employees' or a comma separated list
+        size: number of suggestions per type, capped at MAX_SUGGEST_SIZE
+
+    returns:
+        dict of `companies` and `employees` lists of id, name and url
+    """
+    size = min(size, MAX_SUGGEST_SIZE)
+    # The suggest fields are analysed to lower case, so this doesn't change
+    # the matches, and equivalent prefixes share a cache entry
+    query = query.strip().lower()
+    if not query:
+        return {"companies": [], "employees": []}
+
+    params = {"suggest": query, "search_type": search_type, "size": size}
+    cache = get_search_cache()
+    if cache is None:
+        return execute_suggest(query, search_type, size)
+    return cache.get_or_set(params, lambda: execute_suggest(query, search_type, size))
@@ -0,0 +1,159 @@
+import logging
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.db import connection, transaction
+
+from companies.models import Company, Employee
+from search.models import IndexQueueEntry
+
+from .bulk import delete_actions, index_actions, send_bulk
+from .documents import company_documents, employee_documents
+from .indexing import COMPANY_WRITE_ALIAS, EMPLOYEE_WRITE_ALIAS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DRAIN_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+INDEXES = {
+    IndexQueueEntry.COMPANY: (COMPANY_WRITE_ALIAS, Company, company_documents),
+    IndexQueueEntry.EMPLOYEE: (EMPLOYEE_WRITE_ALIAS, Employee, employee_documents),
+}
+
+
+def record(model: str, object_ids, op: str = IndexQueueEntry.INDEX):
+    """Write queue entries straight away, outside of any `on_commit` hook."""
+    IndexQueueEntry.objects.bulk_create(
+        [IndexQueueEntry(model=model, object_id=object_id, op=op) for object_id in object_ids],
+        batch_size=DEFAULT_DRAIN_SIZE,
+    )
+
+
+def enqueue(model: str, object_ids, op: str = IndexQueueEntry.INDEX):
+    """
+    Queue search documents for reindexing once the current transaction commits
+
+    Nothing is recorded if the transaction rolls back, and the caller never
+    waits on OpenSearch. Call this after `bulk_create`/`update` too, since
+    those don't send model signals.
+
+    args:
+        model: IndexQueueEntry.COMPANY or IndexQueueEntry.EMPLOYEE
+        object_ids: primary keys of the changed rows
+        op: IndexQueueEntry.INDEX or IndexQueueEntry.DELETE
+    """
+    object_ids = list(object_ids)
+    if object_ids:
+        transaction.on_commit(partial(record, model, object_ids, op))
+
+
+def coalesce(entries) -> dict:
+    """Collapse queue entries to the latest op per (model, object_id)."""
+    latest = {}
+    for entry in entries:
+        latest[(entry.model, entry.object_id)] = entry.op
+    return latest
+
+
+def build_actions(latest: dict):
+    """
+    Turn coalesced ops into bulk actions
+
+    Documents are rebuilt from the database at drain time, so an `index`
+    op for a row that has since been deleted becomes a `delete`.
+    """
+    for model, (index, model_class, build_documents) in INDEXES.items():
+        to_index = {object_id for (m, object_id), op in latest.items() if m == model and op == IndexQueueEntry.INDEX}
+        to_delete = {object_id for (m, object_id), op in latest.items() if m == model and op == IndexQueueEntry.DELETE}
+
+        indexed = set()
+        if to_index:
+            for document in build_documents(model_class.objects.filter(pk__in=to_index)):
+                indexed.add(document["id"])
+                yield from index_actions(index, [document])
+
+        yield from delete_actions(index, sorted(to_delete | (to_index - indexed)))
+
+
+def drain(batch_size: int = DEFAULT_DRAIN_SIZE, client=None) -> int:
+    """
+    Push one batch of queued changes to OpenSearch
+
+    Entries are only removed once the bulk request has gone through, so if
+    OpenSearch is unavailable they stay queued for the next attempt.
+    Documents the bulk request reports as failed, e.g. rejected under
+    load, are queued again behind the rest.
+
+    Where the database can skip locked rows, the batch stays locked until
+    it is removed, so several workers drain different entries. SQLite
+    can't, and only one worker may run against it.
+
+    args:
+        batch_size: max number of queue entries to take
+        client: OpenSearch client, defaults to the shared one
+
+    returns:
+        number of queue entries processed
+    """
+    if not connection.features.has_select_for_update_skip_locked:
+        return _drain(IndexQueueEntry.objects.all(), batch_size, client)
+    with transaction.atomic():
+        return _drain(IndexQueueEntry.objects.select_for_update(skip_locked=True), batch_size, client)
+
+
+def _drain(queryset, batch_size: int, client) -> int:
+    entries = list(queryset[:batch_size])
+    if not entries:
+        return 0
+
+    latest = coalesce(entries)
+    failed = {}
+    # One request per model, so failures, which only carry the document id,
+    # can be traced back to their queue entries
+    for model in INDEXES:
+        ops = {key: op for key, op in latest.items() if key[0] == model}
+        if not ops:
+            continue
+        result = send_bulk(build_actions(ops), client=client, batch_size=batch_size)
+        for failure in result.failures:
+            logger.error("Failed to %s document %s: %s", failure["op"], failure["id"], failure["error"])
+            key = (model, int(failure["id"]))
+            if key in ops:
+                failed[key] = ops[key]
+
+    with transaction.atomic():
+        IndexQueueEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        requeue = defaultdict(list)
+        for (model, object_id), op in failed.items():
+            requeue[model, op].append(object_id)
+        for (model, op), object_ids in requeue.items():
+            record(model, object_ids, op)
+    logger.info("Drained %d queue entries into %d operations, %d requeued", len(entries), len(latest), len(failed))
+    return len(entries)
+
+
+def run_worker(
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    batch_size: int = DEFAULT_DRAIN_SIZE,
+    once: bool = False,
+):
+    """
+    Drain the queue forever, waiting `flush_interval` seconds when it's empty
+
+    With `once`, drain until the queue is empty and return.
+    """
+    while True:
+        try:
+            processed = drain(batch_size)
+        except Exception:
+            logger.exception("Failed to drain the index queue, retrying in %.1fs", flush_interval)
+            processed = 0
+            if once:
+                raise
+
+        if processed < batch_size:
+            if once:
+                return
+            time.sleep(flush_interval)
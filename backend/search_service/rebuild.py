@@ -0,0 +1,139 @@
+import logging
+from dataclasses import dataclass, field
+
+from django.utils import timezone
+
+from companies.models import Company, Employee
+
+from .bulk import BulkResult, bulk_index, bulk_indexing_settings, delete_actions, send_bulk
+from .client import get_opensearch_client, get_timeout
+from .documents import company_documents, employee_documents
+from .indexing import (
+    COMPANY_INDEX,
+    EMPLOYEE_INDEX,
+    create_index_version,
+    retire_versions,
+    swap_aliases,
+)
+from .queries import build_search_body
+from .sync import orphaned_ids
+
+logger = logging.getLogger(__name__)
+
+REBUILDERS = {
+    COMPANY_INDEX: (Company, company_documents),
+    EMPLOYEE_INDEX: (Employee, employee_documents),
+}
+
+# Representative searches run against a new index before it goes live, so
+# the first real users don't pay for cold caches and lazily built structures.
+# Sorts only use fields the alias maps as sortable; `name` is analysed text
+WARMUP_SEARCHES = {
+    COMPANY_INDEX: [
+        {"query": ""},
+        {"query": "a"},
+        {"query": "tech"},
+        {"query": "", "sort_by": "date_founded", "sort_order": "desc"},
+        {"query": "", "sort_by": "total_deals_amount", "sort_order": "desc"},
+        {"query": "", "country_codes": ["GB", "US"], "employee_count_min": 1},
+    ],
+    EMPLOYEE_INDEX: [
+        {"query": ""},
+        {"query": "a"},
+        {"query": "engineer"},
+        {"query": "", "sort_by": "created", "sort_order": "desc"},
+    ],
+}
+
+
+class WarmupError(Exception):
+    pass
+
+
+@dataclass
+class RebuildResult:
+    index: str
+    previous: list[str] = field(default_factory=list)
+    retired: list[str] = field(default_factory=list)
+    loaded: BulkResult = field(default_factory=BulkResult)
+    caught_up: int = 0
+    orphans_deleted: int = 0
+
+
+def warm_up(alias: str, index: str, client=None) -> list[int]:
+    """
+    Run the alias' `WARMUP_SEARCHES` against `index`
+
+    returns:
+        the `took` time in milliseconds of each search
+
+    raises:
+        WarmupError: if any search fails
+    """
+    client = client or get_opensearch_client()
+    body = []
+    for params in WARMUP_SEARCHES[alias]:
+        body.extend([{"index": index}, build_search_body(alias, **params)])
+
+    response = client.msearch(body=body, request_timeout=get_timeout("search"))
+    errors = [r["error"] for r in response["responses"] if "error" in r]
+    if errors:
+        raise WarmupError(f"Warm-up searches failed on {index}: {errors[0]}")
+    return [r["took"] for r in response["responses"]]
+
+
+def rebuild_index(alias: str, keep: int = 1, client=None, **bulk_kwargs) -> RebuildResult:
+    """
+    Rebuild an index under a new version and swap the aliases over
+
+    Searches keep being served by the current version throughout:
+        1. create `<alias>_vN` with the current mapping
+        2. bulk load it with refresh and replicas off
+        3. catch up with rows modified during the load and drop documents
+           for rows deleted during it
+        4. warm it up with a representative set of searches
+        5. atomically move the read and write aliases onto it
+        6. catch up again with writes and deletions that landed on the old
+           version, then delete old versions beyond `keep`
+
+    args:
+        alias: COMPANY_INDEX or EMPLOYEE_INDEX
+        keep: number of previous versions to keep for rolling back
+        client: OpenSearch client, defaults to the shared one
+        **bulk_kwargs: passed through to `send_bulk`
+
+    returns:
+        RebuildResult describing what was loaded, swapped and retired
+    """
+    client = client or get_opensearch_client()
+    model_class, build_documents = REBUILDERS[alias]
+    changed = model_class.objects.changed_since
+
+    index = create_index_version(alias, client)
+    result = RebuildResult(index=index)
+    logger.info("Rebuilding %s into %s", alias, index)
+
+    started = timezone.now()
+    with bulk_indexing_settings(index, client=client, disable_replicas=True):
+        result.loaded = bulk_index(index, build_documents(), client=client, **bulk_kwargs)
+    client.cluster.health(index=index, wait_for_status="yellow", request_timeout=get_timeout("admin"))
+
+    def catch_up(since):
+        result.caught_up += bulk_index(index, build_documents(changed(since)), client=client, **bulk_kwargs).docs
+        result.orphans_deleted += send_bulk(
+            delete_actions(index, orphaned_ids(index, model_class, client)), client=client, **bulk_kwargs
+        ).docs
+
+    caught_up_at = timezone.now()
+    catch_up(started)
+
+    took = warm_up(alias, index, client)
+    logger.info("Warmed up %s with %d searches (max %dms)", index, len(took), max(took))
+
+    # Deletes sent to the old version until the swap leave documents behind
+    result.previous = swap_aliases(alias, index, client)
+    catch_up(caught_up_at)
+    result.retired = retire_versions(alias, keep, client)
+
+    logger.info("Swapped %s from %s to %s", alias, result.previous or "nothing", index)
+    return result
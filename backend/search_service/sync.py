@@ -0,0 +1,133 @@
+import logging
+from dataclasses import dataclass, field
+
+from django.utils import timezone
+from opensearchpy.helpers import scan
+
+from companies.models import Company, Employee
+from search.models import IndexQueueEntry, IndexSyncState
+
+from .bulk import BulkResult, delete_actions, index_actions, send_bulk
+from .client import get_opensearch_client
+from .documents import company_documents, employee_documents
+from .indexing import COMPANY_INDEX, COMPANY_WRITE_ALIAS, EMPLOYEE_INDEX, EMPLOYEE_WRITE_ALIAS
+from .queue import record
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_NAME = "default"
+RECONCILE_CHUNK_SIZE = 5000
+
+
+@dataclass
+class SyncResult:
+    since: object
+    until: object
+    companies: BulkResult = field(default_factory=BulkResult)
+    employees: BulkResult = field(default_factory=BulkResult)
+    deleted: dict = field(default_factory=dict)
+
+
+def indexed_ids(index: str, client=None):
+    """Yield the id of every document in `index` without fetching sources."""
+    client = client or get_opensearch_client()
+    for hit in scan(client, index=index, query={"_source": False}):
+        yield int(hit["_id"])
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def orphaned_ids(index: str, model_class, client=None):
+    """Ids present in `index` whose row no longer exists in the database."""
+    for chunk in _chunks(indexed_ids(index, client), RECONCILE_CHUNK_SIZE):
+        existing = set(model_class.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+        yield from (doc_id for doc_id in chunk if doc_id not in existing)
+
+
+def reconcile(client=None, **bulk_kwargs) -> dict:
+    """
+    Delete index documents for rows that were removed without a signal
+
+    Deletions normally go through the index queue, but raw SQL and
+    `QuerySet.update`-style maintenance bypass it; this pass catches those.
+    """
+    deleted = {}
+    for index, target, model_class in (
+        (COMPANY_INDEX, COMPANY_WRITE_ALIAS, Company),
+        (EMPLOYEE_INDEX, EMPLOYEE_WRITE_ALIAS, Employee),
+    ):
+        actions = delete_actions(target, orphaned_ids(index, model_class, client))
+        result = send_bulk(actions, client=client, **bulk_kwargs)
+        deleted[index] = result.docs
+        logger.info("Reconciled %s: deleted %d orphaned documents", index, result.docs)
+    return deleted
+
+
+def sync_indices(
+    since=None,
+    full: bool = False,
+    reconcile_deletes: bool = False,
+    state_name: str = DEFAULT_STATE_NAME,
+    client=None,
+    **bulk_kwargs,
+) -> SyncResult:
+    """
+    Reindex only what changed since the last successful sync
+
+    The new high-water mark is taken before reading anything, so rows
+    modified while the sync runs are picked up again next time rather
+    than missed. The mark is only stored once every batch has been sent.
+    Documents that fail to index are put on the index queue, so the index
+    worker retries them even though the mark moves past them.
+
+    args:
+        since: override the stored high-water mark
+        full: ignore the high-water mark and reindex everything
+        reconcile_deletes: also remove documents for rows that are gone
+        state_name: which IndexSyncState row to read and update
+        client: OpenSearch client, defaults to the shared one
+        **bulk_kwargs: passed through to `send_bulk`
+
+    returns:
+        SyncResult with the window and per-index bulk results
+    """
+    state, _ = IndexSyncState.objects.get_or_create(name=state_name)
+    if since is None and not full:
+        since = state.high_water_mark
+    until = timezone.now()
+
+    result = SyncResult(since=since, until=until)
+    logger.info("Syncing search indices with changes since %s", since or "the beginning")
+
+    result.companies = send_bulk(
+        index_actions(COMPANY_WRITE_ALIAS, company_documents(Company.objects.changed_since(since))),
+        client=client,
+        **bulk_kwargs,
+    )
+    result.employees = send_bulk(
+        index_actions(EMPLOYEE_WRITE_ALIAS, employee_documents(Employee.objects.changed_since(since))),
+        client=client,
+        **bulk_kwargs,
+    )
+    for model, bulk_result in (
+        (IndexQueueEntry.COMPANY, result.companies),
+        (IndexQueueEntry.EMPLOYEE, result.employees),
+    ):
+        if bulk_result.failures:
+            record(model, [int(failure["id"]) for failure in bulk_result.failures])
+    if reconcile_deletes:
+        result.deleted = reconcile(client=client, **bulk_kwargs)
+
+    state.high_water_mark = until
+    state.last_run = timezone.now()
+    state.save()
+    return result